@@ -1,19 +1,26 @@
 import requests
 import time
-import json
 from datetime import datetime
 import yaml
-import os
-import statistics
+
+from latency_sketch import LatencySketch
+from log_writer import build_writer
+from rolling_window import RollingStats
 
 
 class AdvancedServiceMonitor:
     def __init__(self, config_path="config/monitoring_config.yaml"):
         self.load_config(config_path)
         self.consecutive_failures = 0
-        self.response_times = []
+        # Все замеры за время работы: фиксированная память, O(1) на замер
+        self.latency = LatencySketch()
+        # Скользящие окна 1m/5m/1h: алерты реагируют на свежие сбои
+        self.windows = RollingStats()
+        self.last_response_time = None
         self.error_count = 0
         self.total_checks = 0
+        # Логи и метрики пишет фоновый поток пачками
+        self.writer = build_writer(self.config['logging'])
 
     def load_config(self, config_path):
         """Загрузка конфигурации из YAML файла"""
@@ -23,6 +30,7 @@ class AdvancedServiceMonitor:
         self.base_url = self.config['service']['base_url']
         self.timeout = self.config['monitoring']['request_timeout_seconds']
         self.check_interval = self.config['monitoring']['check_interval_seconds']
+        self.alert_window = self.config['monitoring'].get('alert_window', '5m')
 
     def calculate_p95(self, data):
         """Расчёт 95-го перцентиля"""
@@ -32,32 +40,26 @@ class AdvancedServiceMonitor:
         index = int(0.95 * len(sorted_data))
         return sorted_data[index]
 
-    def save_json_log(self, log_data):
-        """Сохранение лога в JSON файл"""
-        log_file = self.config['logging']['log_file']
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-
-        with open(log_file, 'a', encoding='utf-8') as f:
-            json.dump(log_data, f, ensure_ascii=False)
-            f.write('\n')
+    def window_p95(self, window=None):
+        """95-й перцентиль в окне (по скетчу, без сортировки замеров)"""
+        return self.windows[window or self.alert_window].latency.quantile(0.95)
 
-    def save_metrics_jsonl(self, metrics_data):
-        """Сохранение метрик в JSONL файл"""
-        metrics_file = self.config['logging']['metrics_file']
-        os.makedirs(os.path.dirname(metrics_file), exist_ok=True)
+    def window_error_rate(self, window=None):
+        """Процент ошибок в окне, а не с момента запуска"""
+        return self.windows[window or self.alert_window].error_rate
 
-        with open(metrics_file, 'a', encoding='utf-8') as f:
-            # JSONL: одна JSON строка на запись
-            json_line = json.dumps(metrics_data, ensure_ascii=False)
-            f.write(json_line + '\n')
+    def save_record(self, record):
+        """Запись в лог и файл метрик: в очередь фонового writer, без ожидания диска"""
+        self.writer.write(record)
 
     def get_alert_level(self):
         """Определение уровня алерта на основе метрик"""
-        if not self.response_times:
+        window = self.windows[self.alert_window]
+        if not window.count:
             return "🟢 ЗЕЛЕНЫЙ"
 
-        current_response_time = self.response_times[-1]
-        error_rate = (self.error_count / max(1, self.total_checks)) * 100
+        current_response_time = self.last_response_time or 0
+        error_rate = window.error_rate
 
         response_warning = self.config['thresholds']['response_time_ms']['warning']
         response_critical = self.config['thresholds']['response_time_ms']['critical']
@@ -87,9 +89,9 @@ class AdvancedServiceMonitor:
             response_time = (time.time() - start_time) * 1000
 
             # Сохраняем время ответа для статистики
-            self.response_times.append(response_time)
-            if len(self.response_times) > 100:  # Ограничиваем историю
-                self.response_times.pop(0)
+            self.latency.add(response_time)
+            self.last_response_time = response_time
+            self.windows.record(response.status_code == 200, response_time)
 
             result = {
                 "timestamp": datetime.now().isoformat(),
@@ -98,8 +100,10 @@ class AdvancedServiceMonitor:
                 "response_time_ms": round(response_time, 2),
                 "success": response.status_code == 200,
                 "consecutive_failures": self.consecutive_failures,
-                "p95_latency": round(self.calculate_p95(self.response_times), 2),
-                "error_rate": round((self.error_count / self.total_checks) * 100, 2)
+                # p95 и процент ошибок - в окне алертов (alert_window)
+                "p95_latency": round(self.window_p95(), 2),
+                "error_rate": round(self.window_error_rate(), 2),
+                "window": self.alert_window
             }
 
             # Обновляем счётчики ошибок
@@ -117,14 +121,14 @@ class AdvancedServiceMonitor:
                   f"Errors: {result['error_rate']}% | Failures: {self.consecutive_failures}")
 
             # Сохраняем логи и метрики
-            self.save_json_log(result)
-            self.save_metrics_jsonl(result)
+            self.save_record(result)
 
             return result
 
         except Exception as e:
             self.consecutive_failures += 1
             self.error_count += 1
+            self.windows.record(False)
 
             error_result = {
                 "timestamp": datetime.now().isoformat(),
@@ -132,16 +136,16 @@ class AdvancedServiceMonitor:
                 "error": str(e),
                 "success": False,
                 "consecutive_failures": self.consecutive_failures,
-                "p95_latency": round(self.calculate_p95(self.response_times), 2),
-                "error_rate": round((self.error_count / self.total_checks) * 100, 2)
+                "p95_latency": round(self.window_p95(), 2),
+                "error_rate": round(self.window_error_rate(), 2),
+                "window": self.alert_window
             }
 
             alert_level = self.get_alert_level()
             print(f"{alert_level} HEALTH ERROR: {e} | Failures: {self.consecutive_failures}")
 
             # Сохраняем логи ошибок
-            self.save_json_log(error_result)
-            self.save_metrics_jsonl(error_result)
+            self.save_record(error_result)
 
             return error_result
 
@@ -168,31 +172,35 @@ class AdvancedServiceMonitor:
         except KeyboardInterrupt:
             print("\n🛑 Мониторинг остановлен")
             self.print_final_summary()
+        finally:
+            # Дописываем очередь и закрываем файлы
+            self.writer.close()
 
     def print_summary(self):
-        """Вывод сводной статистики"""
-        if not self.response_times:
-            return
-
-        avg_response = statistics.mean(self.response_times)
-        p95 = self.calculate_p95(self.response_times)
-        error_rate = (self.error_count / self.total_checks) * 100
-
-        print(f"📊 СВОДКА: Avg: {avg_response:.2f}ms | P95: {p95:.2f}ms | "
-              f"Errors: {error_rate:.2f}% | Total: {self.total_checks}")
+        """Вывод сводной статистики по скользящим окнам"""
+        print(f"📊 СВОДКА (всего проверок: {self.total_checks}):")
+        for name, stats in self.windows.stats().items():
+            if not stats['count']:
+                continue
+            latency = (f"Avg: {stats['avg']:.2f}ms | P50: {stats['p50']:.2f}ms | "
+                       f"P95: {stats['p95']:.2f}ms | P99: {stats['p99']:.2f}ms | "
+                       if 'p95' in stats else "")
+            print(f"   {name}: {latency}Errors: {stats['error_rate']:.2f}% | "
+                  f"Checks: {stats['count']}")
 
     def print_final_summary(self):
         """Финальная сводка при остановке"""
-        if not self.response_times:
+        if not self.latency.count:
             return
 
-        avg_response = statistics.mean(self.response_times)
-        p95 = self.calculate_p95(self.response_times)
+        stats = self.latency.summary()
         error_rate = (self.error_count / self.total_checks) * 100
 
         print(f"\n📈 ФИНАЛЬНАЯ СТАТИСТИКА:")
-        print(f"   Среднее время: {avg_response:.2f}ms")
-        print(f"   P95 Latency: {p95:.2f}ms")
+        print(f"   Среднее время: {stats['avg']:.2f}ms")
+        print(f"   P50/P90/P95/P99: {stats['p50']:.2f} / {stats['p90']:.2f} / "
+              f"{stats['p95']:.2f} / {stats['p99']:.2f}ms")
+        print(f"   Максимум: {stats['max']:.2f}ms")
         print(f"   Процент ошибок: {error_rate:.2f}%")
         print(f"   Всего проверок: {self.total_checks}")
         print(f"   Файл логов: {self.config['logging']['log_file']}")
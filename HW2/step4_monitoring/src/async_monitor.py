@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import httpx
+import yaml
+
+from latency_sketch import LatencySketch
+from log_writer import build_writer
+from rolling_window import RollingStats
+
+
+@dataclass
+class Endpoint:
+    path: str
+    method: str = 'GET'
+    # POST /predict: отправляем тестовое изображение multipart-формой
+    send_file: bool = False
+
+
+@dataclass
+class Target:
+    name: str
+    base_url: str
+    interval: float
+    timeout: float
+    endpoints: list
+    client: object = None
+    host_slots: object = None
+
+
+@dataclass
+class TargetState:
+    """Сводное состояние цели: счётчики, последовательные ошибки, задержки"""
+    total_checks: int = 0
+    error_count: int = 0
+    consecutive_failures: int = 0
+    latency: LatencySketch = field(default_factory=LatencySketch)
+    # Свежая картина: 1m/5m/1h без накопления истории
+    windows: RollingStats = field(default_factory=RollingStats)
+    last_results: dict = field(default_factory=dict)
+
+    def record(self, result):
+        self.total_checks += 1
+        self.last_results[result['endpoint']] = result
+        if result['success']:
+            self.consecutive_failures = 0
+        else:
+            self.error_count += 1
+            self.consecutive_failures += 1
+        latency = result.get('response_time_ms')
+        if latency is not None:
+            self.latency.add(latency)
+        self.windows.record(result['success'], latency)
+
+    @property
+    def error_rate(self):
+        return (self.error_count / max(1, self.total_checks)) * 100
+
+
+def load_targets(config):
+    """Цели из секции targets; без неё - service.base_url с /health и /predict"""
+    monitoring = config['monitoring']
+    default_interval = monitoring['check_interval_seconds']
+    default_timeout = monitoring['request_timeout_seconds']
+
+    items = config.get('targets') or [{
+        'name': 'service',
+        'base_url': config['service']['base_url'],
+        'endpoints': [{'path': '/health'},
+                      {'path': '/predict', 'method': 'POST', 'send_file': True}],
+    }]
+    targets = []
+    for item in items:
+        endpoints = [
+            Endpoint(e) if isinstance(e, str) else Endpoint(**e)
+            for e in item.get('endpoints') or ['/health']
+        ]
+        targets.append(Target(
+            name=item['name'],
+            base_url=item['base_url'].rstrip('/'),
+            interval=item.get('interval_seconds', default_interval),
+            timeout=item.get('timeout_seconds', default_timeout),
+            endpoints=endpoints,
+        ))
+    return targets
+
+
+class AsyncServiceMonitor:
+    """Параллельный мониторинг многих сервисов в одном процессе.
+
+    Каждая цель проверяется своей задачей asyncio со своим интервалом и
+    таймаутом; все запросы идут через один httpx.AsyncClient с пулом
+    соединений (keep-alive), общее число запросов в полёте ограничено
+    monitoring.max_concurrency.
+    """
+
+    def __init__(self, config_path="config/monitoring_config.yaml", verbose=True):
+        self.load_config(config_path)
+        self.verbose = verbose
+        self.states = {target.name: TargetState() for target in self.targets}
+        # Получатели результатов проверок; логи и метрики пишутся пачками
+        # фоновым потоком, цикл событий не ждёт диска
+        self.writer = build_writer(self.config['logging'])
+        self.handlers = [self.writer.write]
+        self.probes = 0
+        self._slots = None
+
+    def load_config(self, config_path):
+        """Загрузка конфигурации из YAML файла"""
+        with open(config_path, 'r') as f:
+            self.config = yaml.safe_load(f)
+
+        self.targets = load_targets(self.config)
+        monitoring = self.config['monitoring']
+        self.max_concurrency = monitoring.get('max_concurrency', 100)
+        self.max_connections_per_host = monitoring.get('max_connections_per_host', 10)
+        self.summary_interval = monitoring.get('summary_interval_seconds', 60)
+
+    def get_color_status(self, response_time, status_code, endpoint="/health"):
+        """Определение цветового статуса на основе порогов"""
+        if endpoint == "/predict":
+            thresholds = self.config['thresholds']['p95_latency_ms']
+        else:
+            thresholds = self.config['thresholds']['response_time_ms']
+
+        if status_code != 200:
+            return "🔴 КРАСНЫЙ"
+        elif response_time < thresholds['warning']:
+            return "🟢 ЗЕЛЕНЫЙ"
+        elif response_time < thresholds['critical']:
+            return "🟡 ЖЕЛТЫЙ"
+        else:
+            return "🔴 КРАСНЫЙ"
+
+    async def probe(self, client, target, endpoint):
+        """Один запрос к эндпоинту цели"""
+        url = f"{target.base_url}{endpoint.path}"
+        files = None
+        if endpoint.send_file:
+            files = {"file": ("test.jpg", b"fake_image_data", "image/jpeg")}
+
+        # Время меряется после получения соединения: очередь к пулу
+        # не попадает в задержку сервиса
+        async with self._slots, target.host_slots:
+            start_time = time.perf_counter()
+            try:
+                response = await client.request(
+                    endpoint.method, url, files=files, timeout=target.timeout)
+            except Exception as e:
+                # Любая ошибка цели (в том числе битый URL в конфиге) - неудачная
+                # проверка этой цели, а не падение мониторинга всех остальных
+                return {
+                    "timestamp": datetime.now().isoformat(),
+                    "target": target.name,
+                    "endpoint": endpoint.path,
+                    "error": str(e) or type(e).__name__,
+                    "success": False,
+                }
+            response_time = (time.perf_counter() - start_time) * 1000
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "target": target.name,
+            "endpoint": endpoint.path,
+            "status_code": response.status_code,
+            "response_time_ms": round(response_time, 2),
+            "success": response.status_code == 200,
+        }
+
+    def handle_result(self, target, result):
+        state = self.states[target.name]
+        state.record(result)
+        self.probes += 1
+
+        if self.verbose:
+            if 'status_code' in result:
+                latency = result['response_time_ms']
+                status_color = self.get_color_status(
+                    latency, result['status_code'], result['endpoint'])
+                print(f"{status_color} {target.name} {result['endpoint']}: "
+                      f"{result['status_code']} | {latency:.2f}ms | "
+                      f"Failures: {state.consecutive_failures}")
+            else:
+                print(f"🔴 КРАСНЫЙ {target.name} {result['endpoint']} ERROR: "
+                      f"{result['error']} | Failures: {state.consecutive_failures}")
+
+        for handler in self.handlers:
+            handler(result)
+
+    async def run_target(self, client, target):
+        """Проверки цели с фиксированным шагом (запросы его не сдвигают)"""
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        while True:
+            results = await asyncio.gather(
+                *(self.probe(client, target, endpoint)
+                  for endpoint in target.endpoints))
+            for result in results:
+                self.handle_result(target, result)
+
+            next_run += target.interval
+            delay = next_run - loop.time()
+            if delay < 0:
+                # Проверка дольше интервала: пропускаем опоздавшие такты
+                next_run = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(self.summary_interval)
+            self.print_summary()
+
+    async def run(self, duration=None):
+        """Мониторинг всех целей; duration=None - до остановки"""
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # Клиент на хост: пул httpx перебирает свои соединения на каждый
+        # запрос, поэтому много небольших пулов быстрее одного большого
+        per_host = self.max_connections_per_host
+        limits = httpx.Limits(max_connections=per_host,
+                              max_keepalive_connections=per_host)
+        clients = {}
+        host_slots = {}
+        for target in self.targets:
+            try:
+                origin = httpx.URL(target.base_url).copy_with(path='/', query=None)
+            except httpx.InvalidURL:
+                # Проверки такой цели падают с ошибкой и пишутся как неудачные
+                origin = target.base_url
+            if origin not in clients:
+                clients[origin] = httpx.AsyncClient(limits=limits)
+                host_slots[origin] = asyncio.Semaphore(self.max_connections_per_host)
+            target.client = clients[origin]
+            target.host_slots = host_slots[origin]
+
+        tasks = [asyncio.create_task(self.run_target(target.client, target))
+                 for target in self.targets]
+        tasks.append(asyncio.create_task(self.report()))
+        try:
+            await asyncio.wait(tasks, timeout=duration,
+                               return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for client in clients.values():
+                await client.aclose()
+
+    def print_summary(self):
+        """Вывод сводной статистики по целям"""
+        now = datetime.now().strftime('%H:%M:%S')
+        print(f"\n📊 СВОДКА в {now} ({self.probes} проверок)")
+        for name, state in self.states.items():
+            recent = state.windows['5m']
+            print(f"   {name}: 5m P95: {recent.latency.quantile(0.95):.2f}ms | "
+                  f"5m Errors: {recent.error_rate:.2f}% | "
+                  f"1m Errors: {state.windows['1m'].error_rate:.2f}% | "
+                  f"Failures: {state.consecutive_failures} | "
+                  f"Total: {state.total_checks} ({state.error_rate:.2f}% ошибок)")
+        # Общая картина по всем целям за 5 минут - слияние скетчей окон
+        overall = LatencySketch.merged(
+            state.windows['5m'].latency for state in self.states.values())
+        if overall.count:
+            print(f"   ВСЕ: P50: {overall.quantile(0.5):.2f}ms | "
+                  f"P95: {overall.quantile(0.95):.2f}ms | Max: {overall.max:.2f}ms")
+
+    def run_async_monitoring(self, duration=None):
+        """Запуск мониторинга всех целей"""
+        print("🚀 ЗАПУСК ПАРАЛЛЕЛЬНОГО МОНИТОРИНГА...")
+        for target in self.targets:
+            paths = ', '.join(e.path for e in target.endpoints)
+            print(f"🎯 {target.name}: {target.base_url} [{paths}] "
+                  f"каждые {target.interval}s, таймаут {target.timeout}s")
+        print("Для остановки нажмите Ctrl+C\n")
+
+        started = time.perf_counter()
+        try:
+            asyncio.run(self.run(duration))
+        except KeyboardInterrupt:
+            print("\n🛑 Мониторинг остановлен")
+        elapsed = time.perf_counter() - started
+        self.writer.close()
+        self.print_summary()
+        print(f"   Проверок в секунду: {self.probes / max(elapsed, 1e-9):.1f}")
+        print(f"   Записи логов: {self.writer.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Параллельный мониторинг сервисов")
+    parser.add_argument('--config', default="config/monitoring_config.yaml")
+    parser.add_argument('--duration', type=float, help="остановиться через N секунд")
+    parser.add_argument('--quiet', action='store_true', help="только сводки")
+    args = parser.parse_args()
+
+    monitor = AsyncServiceMonitor(args.config, verbose=not args.quiet)
+    monitor.run_async_monitoring(args.duration)
@@ -0,0 +1,168 @@
+import base64
+import math
+import struct
+import zlib
+from array import array
+
+
+class LatencySketch:
+    """Гистограмма задержек с логарифмическими корзинами (как HDR / DDSketch).
+
+    Корзина i хранит значения из (gamma^(i-1), gamma^i], gamma = (1+a)/(1-a),
+    поэтому любой перцентиль считается с относительной ошибкой не больше
+    relative_accuracy на любом объёме данных. Число корзин фиксировано
+    диапазоном [min_ms, max_ms]: при точности 1% от 0.01 мс до 1 часа это
+    ~1000 счётчиков (8 КБ) независимо от числа замеров. add() - O(1).
+
+    Скетчи с одинаковыми параметрами складываются (merge), а to_bytes()
+    сжимает их до сотен байт: можно объединять замеры нескольких мониторов
+    или нескольких интервалов времени.
+    """
+
+    _HEADER = struct.Struct('<4sdddQddd')
+    _MAGIC = b'LSK1'
+
+    def __init__(self, relative_accuracy=0.01, min_ms=0.01, max_ms=3_600_000.0):
+        self.relative_accuracy = relative_accuracy
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_ms) / self._log_gamma)
+        size = math.ceil(math.log(max_ms) / self._log_gamma) - self._offset + 1
+        self.counts = array('Q', bytes(8 * size))
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value):
+        if value <= self.min_ms:
+            return 0
+        index = math.ceil(math.log(value) / self._log_gamma) - self._offset
+        return min(index, len(self.counts) - 1)
+
+    def _value(self, index):
+        # Середина корзины в смысле относительной ошибки
+        return 2 * self.gamma ** (index + self._offset) / (self.gamma + 1)
+
+    def add(self, value_ms, count=1):
+        """Добавить замер; возвращает номер корзины"""
+        index = self._index(value_ms)
+        self.counts[index] += count
+        self.count += count
+        self.total += value_ms * count
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+        return index
+
+    def remove_buckets(self, buckets, count, total):
+        """Вычесть замеры {корзина: число} - для скользящих окон.
+
+        min/max при этом не пересчитываются: их ведёт владелец окна.
+        """
+        counts = self.counts
+        for index, bucket in buckets.items():
+            counts[index] -= bucket
+        self.count -= count
+        self.total -= total
+
+    def quantile(self, q):
+        """q-й квантиль (0..1); 0 для пустого скетча"""
+        if not self.count:
+            return 0.0
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        # Как sorted(data)[int(q * n)] в calculate_p95
+        rank = q * self.count
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen > rank:
+                # Точные min/max не хуже оценки корзины
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs=(0.5, 0.9, 0.95, 0.99)):
+        return {q: self.quantile(q) for q in qs}
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        """p50/p90/p95/p99/max/avg в мс - для логов и сводок"""
+        if not self.count:
+            return {'count': 0}
+        result = {f"p{round(q * 100)}": round(v, 2) for q, v in self.quantiles().items()}
+        result.update(count=self.count, avg=round(self.mean, 2), max=round(self.max, 2))
+        return result
+
+    def _check_compatible(self, other):
+        if (self.relative_accuracy, self.min_ms, self.max_ms) != (
+                other.relative_accuracy, other.min_ms, other.max_ms):
+            raise ValueError("Нельзя объединить скетчи с разными параметрами")
+
+    def merge(self, other):
+        """Добавить замеры другого скетча (того же формата)"""
+        self._check_compatible(other)
+        counts = self.counts
+        for index, bucket in enumerate(other.counts):
+            if bucket:
+                counts[index] += bucket
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        return LatencySketch.from_bytes(self.to_bytes())
+
+    def clear(self):
+        self.counts = array('Q', bytes(8 * len(self.counts)))
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def to_bytes(self):
+        """Заголовок + сжатые счётчики (в основном нули - сжимаются в разы)"""
+        header = self._HEADER.pack(
+            self._MAGIC, self.relative_accuracy, self.min_ms, self.max_ms,
+            self.count, self.total, self.min, self.max)
+        return header + zlib.compress(self.counts.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, accuracy, min_ms, max_ms, count, total, low, high = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC:
+            raise ValueError("Неизвестный формат скетча")
+        sketch = cls(accuracy, min_ms, max_ms)
+        counts = array('Q')
+        counts.frombytes(zlib.decompress(data[cls._HEADER.size:]))
+        if len(counts) != len(sketch.counts):
+            raise ValueError("Повреждённый скетч: неверное число корзин")
+        sketch.counts = counts
+        sketch.count, sketch.total, sketch.min, sketch.max = count, total, low, high
+        return sketch
+
+    def to_base64(self):
+        """Строка для JSON-логов"""
+        return base64.b64encode(self.to_bytes()).decode('ascii')
+
+    @classmethod
+    def from_base64(cls, text):
+        return cls.from_bytes(base64.b64decode(text))
+
+    @classmethod
+    def merged(cls, sketches):
+        """Один скетч из многих (мониторы, интервалы времени)"""
+        result = None
+        for sketch in sketches:
+            result = sketch.copy() if result is None else result.merge(sketch)
+        return result if result is not None else cls()
@@ -0,0 +1,244 @@
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+class RotatingFileSink:
+    """Файл JSONL с ротацией по размеру и/или времени.
+
+    Закрытый сегмент переименовывается в <path>.<YYYYmmdd-HHMMSS-мкс> и сжимается
+    в .gz. fsync: 'always' - после каждой пачки, 'interval' - не чаще раза в
+    fsync_interval секунд, 'never' - на усмотрение ОС.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, rotate_seconds=None,
+                 compress=True, fsync='interval', fsync_interval=5.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segments = 0
+        self._file = None
+        self._last_fsync = time.monotonic()
+        self._compress_leftovers()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+        # Время открытия сегмента - для ротации по времени
+        self._opened = time.time() if not self._size else self._first_timestamp()
+
+    def _first_timestamp(self):
+        """Время первой записи продолжаемого сегмента (mtime - время последней)"""
+        try:
+            with open(self.path, 'rb') as f:
+                record = json.loads(f.readline())
+            return datetime.fromisoformat(record['timestamp']).timestamp()
+        except (OSError, ValueError, TypeError, KeyError):
+            return os.stat(self.path).st_mtime
+
+    def write(self, data):
+        if self._file is None:
+            self._open()
+        # Продолженный после перезапуска сегмент тоже может быть уже полным
+        if self._should_rotate(len(data)):
+            self.rotate()
+            self._open()
+        self._file.write(data)
+        self._size += len(data)
+
+    def _should_rotate(self, incoming):
+        if self.max_bytes and self._size and self._size + incoming > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._opened >= self.rotate_seconds
+
+    def flush(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        now = time.monotonic()
+        if self.fsync == 'always' or (
+                self.fsync == 'interval' and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def rotate(self):
+        """Закрыть текущий сегмент и (при compress) сжать его"""
+        if self._file is None:
+            if not os.path.exists(self.path):
+                return None
+        else:
+            self._file.flush()
+            if self.fsync != 'never':
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+        if not os.path.getsize(self.path):
+            return None
+
+        # Имена сегментов сортируются по времени закрытия
+        while True:
+            segment = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+            if not (os.path.exists(segment) or os.path.exists(segment + '.gz')):
+                break
+        os.replace(self.path, segment)
+        self.segments += 1
+        return self._gzip(segment) if self.compress else segment
+
+    @staticmethod
+    def _gzip(segment):
+        tmp = segment + '.gz.tmp'
+        with open(segment, 'rb') as src, gzip.open(tmp, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, segment + '.gz')
+        os.remove(segment)
+        return segment + '.gz'
+
+    def _compress_leftovers(self):
+        # Сегменты, не сжатые из-за аварийной остановки
+        if not self.compress:
+            return
+        for segment in glob.glob(glob.escape(self.path) + '.*'):
+            if not segment.endswith(('.gz', '.tmp')):
+                self._gzip(segment)
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != 'never':
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+class BufferedLogWriter:
+    """Фоновая запись записей мониторинга пачками.
+
+    write() только кладёт запись в очередь и не ждёт диска. Фоновый поток
+    забирает до batch_size записей (или всё, что накопилось за
+    flush_interval секунд), сериализует каждую запись один раз и пишет
+    пачку во все приёмники одним write() на приёмник. При переполнении
+    очереди записи отбрасываются (счётчик dropped), а не блокируют проверки.
+    written считает только записи, дошедшие до всех приёмников.
+    """
+
+    def __init__(self, sinks, batch_size=500, flush_interval=1.0, queue_size=100_000):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        # dropped меняют потоки проверок, остальные счётчики - только поток записи
+        self._dropped_lock = threading.Lock()
+        self._stop = object()
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def _collect(self):
+        """Пачка записей: до batch_size или до истечения flush_interval"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    item = self.queue.get(timeout=timeout)
+                else:
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._stop:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _serialize(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+            except (TypeError, ValueError) as e:
+                # Одна несериализуемая запись не должна терять пачку
+                self.errors += 1
+                print(f"❌ Запись пропущена: {e}")
+        return ''.join(lines).encode('utf-8'), len(lines)
+
+    def _write_batch(self, batch):
+        data, written = self._serialize(batch)
+        failed = False
+        for sink in self.sinks:
+            try:
+                sink.write(data)
+                sink.flush()
+            except Exception as e:
+                # Любая ошибка приёмника: поток записи должен жить дальше
+                self.errors += 1
+                failed = True
+                print(f"❌ Ошибка записи в {sink.path}: {e}")
+        if not failed:
+            self.written += written
+        self.batches += 1
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._write_batch(batch)
+            if stop:
+                for sink in self.sinks:
+                    sink.close()
+                return
+
+    def close(self, timeout=10):
+        """Дописать очередь, сбросить и закрыть файлы"""
+        if self._thread.is_alive():
+            self.queue.put(self._stop)
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._dropped_lock:
+            dropped = self.dropped
+        return {'written': self.written, 'dropped': dropped, 'batches': self.batches,
+                'errors': self.errors, 'queued': self.queue.qsize()}
+
+
+def build_writer(logging_config):
+    """Writer из секции logging: log_file и metrics_file - приёмники одной записи"""
+    options = logging_config.get('writer', {})
+    sink_options = {
+        'max_bytes': options.get('max_megabytes', 50) * 1024 * 1024,
+        'rotate_seconds': options.get('rotate_seconds'),
+        'compress': options.get('compress', True),
+        'fsync': options.get('fsync', 'interval'),
+        'fsync_interval': options.get('fsync_interval_seconds', 5.0),
+    }
+    paths = [logging_config[key] for key in ('log_file', 'metrics_file') if logging_config.get(key)]
+    return BufferedLogWriter(
+        [RotatingFileSink(path, **sink_options) for path in dict.fromkeys(paths)],
+        batch_size=options.get('batch_size', 500),
+        flush_interval=options.get('flush_interval_seconds', 1.0),
+        queue_size=options.get('queue_size', 100_000),
+    )
@@ -0,0 +1,269 @@
+import argparse
+import glob
+import gzip
+import io
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.json as pj
+import yaml
+
+# Поля записи мониторинга -> типизированные столбцы архива
+SOURCE_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('target', pa.string()),
+    ('endpoint', pa.string()),
+    ('status_code', pa.int16()),
+    ('response_time_ms', pa.float32()),
+    ('success', pa.bool_()),
+])
+RENAMES = {'status_code': 'status', 'response_time_ms': 'latency_ms'}
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+MANIFEST = '_compacted.json'
+DEFAULT_TARGET = 'service'  # как в async_monitor.load_targets без секции targets
+
+_DURATION = re.compile(r'^(\d+)([smhd])$')
+_UNITS = {'s': ('second', 1), 'm': ('minute', 60), 'h': ('hour', 3600), 'd': ('day', 86400)}
+
+
+def parse_duration(text):
+    """'30s', '5m', '1h', '7d' -> (число, единица pyarrow, секунды)"""
+    match = _DURATION.match(text)
+    if not match:
+        raise ValueError(f"Неверная длительность: {text} (пример: 30s, 5m, 1h, 7d)")
+    value = int(match.group(1))
+    unit, seconds = _UNITS[match.group(2)]
+    return value, unit, value * seconds
+
+
+def segment_key(path):
+    """Имя сегмента без .gz: сжатие не делает его новым сегментом"""
+    name = os.path.basename(path)
+    return name[:-3] if name.endswith('.gz') else name
+
+
+def closed_segments(metrics_path, compressed=True):
+    """Закрытые сегменты log_writer по порядку времени (активный файл не трогаем).
+
+    При сжатии (writer.compress) берём только .gz: несжатый сегмент сейчас
+    сжимает writer или сожмёт при следующем запуске. Без сжатия сегмент,
+    для которого уже есть .gz, берётся один раз - в виде .gz.
+    """
+    segments = {}
+    for segment in sorted(glob.glob(glob.escape(metrics_path) + '.*')):
+        if segment.endswith('.tmp') or (compressed and not segment.endswith('.gz')):
+            continue
+        key = segment_key(segment)
+        if key not in segments or segment.endswith('.gz'):
+            segments[key] = segment
+    return [segments[key] for key in sorted(segments)]
+
+
+def _read_json_lines(data):
+    options = pj.ParseOptions(explicit_schema=SOURCE_SCHEMA, unexpected_field_behavior='ignore')
+    try:
+        return pj.read_json(io.BytesIO(data), parse_options=options)
+    except pa.ArrowInvalid:
+        # Недописанная строка после аварийной остановки: оставляем целые
+        valid = []
+        for line in data.splitlines():
+            try:
+                json.loads(line)
+            except ValueError:
+                continue
+            valid.append(line)
+        if not valid:
+            return SOURCE_SCHEMA.empty_table()
+        return pj.read_json(io.BytesIO(b'\n'.join(valid) + b'\n'), parse_options=options)
+
+
+def read_segment(path):
+    """Сегмент JSONL (.gz или нет) -> таблица архива, отсортированная по времени"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        table = _read_json_lines(f.read())
+
+    table = table.rename_columns([RENAMES.get(name, name) for name in table.column_names])
+    table = table.set_column(
+        table.schema.get_field_index('target'), 'target',
+        pc.fill_null(table['target'], DEFAULT_TARGET))
+    table = table.filter(pc.is_valid(table['timestamp']))
+    table = table.append_column('date', pc.strftime(table['timestamp'], format='%Y-%m-%d'))
+    return table.sort_by('timestamp')
+
+
+def _load_manifest(archive_dir):
+    path = os.path.join(archive_dir, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        # Старые манифесты хранили имена вместе с .gz
+        return list(dict.fromkeys(segment_key(name) for name in json.load(f)))
+
+
+def _save_manifest(archive_dir, segments):
+    path = os.path.join(archive_dir, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(segments, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def compact(metrics_path, archive_dir, delete=False, compressed=True):
+    """Переложить закрытые сегменты в Parquet по дням: <archive>/date=YYYY-MM-DD/.
+
+    Сегмент записывается в манифест (по имени без .gz) после записи файлов,
+    поэтому повторный запуск пропускает готовые сегменты и доделывает
+    прерванный. Возвращает [(имя сегмента, записей)] перенесённых сегментов.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    done = _load_manifest(archive_dir)
+    compacted = []
+    for segment in closed_segments(metrics_path, compressed):
+        name = segment_key(segment)
+        if name in done:
+            if delete:
+                os.remove(segment)
+            continue
+
+        table = read_segment(segment)
+        if table.num_rows:
+            ds.write_dataset(
+                table, archive_dir, format='parquet', partitioning=PARTITIONING,
+                # Имя файла от сегмента: повторная запись перезаписывает его же
+                basename_template=name.replace('.', '_') + '-{i}.parquet',
+                existing_data_behavior='overwrite_or_ignore',
+                file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+                max_rows_per_group=64 * 1024,
+            )
+        done.append(name)
+        _save_manifest(archive_dir, done)
+        if delete:
+            os.remove(segment)
+        compacted.append((os.path.basename(segment), table.num_rows))
+    return compacted
+
+
+def query(archive_dir, start, end, window='5m', target=None, endpoint=None,
+          percentiles=(0.5, 0.95, 0.99)):
+    """Перцентили задержки и процент ошибок по окнам в [start, end).
+
+    Отбор по дате отсекает лишние разделы (date=...), из файлов читаются
+    только нужные столбцы, а статистика row group по timestamp пропускает
+    блоки вне диапазона.
+    """
+    multiple, unit, _ = parse_duration(window)
+    dataset = ds.dataset(archive_dir, format='parquet', partitioning=PARTITIONING)
+
+    condition = ((ds.field('date') >= start.strftime('%Y-%m-%d'))
+                 & (ds.field('date') <= end.strftime('%Y-%m-%d'))
+                 & (ds.field('timestamp') >= pa.scalar(start, pa.timestamp('us')))
+                 & (ds.field('timestamp') < pa.scalar(end, pa.timestamp('us'))))
+    if target:
+        condition &= ds.field('target') == target
+    if endpoint:
+        condition &= ds.field('endpoint') == endpoint
+
+    table = dataset.to_table(columns=['timestamp', 'latency_ms', 'success'], filter=condition)
+    if not table.num_rows:
+        return []
+
+    table = table.append_column(
+        'window', pc.floor_temporal(table['timestamp'], multiple=multiple, unit=unit))
+    table = table.append_column('error', pc.cast(pc.invert(table['success']), pa.int64()))
+    grouped = table.group_by('window').aggregate([
+        ('timestamp', 'count'),
+        ('error', 'sum'),
+        ('latency_ms', 'tdigest', pc.TDigestOptions(q=list(percentiles))),
+        ('latency_ms', 'max'),
+    ]).sort_by('window')
+
+    rows = []
+    for item in grouped.to_pylist():
+        checks = item['timestamp_count']
+        row = {
+            'window': item['window'],
+            'checks': checks,
+            'error_rate': round(item['error_sum'] / checks * 100, 2),
+        }
+        for q, value in zip(percentiles, item['latency_ms_tdigest'] or []):
+            row[f"p{round(q * 100)}"] = None if value is None else round(value, 2)
+        latency_max = item['latency_ms_max']
+        row['max'] = None if latency_max is None else round(latency_max, 2)
+        rows.append(row)
+    return rows
+
+
+def _print_rows(rows):
+    if not rows:
+        print("Нет данных за период")
+        return
+    headers = list(rows[0])
+    print(' | '.join(f"{h:>19}" if h == 'window' else f"{h:>10}" for h in headers))
+    for row in rows:
+        cells = []
+        for h in headers:
+            value = row[h]
+            if h == 'window':
+                cells.append(f"{value:%Y-%m-%d %H:%M:%S}")
+            elif isinstance(value, float):
+                cells.append(f"{value:>10.2f}")
+            else:
+                cells.append(f"{str(value):>10}")
+        print(' | '.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Архив метрик мониторинга в Parquet")
+    parser.add_argument('--config', default="config/monitoring_config.yaml")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compact_parser = commands.add_parser('compact', help="закрытые сегменты JSONL -> Parquet")
+    compact_parser.add_argument('--delete', action='store_true',
+                                help="удалить сегменты после переноса")
+
+    query_parser = commands.add_parser('query', help="перцентили и ошибки по окнам")
+    query_parser.add_argument('--from', dest='start', help="начало, ISO (2025-10-21T14:00)")
+    query_parser.add_argument('--to', dest='end', help="конец, ISO; по умолчанию - сейчас")
+    query_parser.add_argument('--last', help="вместо --from: последние 1h, 7d, ...")
+    query_parser.add_argument('--window', default='5m', help="шаг окна: 30s, 5m, 1h, 1d")
+    query_parser.add_argument('--target')
+    query_parser.add_argument('--endpoint')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    logging_config = config['logging']
+    archive_dir = logging_config.get('archive_dir', 'logs/archive')
+
+    started = time.perf_counter()
+    if args.command == 'compact':
+        compressed = logging_config.get('writer', {}).get('compress', True)
+        segments = compact(logging_config['metrics_file'], archive_dir, args.delete,
+                           compressed)
+        for name, rows in segments:
+            print(f"📦 {name}: {rows} записей")
+        total = sum(rows for _, rows in segments)
+        print(f"✅ Сегментов: {len(segments)}, записей: {total} -> {archive_dir} "
+              f"за {time.perf_counter() - started:.2f}s")
+        return
+
+    end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+    if args.last:
+        start = end - timedelta(seconds=parse_duration(args.last)[2])
+    elif args.start:
+        start = datetime.fromisoformat(args.start)
+    else:
+        parser.error("нужен --from или --last")
+    rows = query(archive_dir, start, end, args.window, args.target, args.endpoint)
+    _print_rows(rows)
+    print(f"⏱️ {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
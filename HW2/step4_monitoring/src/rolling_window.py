@@ -0,0 +1,126 @@
+import math
+import time
+
+from latency_sketch import LatencySketch
+
+# Окно: (длина, шаг корзины) в секундах
+DEFAULT_WINDOWS = {'1m': (60, 5), '5m': (300, 15), '1h': (3600, 60)}
+
+
+class _Slot:
+    """Одна корзина времени: счётчики и разреженные корзины задержек"""
+    __slots__ = ('epoch', 'count', 'errors', 'timed', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.reset(None)
+
+    def reset(self, epoch):
+        self.epoch = epoch
+        self.count = 0
+        self.errors = 0
+        self.timed = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets = {}
+
+
+class RollingWindow:
+    """Скользящее окно по кольцу корзин времени.
+
+    record() - O(1): замер попадает в текущую корзину и в общий скетч окна.
+    Устаревшая корзина вычитается из общего скетча при переходе кольца на
+    неё, поэтому запрос статистики не перебирает замеры, а память
+    не зависит от времени работы: span / bucket корзин.
+    """
+
+    def __init__(self, span_seconds, bucket_seconds, clock=time.monotonic):
+        self.span = span_seconds
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self.slots = [_Slot() for _ in range(math.ceil(span_seconds / bucket_seconds))]
+        self.latency = LatencySketch()
+        self.count = 0
+        self.errors = 0
+        self._epoch = None
+
+    def _advance(self, now):
+        epoch = int(now // self.bucket_seconds)
+        if self._epoch is not None and epoch <= self._epoch:
+            return self.slots[epoch % len(self.slots)]
+
+        # Сбрасываем корзины, через которые прошло кольцо (не больше круга)
+        start = epoch - len(self.slots) + 1
+        if self._epoch is not None:
+            start = max(start, self._epoch + 1)
+        for step in range(start, epoch + 1):
+            slot = self.slots[step % len(self.slots)]
+            if slot.epoch is not None:
+                self._expire(slot)
+            slot.reset(step)
+        self._epoch = epoch
+        return self.slots[epoch % len(self.slots)]
+
+    def _expire(self, slot):
+        self.count -= slot.count
+        self.errors -= slot.errors
+        self.latency.remove_buckets(slot.buckets, slot.timed, slot.total)
+
+    def record(self, success, latency_ms=None, now=None):
+        slot = self._advance(self.clock() if now is None else now)
+        slot.count += 1
+        self.count += 1
+        if not success:
+            slot.errors += 1
+            self.errors += 1
+        if latency_ms is not None:
+            index = self.latency.add(latency_ms)
+            slot.buckets[index] = slot.buckets.get(index, 0) + 1
+            slot.timed += 1
+            slot.total += latency_ms
+            if latency_ms < slot.min:
+                slot.min = latency_ms
+            if latency_ms > slot.max:
+                slot.max = latency_ms
+
+    def refresh(self, now=None):
+        """Выбросить корзины старше окна (перед чтением после простоя)"""
+        self._advance(self.clock() if now is None else now)
+        live = [s for s in self.slots if s.epoch is not None and s.timed]
+        # min/max окна - по живым корзинам; счётчики скетча уже актуальны
+        self.latency.min = min((s.min for s in live), default=math.inf)
+        self.latency.max = max((s.max for s in live), default=-math.inf)
+        return self
+
+    @property
+    def error_rate(self):
+        return (self.errors / self.count) * 100 if self.count else 0.0
+
+    def stats(self, now=None):
+        self.refresh(now)
+        result = {'count': self.count, 'errors': self.errors,
+                  'error_rate': round(self.error_rate, 2)}
+        if self.latency.count:
+            result.update(self.latency.summary())
+            result['count'] = self.count
+        return result
+
+
+class RollingStats:
+    """Набор окон (1m/5m/1h) с общим record()"""
+
+    def __init__(self, windows=None, clock=time.monotonic):
+        windows = windows or DEFAULT_WINDOWS
+        self.windows = {
+            name: RollingWindow(span, step, clock) for name, (span, step) in windows.items()
+        }
+
+    def __getitem__(self, name):
+        return self.windows[name].refresh()
+
+    def record(self, success, latency_ms=None, now=None):
+        for window in self.windows.values():
+            window.record(success, latency_ms, now)
+
+    def stats(self, now=None):
+        return {name: window.stats(now) for name, window in self.windows.items()}
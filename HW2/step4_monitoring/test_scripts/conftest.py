@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Скрипты мониторинга запускаются как python src/X.py и импортируют соседей
+# напрямую (from latency_sketch import ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
@@ -0,0 +1,122 @@
+"""Тест параллельного мониторинга (без сети: httpx.MockTransport)"""
+
+import asyncio
+
+import httpx
+import pytest
+import yaml
+
+from async_monitor import AsyncServiceMonitor, Endpoint, load_targets
+
+
+def base_config(tmp_path, targets=None, interval=30):
+    config = {
+        'service': {'base_url': 'http://model:8000'},
+        'monitoring': {
+            'check_interval_seconds': interval,
+            'request_timeout_seconds': 10,
+            'summary_interval_seconds': 3600,
+        },
+        'thresholds': {
+            'response_time_ms': {'warning': 2000, 'critical': 5000},
+            'p95_latency_ms': {'warning': 3000, 'critical': 6000},
+        },
+        'logging': {
+            'log_file': str(tmp_path / 'monitoring.log'),
+            'metrics_file': str(tmp_path / 'metrics.jsonl'),
+        },
+    }
+    if targets is not None:
+        config['targets'] = targets
+    return config
+
+
+def make_monitor(tmp_path, config):
+    path = tmp_path / 'config.yaml'
+    path.write_text(yaml.safe_dump(config), encoding='utf-8')
+    return AsyncServiceMonitor(str(path), verbose=False)
+
+
+def test_load_targets_falls_back_to_service(tmp_path):
+    targets = load_targets(base_config(tmp_path))
+
+    assert len(targets) == 1
+    target = targets[0]
+    assert (target.name, target.base_url) == ('service', 'http://model:8000')
+    assert (target.interval, target.timeout) == (30, 10)
+    assert target.endpoints == [
+        Endpoint('/health'), Endpoint('/predict', 'POST', send_file=True)]
+
+
+def test_load_targets_defaults_and_overrides(tmp_path):
+    config = base_config(tmp_path, targets=[
+        {'name': 'api', 'base_url': 'http://api:8001/', 'interval_seconds': 5,
+         'endpoints': ['/health', {'path': '/tags', 'method': 'HEAD'}]},
+        {'name': 'bare', 'base_url': 'http://bare', 'timeout_seconds': 2},
+    ])
+    api, bare = load_targets(config)
+
+    assert api.base_url == 'http://api:8001'
+    assert (api.interval, api.timeout) == (5, 10)
+    assert api.endpoints == [Endpoint('/health'), Endpoint('/tags', 'HEAD')]
+    assert (bare.interval, bare.timeout) == (30, 2)
+    assert bare.endpoints == [Endpoint('/health')]
+
+
+@pytest.fixture
+def mock_transport(monkeypatch):
+    """Все клиенты монитора ходят в MockTransport вместо сети"""
+    real_client = httpx.AsyncClient
+    transport = httpx.MockTransport(lambda request: httpx.Response(200))
+    monkeypatch.setattr(
+        httpx, 'AsyncClient', lambda **kwargs: real_client(transport=transport, **kwargs))
+
+
+def test_broken_target_does_not_stop_others(tmp_path, mock_transport):
+    monitor = make_monitor(tmp_path, base_config(tmp_path, targets=[
+        {'name': 'good', 'base_url': 'http://good', 'interval_seconds': 0.1},
+        {'name': 'broken', 'base_url': 'http://[::1', 'interval_seconds': 0.1},
+    ]))
+    asyncio.run(monitor.run(duration=0.35))
+    monitor.writer.close()
+
+    good, broken = monitor.states['good'], monitor.states['broken']
+    assert good.total_checks >= 3 and good.error_count == 0
+    # Битый URL - неудачные проверки своей цели, расписание продолжается
+    assert broken.total_checks >= 3
+    assert broken.error_count == broken.total_checks
+    assert broken.last_results['/health']['error']
+
+
+def run_with_fake_probe(tmp_path, interval, probe_seconds, duration):
+    monitor = make_monitor(tmp_path, base_config(tmp_path, targets=[
+        {'name': 'svc', 'base_url': 'http://svc', 'interval_seconds': interval},
+    ]))
+    starts = []
+
+    async def probe(client, target, endpoint):
+        loop = asyncio.get_running_loop()
+        starts.append(loop.time())
+        await asyncio.sleep(probe_seconds)
+        return {'timestamp': '', 'target': target.name, 'endpoint': endpoint.path,
+                'status_code': 200, 'response_time_ms': probe_seconds * 1000,
+                'success': True}
+
+    monitor.probe = probe
+    asyncio.run(monitor.run(duration=duration))
+    monitor.writer.close()
+    return [b - a for a, b in zip(starts, starts[1:])]
+
+
+def test_schedule_is_fixed_rate(tmp_path, mock_transport):
+    # Проверка 50 мс при шаге 100 мс: старты через 100 мс, а не через 150
+    gaps = run_with_fake_probe(tmp_path, 0.1, 0.05, 0.65)
+    assert len(gaps) >= 5
+    assert sum(gaps) / len(gaps) == pytest.approx(0.1, abs=0.02)
+
+
+def test_schedule_skips_missed_ticks(tmp_path, mock_transport):
+    # Проверка дольше шага: следующая сразу после неё, без пачки догоняющих
+    gaps = run_with_fake_probe(tmp_path, 0.05, 0.15, 0.6)
+    assert len(gaps) >= 2
+    assert min(gaps) >= 0.14
@@ -0,0 +1,94 @@
+"""Тест скетча задержек: точность квантилей, объединение, сериализация"""
+
+import random
+
+import pytest
+
+from advanced_monitor import AdvancedServiceMonitor
+from latency_sketch import LatencySketch
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def exact(data, q):
+    """Как calculate_p95: sorted(data)[int(q * n)]"""
+    return sorted(data)[int(q * len(data))]
+
+
+def samples(seed, n=20000):
+    rng = random.Random(seed)
+    # Длинный хвост: логнормальное тело и редкие таймауты
+    return [rng.lognormvariate(4, 1) if rng.random() > 0.01 else rng.uniform(5000, 10000)
+            for _ in range(n)]
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_quantiles_match_exact_within_accuracy(seed):
+    data = samples(seed)
+    sketch = LatencySketch(relative_accuracy=0.01)
+    for value in data:
+        sketch.add(value)
+
+    for q in QUANTILES:
+        assert sketch.quantile(q) == pytest.approx(exact(data, q), rel=0.01)
+    assert sketch.count == len(data)
+    assert (sketch.min, sketch.max) == (min(data), max(data))
+    assert sketch.mean == pytest.approx(sum(data) / len(data))
+
+
+def test_empty_and_single_value():
+    sketch = LatencySketch()
+    assert sketch.quantile(0.95) == 0.0
+    assert sketch.summary() == {'count': 0}
+
+    sketch.add(42.0)
+    assert sketch.quantile(0.5) == 42.0
+    assert sketch.quantile(0) == sketch.quantile(1) == 42.0
+
+
+def test_merge_equals_single_sketch():
+    first, second = samples(4, 5000), samples(5, 7000)
+    a, b, whole = LatencySketch(), LatencySketch(), LatencySketch()
+    for value in first:
+        a.add(value)
+        whole.add(value)
+    for value in second:
+        b.add(value)
+        whole.add(value)
+
+    merged = LatencySketch.merged([a, b])
+    assert merged.counts == whole.counts
+    assert (merged.count, merged.min, merged.max) == (whole.count, whole.min, whole.max)
+    for q in QUANTILES:
+        assert merged.quantile(q) == whole.quantile(q)
+    # merged() копирует первый скетч, а не меняет его
+    assert a.count == len(first)
+
+
+def test_merge_rejects_different_parameters():
+    with pytest.raises(ValueError):
+        LatencySketch(relative_accuracy=0.01).merge(LatencySketch(relative_accuracy=0.02))
+
+
+def test_bytes_and_base64_round_trip():
+    sketch = LatencySketch()
+    for value in samples(6, 3000):
+        sketch.add(value)
+
+    data = sketch.to_bytes()
+    assert len(data) < len(sketch.counts) * 8 // 4
+    for restored in (LatencySketch.from_bytes(data),
+                     LatencySketch.from_base64(sketch.to_base64())):
+        assert restored.counts == sketch.counts
+        assert (restored.count, restored.total, restored.min, restored.max) == \
+            (sketch.count, sketch.total, sketch.min, sketch.max)
+        assert restored.summary() == sketch.summary()
+
+    with pytest.raises(ValueError):
+        LatencySketch.from_bytes(b'XXXX' + data[4:])
+
+
+def test_calculate_p95_keeps_list_semantics():
+    data = samples(7, 1000)
+    assert AdvancedServiceMonitor.calculate_p95(None, data) == exact(data, 0.95)
+    assert AdvancedServiceMonitor.calculate_p95(None, []) == 0
@@ -0,0 +1,255 @@
+"""Тест фоновой записи логов: пачки, fsync, ротация и сжатие сегментов"""
+
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import log_writer
+from log_writer import BufferedLogWriter, RotatingFileSink, build_writer
+
+
+def record(i, timestamp=None):
+    return {'timestamp': timestamp or datetime.now().isoformat(), 'i': i}
+
+
+def segments(path):
+    return sorted(glob.glob(glob.escape(path) + '.*'))
+
+
+def read_all(path):
+    """Записи всех закрытых сегментов и активного файла по порядку"""
+    lines = []
+    for segment in segments(path):
+        opener = gzip.open if segment.endswith('.gz') else open
+        with opener(segment, 'rb') as f:
+            lines += f.read().splitlines()
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            lines += f.read().splitlines()
+    return [json.loads(line) for line in lines]
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(log_writer.os, 'fsync', lambda fd: calls.append(fd) or real_fsync(fd))
+    return calls
+
+
+def test_records_are_written_in_batches(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    writer = BufferedLogWriter([RotatingFileSink(path)], batch_size=10, flush_interval=5)
+    for i in range(25):
+        writer.write(record(i))
+    writer.close()
+
+    # Две полные пачки и остаток при закрытии
+    assert writer.stats() == {'written': 25, 'dropped': 0, 'batches': 3,
+                              'errors': 0, 'queued': 0}
+    assert [r['i'] for r in read_all(path)] == list(range(25))
+
+
+def test_batch_is_flushed_after_interval(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    writer = BufferedLogWriter([RotatingFileSink(path)], batch_size=100,
+                               flush_interval=0.05)
+    writer.write(record(0))
+    time.sleep(0.3)
+    # Неполная пачка дописана без close()
+    assert [r['i'] for r in read_all(path)] == [0]
+    writer.close()
+
+
+def test_same_path_is_written_once(tmp_path):
+    path = str(tmp_path / 'monitoring.log')
+    writer = build_writer({'log_file': path, 'metrics_file': path})
+    writer.write(record(0))
+    writer.close()
+    assert len(read_all(path)) == 1
+
+
+@pytest.mark.parametrize('policy, interval, expected', [
+    ('always', 5.0, 5 + 1),   # после каждой пачки и при закрытии
+    ('interval', 60.0, 1),    # интервал не прошёл: только при закрытии
+    ('interval', 0.0, 5 + 1),
+    ('never', 5.0, 0),
+])
+def test_fsync_policies(tmp_path, fsyncs, policy, interval, expected):
+    sink = RotatingFileSink(str(tmp_path / 'metrics.jsonl'), fsync=policy,
+                            fsync_interval=interval)
+    for i in range(5):
+        sink.write(b'{}\n')
+        sink.flush()
+    sink.close()
+    assert len(fsyncs) == expected
+
+
+def test_unknown_fsync_policy():
+    with pytest.raises(ValueError):
+        RotatingFileSink('metrics.jsonl', fsync='sometimes')
+
+
+def test_size_rotation_compresses_segments(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    sink = RotatingFileSink(path, max_bytes=100, fsync='never')
+    lines = [json.dumps(record(i)).encode() + b'\n' for i in range(10)]
+    for line in lines:
+        sink.write(line)
+    sink.close()
+
+    closed = segments(path)
+    assert sink.segments == len(closed) > 1
+    assert all(s.endswith('.gz') for s in closed)
+    for segment in closed:
+        with gzip.open(segment, 'rb') as f:
+            assert len(f.read()) <= 100
+    assert [r['i'] for r in read_all(path)] == list(range(10))
+
+
+def test_rotation_without_compression(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    sink = RotatingFileSink(path, compress=False, fsync='never')
+    sink.write(b'{"i": 0}\n')
+    segment = sink.rotate()
+    sink.close()
+    assert segments(path) == [segment] and not segment.endswith('.gz')
+    # Пустой файл не превращается в сегмент
+    assert sink.rotate() is None
+
+
+def test_time_rotation(tmp_path, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(log_writer.time, 'time', lambda: clock[0])
+    path = str(tmp_path / 'metrics.jsonl')
+    sink = RotatingFileSink(path, max_bytes=0, rotate_seconds=60, fsync='never')
+
+    sink.write(b'{"i": 0}\n')
+    clock[0] += 59
+    sink.write(b'{"i": 1}\n')
+    assert sink.segments == 0
+    clock[0] += 1
+    sink.write(b'{"i": 2}\n')
+    sink.close()
+
+    assert sink.segments == 1
+    assert [r['i'] for r in read_all(path)] == [0, 1, 2]
+
+
+def test_reopened_segment_keeps_its_age(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    # Сегмент начат два часа назад и дописывался только что (свежий mtime)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(record(0, '2025-10-21T10:00:00')) + '\n')
+        f.write(json.dumps(record(1)) + '\n')
+
+    sink = RotatingFileSink(path, rotate_seconds=3600, fsync='never')
+    sink.write(json.dumps(record(2)).encode() + b'\n')
+    sink.close()
+
+    assert sink.segments == 1
+    assert [r['i'] for r in read_all(path)] == [0, 1, 2]
+
+
+def test_reopened_segment_without_timestamp_uses_mtime(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('not json\n')
+
+    sink = RotatingFileSink(path, rotate_seconds=3600, fsync='never')
+    sink.write(b'{"i": 0}\n')
+    sink.close()
+    assert sink.segments == 0
+
+
+def test_leftover_segments_are_compressed(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    leftover = path + '.20251021-100000-000000'
+    with open(leftover, 'w', encoding='utf-8') as f:
+        f.write('{"i": 0}\n')
+
+    RotatingFileSink(path).close()
+
+    assert segments(path) == [leftover + '.gz']
+    assert read_all(path) == [{'i': 0}]
+
+
+def test_bad_record_does_not_stop_writer(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    writer = BufferedLogWriter([RotatingFileSink(path)], batch_size=3, flush_interval=5)
+    writer.write(record(0))
+    writer.write({'i': 1, 'value': {1, 2}})   # set не сериализуется в JSON
+    writer.write(record(2))
+    writer.write(record(3))
+    writer.close()
+
+    assert [r['i'] for r in read_all(path)] == [0, 2, 3]
+    assert writer.stats()['errors'] == 1
+    assert writer.stats()['written'] == 3
+
+
+def test_sink_error_does_not_stop_writer(tmp_path):
+    class BrokenSink:
+        path = 'broken'
+
+        def write(self, data):
+            raise RuntimeError('disk on fire')
+
+        def close(self):
+            pass
+
+    path = str(tmp_path / 'metrics.jsonl')
+    writer = BufferedLogWriter([BrokenSink(), RotatingFileSink(path)], batch_size=1,
+                               flush_interval=5)
+    writer.write(record(0))
+    writer.write(record(1))
+    writer.close()
+
+    assert [r['i'] for r in read_all(path)] == [0, 1]
+    assert writer.stats()['errors'] == 2
+    # До сломанного приёмника записи не дошли: в written их нет
+    assert writer.stats()['written'] == 0
+
+
+
+def test_dropped_is_counted_from_many_threads():
+    release = threading.Event()
+
+    class SlowSink:
+        path = 'slow'
+
+        def write(self, data):
+            release.wait(5)
+
+        def flush(self):
+            pass
+
+        def close(self):
+            pass
+
+    writer = BufferedLogWriter([SlowSink()], batch_size=1, flush_interval=5, queue_size=1)
+    writer.write(record(0))
+    while not writer.queue.empty():   # поток записи забрал запись и ждёт приёмник
+        time.sleep(0.001)
+    writer.write(record(1))           # очередь из одного места заполнена
+
+    def produce():
+        for i in range(2000):
+            writer.write(record(i))
+
+    threads = [threading.Thread(target=produce) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    writer.close()
+
+    assert writer.stats()['dropped'] == 16000
+    assert writer.stats()['written'] == 2
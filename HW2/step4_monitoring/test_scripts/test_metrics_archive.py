@@ -0,0 +1,133 @@
+"""Тест архива метрик: повторный compact и окна query()"""
+
+import gzip
+import json
+import os
+from datetime import datetime
+
+import pyarrow.dataset as ds
+import pytest
+
+from log_writer import RotatingFileSink
+from metrics_archive import PARTITIONING, closed_segments, compact, parse_duration, query
+
+
+def write_segment(path, records, compress=True):
+    """Закрытый сегмент, как его оставляет log_writer"""
+    segment = f"{path}.{records[0]['timestamp'].replace(':', '').replace('T', '-')}"
+    with open(segment, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return RotatingFileSink._gzip(segment) if compress else segment
+
+
+def check(timestamp, latency, success=True, target='api', endpoint='/health'):
+    return {'timestamp': timestamp, 'target': target, 'endpoint': endpoint,
+            'status_code': 200 if success else 500, 'response_time_ms': latency,
+            'success': success}
+
+
+def archived_rows(archive):
+    return ds.dataset(str(archive), format='parquet', partitioning=PARTITIONING).count_rows()
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'metrics.jsonl'), tmp_path / 'archive'
+
+
+def test_compact_is_idempotent(paths):
+    metrics, archive = paths
+    first = write_segment(metrics, [check('2025-10-21T10:00:00', 10),
+                                    check('2025-10-21T10:01:00', 20)])
+    second = write_segment(metrics, [check('2025-10-22T09:00:00', 30)])
+    # Активный файл не переносится
+    with open(metrics, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(check('2025-10-22T09:05:00', 40)) + '\n')
+
+    assert compact(metrics, str(archive)) == [(os.path.basename(first), 2),
+                                              (os.path.basename(second), 1)]
+    assert compact(metrics, str(archive)) == []
+    assert archived_rows(archive) == 3
+    assert sorted(os.listdir(archive)) == ['_compacted.json', 'date=2025-10-21',
+                                           'date=2025-10-22']
+
+
+def test_raw_segment_waits_for_gzip(paths):
+    metrics, archive = paths
+    raw = write_segment(metrics, [check('2025-10-21T10:00:00', 10)], compress=False)
+
+    # Writer ещё сжимает сегмент: не берём и не удаляем его
+    assert closed_segments(metrics) == []
+    assert compact(metrics, str(archive), delete=True) == []
+    assert os.path.exists(raw)
+
+    RotatingFileSink._gzip(raw)
+    assert compact(metrics, str(archive), delete=True) == [(os.path.basename(raw) + '.gz', 1)]
+    assert closed_segments(metrics, compressed=False) == []
+
+
+def test_compressed_later_segment_is_not_archived_twice(paths):
+    metrics, archive = paths
+    raw = write_segment(metrics, [check('2025-10-21T10:00:00', 10)], compress=False)
+
+    assert compact(metrics, str(archive), compressed=False) == [(os.path.basename(raw), 1)]
+    RotatingFileSink._gzip(raw)
+    assert compact(metrics, str(archive), compressed=False) == []
+    assert archived_rows(archive) == 1
+
+
+def test_raw_and_gz_of_one_segment_are_read_once(paths):
+    metrics, _ = paths
+    gz = write_segment(metrics, [check('2025-10-21T10:00:00', 10)])
+    # Сбой между записью .gz и удалением исходника
+    with gzip.open(gz, 'rb') as src, open(gz[:-3], 'wb') as dst:
+        dst.write(src.read())
+    assert closed_segments(metrics, compressed=False) == [gz]
+
+
+def test_old_manifest_names_with_gz_are_recognised(paths):
+    metrics, archive = paths
+    gz = write_segment(metrics, [check('2025-10-21T10:00:00', 10)])
+    os.makedirs(archive)
+    with open(archive / '_compacted.json', 'w', encoding='utf-8') as f:
+        json.dump([os.path.basename(gz)], f)
+    assert compact(metrics, str(archive)) == []
+
+
+def test_query_windows(paths):
+    metrics, archive = paths
+    write_segment(metrics, [
+        check('2025-10-21T23:58:00', 10.0),
+        check('2025-10-21T23:59:59', 30.0, success=False),
+        check('2025-10-22T00:00:00', 20.123),
+        check('2025-10-22T00:04:59', 40.456),
+        check('2025-10-22T00:05:00', 50.0, target='other'),
+        check('2025-10-22T00:10:00', 60.0),
+    ])
+    compact(metrics, str(archive))
+
+    # [start, end): запись ровно в end не попадает; окна через полночь
+    rows = query(str(archive), datetime(2025, 10, 21, 23, 55), datetime(2025, 10, 22, 0, 10))
+    assert [(r['window'], r['checks']) for r in rows] == [
+        (datetime(2025, 10, 21, 23, 55), 2),
+        (datetime(2025, 10, 22, 0, 0), 2),
+        (datetime(2025, 10, 22, 0, 5), 1),
+    ]
+    assert rows[0]['error_rate'] == 50.0
+    assert rows[0]['max'] == 30.0
+    assert rows[1]['error_rate'] == 0.0
+    assert rows[1]['max'] == 40.46
+    assert set(rows[0]) == {'window', 'checks', 'error_rate', 'p50', 'p95', 'p99', 'max'}
+
+    rows = query(str(archive), datetime(2025, 10, 21), datetime(2025, 10, 23),
+                 window='1d', target='api')
+    assert [(r['window'].day, r['checks']) for r in rows] == [(21, 2), (22, 3)]
+
+    assert query(str(archive), datetime(2025, 10, 23), datetime(2025, 10, 24)) == []
+
+
+def test_parse_duration():
+    assert parse_duration('5m') == (5, 'minute', 300)
+    with pytest.raises(ValueError):
+        parse_duration('5 minutes')
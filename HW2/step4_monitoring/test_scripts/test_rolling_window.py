@@ -0,0 +1,94 @@
+"""Тест скользящих окон: устаревание корзин и min/max против пересчёта"""
+
+import random
+
+import pytest
+import yaml
+
+from advanced_monitor import AdvancedServiceMonitor
+from rolling_window import RollingStats, RollingWindow
+
+
+def brute_force(events, window, now):
+    """Замеры в живых корзинах окна, пересчитанные с нуля"""
+    oldest = int(now // window.bucket_seconds) - len(window.slots) + 1
+    return [e for e in events if int(e[0] // window.bucket_seconds) >= oldest]
+
+
+def test_buckets_expire_after_span():
+    window = RollingWindow(60, 5, clock=lambda: 0)
+    window.record(False, 100.0, now=0)
+    window.record(True, 10.0, now=30)
+
+    assert (window.count, window.errors) == (2, 1)
+    window.refresh(now=62)
+    # Корзина [0, 5) вышла из окна, [30, 35) ещё в нём
+    assert (window.count, window.errors, window.error_rate) == (1, 0, 0.0)
+    assert (window.latency.count, window.latency.max) == (1, 10.0)
+
+    # Простой дольше окна: все корзины сброшены
+    window.refresh(now=1000)
+    assert (window.count, window.latency.count) == (0, 0)
+    assert window.stats(now=1000) == {'count': 0, 'errors': 0, 'error_rate': 0.0}
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_refresh_matches_brute_force(seed):
+    rng = random.Random(seed)
+    window = RollingWindow(60, 5, clock=lambda: 0)
+    events = []
+    now = 0.0
+    for _ in range(2000):
+        # Неравномерные паузы: и частые замеры, и простои дольше окна
+        now += rng.choice([0.1, 0.5, 2, 7, 90]) * rng.random()
+        success = rng.random() > 0.2
+        latency = rng.lognormvariate(3, 1) if rng.random() > 0.1 else None
+        window.record(success, latency, now=now)
+        events.append((now, success, latency))
+
+        if rng.random() < 0.1:
+            # Чтение без записи: часы идут вперёд и для следующих замеров
+            now += rng.random() * 10
+            window.refresh(now=now)
+            live = brute_force(events, window, now)
+            timed = [e[2] for e in live if e[2] is not None]
+            assert window.count == len(live)
+            assert window.errors == sum(not e[1] for e in live)
+            assert window.latency.count == len(timed)
+            if timed:
+                assert window.latency.min == min(timed)
+                assert window.latency.max == max(timed)
+                assert window.latency.total == pytest.approx(sum(timed))
+
+
+def test_rolling_stats_records_into_every_window():
+    clock = [0.0]
+    stats = RollingStats(clock=lambda: clock[0])
+    stats.record(False, 50.0)
+    clock[0] = 120
+    stats.record(True, 20.0)
+
+    assert stats['1m'].count == 1
+    assert stats['5m'].count == 2
+    assert stats.stats()['1h']['errors'] == 1
+
+
+def test_health_p95_does_not_use_predict_thresholds(tmp_path):
+    with open('config/monitoring_config.yaml', 'r') as f:
+        config = yaml.safe_load(f)
+    config['logging'].update(log_file=str(tmp_path / 'monitoring.log'),
+                             metrics_file=str(tmp_path / 'metrics.jsonl'))
+    path = tmp_path / 'config.yaml'
+    path.write_text(yaml.safe_dump(config), encoding='utf-8')
+
+    monitor = AdvancedServiceMonitor(str(path))
+    critical = config['thresholds']['p95_latency_ms']['critical']
+    response_warning = config['thresholds']['response_time_ms']['warning']
+    for _ in range(20):
+        monitor.windows.record(True, critical * 2)
+    monitor.last_response_time = response_warning / 2
+    try:
+        assert monitor.window_p95() > critical
+        assert monitor.get_alert_level() == "🟢 НОРМА"
+    finally:
+        monitor.writer.close()
@@ -1,143 +1,379 @@
-# dance_creator.py - создаем анимацию танца Макарена!
-import requests
-import json
-import base64
-from PIL import Image
-import io
+# dance_creator.py - создаем анимации танцев (по умолчанию - Макарена)!
+import argparse
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.animation_encoder import AnimationWriter
+from src.choreography import order_poses
+from src.pose_database import PoseDatabase, StorePoseDatabase
+from src.pose_neighbors import PoseNeighbors
+from src.pose_retrieval import TfidfRetriever
+from src.pose_store import PoseStore
+from src.renderers import HttpPoseRenderer
+
+POSE_DATABASE_PATH = "../step3_rag/poses_database.json"
+# Собирается командой: python -m src.pose_store build <json> --out <dir> --tfidf
+POSE_STORE_PATH = "../step3_rag/pose_store"
+
+
+MACARENA_QUERY = "макарен*"  # макарена, макарены, макарену...
 
 
 class DanceCreator:
-    def __init__(self):
+    def __init__(
+        self,
+        database_path=POSE_DATABASE_PATH,
+        store_path=POSE_STORE_PATH,
+        renderer=None,
+        concurrency=4,
+        timeout=10,
+    ):
         self.ollama_url = "http://localhost:11434"
         self.pose_api_url = "http://localhost:8001"
+        # Общая сессия с пулом соединений, таймаутом и повторами
+        self.renderer = renderer or HttpPoseRenderer(self.pose_api_url, timeout=timeout)
+        # Общий пул рендеринга: ограничивает число кадров в работе
+        # для всех танцев сразу
+        self.concurrency = concurrency
+        self._render_pool = ThreadPoolExecutor(concurrency, thread_name_prefix="render")
+        # Индексы строятся лениво и не потокобезопасны
+        self._index_lock = threading.RLock()
+        self.database_path = database_path
+        self.database = None
+        self.store = self.open_pose_store(store_path)
+        self.retriever = None
+        self._retriever_records = []
+        self._retriever_loads = None
+        self.neighbors = None
+        self._neighbor_records = []
+        self._neighbors_loads = None
 
     def load_pose_database(self):
-        """Загружаем базу поз из файла"""
-        with open('../step3_rag/poses_database.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
+        """Загружаем базу поз: индекс строится один раз,
+        файл перечитывается только если изменился.
+
+        Если хранилище собрано, индекс строится по его описаниям (mmap),
+        а JSON не разбирается вовсе."""
+        if self.database is None:
+            if self.store is not None:
+                self.database = StorePoseDatabase(self.store)
+            else:
+                self.database = PoseDatabase(self.database_path)
+        else:
+            self.database.refresh()
+        return self.database
+
+    def open_pose_store(self, store_path):
+        """Открываем бинарное хранилище поз (mmap), если оно собрано и свежее"""
+        if not store_path or not os.path.exists(os.path.join(store_path, "meta.json")):
+            return None
+        store = PoseStore(store_path)
+        if store.is_stale(self.database_path):
+            print("⚠️ Хранилище поз устарело, используем JSON")
+            return None
+        return store
 
-    def find_macarena_poses(self, poses_data):
-        """Ищем позы для танца Макарена"""
-        macarena_poses = []
-        for pose in poses_data:
-            if 'макарена' in pose['description'].lower():
-                macarena_poses.append(pose)
+    def find_dance_poses(self, query, database=None):
+        """Ищем позы танца по индексу описаний, затем по похожести текста"""
+        with self._index_lock:
+            database = database or self.load_pose_database()
+            dance_poses = database.search(query)
+            if not dance_poses:
+                # Опечатки, синонимы, английские описания
+                dance_poses = self.find_similar_poses(query.replace("*", ""))
 
         # Выводим найденные позы для отладки
-        print("🔍 Найденные позы Макарены:")
-        for i, pose in enumerate(macarena_poses):
+        print(f"🔍 Найденные позы '{query}':")
+        for i, pose in enumerate(dance_poses):
             print(f"   {i}: {pose['description']}")
 
-        return macarena_poses
+        return dance_poses
+
+    def find_macarena_poses(self, poses_data=None):
+        """Ищем позы для танца Макарена по индексу описаний.
+
+        poses_data - список поз, как раньше, или готовый PoseDatabase;
+        без аргумента ищем в базе (хранилище) самого DanceCreator"""
+        database = poses_data
+        if isinstance(poses_data, list):
+            database = PoseDatabase()
+            database.add_records(poses_data)
+        return self.find_dance_poses(MACARENA_QUERY, database)
+
+    def find_similar_poses(self, query, k=20, min_score=0.3):
+        """Ищем позы по близости описаний (TF-IDF по n-граммам символов)"""
+        with self._index_lock:
+            return self._find_similar_poses(query, k, min_score)
+
+    def _find_similar_poses(self, query, k, min_score):
+        if self.store is not None:
+            if self.retriever is None:
+                tfidf_meta = os.path.join(self.store.path, "tfidf_meta.json")
+                self.retriever = (
+                    TfidfRetriever.load(self.store.path)
+                    if os.path.exists(tfidf_meta)
+                    else TfidfRetriever().fit(self.store.descriptions())
+                )
+            hits = self.retriever.query(query, k=k, min_score=min_score)[0]
+            return [self.store.record(i) for i, _ in hits]
+
+        database = self.load_pose_database()
+        # Индекс перестраивается только после перезагрузки базы
+        if self.retriever is None or self._retriever_loads != database.stats["loads"]:
+            self._retriever_records = database.records
+            self.retriever = TfidfRetriever().fit(
+                r["description"] for r in self._retriever_records
+            )
+            self._retriever_loads = database.stats["loads"]
+
+        hits = self.retriever.query(query, k=k, min_score=min_score)[0]
+        return [self._retriever_records[i] for i, _ in hits]
+
+    def find_nearest_poses(self, pose_data, k=5):
+        """Ищем похожие позы по координатам суставов (KD-дерево)"""
+        with self._index_lock:
+            return self._find_nearest_poses(pose_data, k)
+
+    def _find_nearest_poses(self, pose_data, k):
+        if self.store is not None:
+            if self.neighbors is None:
+                # Координаты берутся прямо из mmap, без разбора JSON
+                self.neighbors = PoseNeighbors(self.store.coords, normalize=True)
+            _, indices = self.neighbors.knn(pose_data, k=k)
+            return [self.store.record(i) for i in indices[0]]
+
+        database = self.load_pose_database()
+        if self.neighbors is None or self._neighbors_loads != database.stats["loads"]:
+            self._neighbor_records = database.records
+            # Нормировка по торсу: сравниваем форму позы, а не её положение
+            self.neighbors = PoseNeighbors.from_poses(
+                (r["pose"] for r in self._neighbor_records), normalize=True
+            )
+            self._neighbors_loads = database.stats["loads"]
+
+        _, indices = self.neighbors.knn(pose_data, k=k)
+        return [self._neighbor_records[i] for i in indices[0]]
 
     def create_pose_image(self, pose_data):
         """Создаем изображение для позы"""
         try:
-            response = requests.post(
-                f"{self.pose_api_url}/visualize",
-                json={"pose": pose_data}
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                # Декодируем base64 в изображение
-                img_data = base64.b64decode(result['image'])
-                return Image.open(io.BytesIO(img_data))
-            else:
-                print(f"❌ Ошибка визуализации позы: {response.status_code}")
-                return None
-
+            img = self.renderer.render(pose_data)
+            if img is None:
+                print("❌ Ошибка визуализации позы")
+            return img
         except Exception as e:
             print(f"❌ Ошибка подключения к Pose API: {e}")
             return None
 
-    def create_macarena_animation(self):
-        """Создаем анимацию танца Макарена"""
-        print("💃 Создаем танец Макарена...")
-
-        # 1. Загружаем базу поз
-        poses = self.load_pose_database()
-        print(f"📚 Загружено {len(poses)} поз")
-
-        # 2. Ищем позы для Макарены
-        macarena_poses = self.find_macarena_poses(poses)
-
-        if not macarena_poses:
-            print("❌ Не найдены позы для Макарены!")
-            return False
+    def render_sequence(self, sequence):
+        """Рендерим позы параллельно, отдаём кадры по порядку.
+
+        В работе не больше 2 * concurrency кадров: память не растёт
+        с длиной танца, а кадры сразу уходят в AnimationWriter.
+        """
+        pending = deque()
+        poses = iter(enumerate(sequence))
+        window = 2 * self.concurrency
+        while True:
+            for i, pose in poses:
+                pending.append(
+                    (
+                        i,
+                        pose,
+                        self._render_pool.submit(self.create_pose_image, pose["pose"]),
+                    )
+                )
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return
+            i, pose, future = pending.popleft()
+            img = future.result()
+            if not img:
+                # Подменяем кадр ближайшей похожей позой из базы
+                # (через тот же пул, чтобы не превышать concurrency)
+                for similar in self.find_nearest_poses(pose["pose"], k=3)[1:]:
+                    img = self._render_pool.submit(
+                        self.create_pose_image, similar["pose"]
+                    ).result()
+                    if img:
+                        description = similar["description"][:30]
+                        print(f"   🔁 Поза {i + 1} заменена похожей: {description}")
+                        break
+            yield i, pose, img
+
+    def create_dance_animation(self, query, output_path, duration=800):
+        """Создаем анимацию танца по запросу к базе поз.
+
+        Возвращает {'path', 'frames', 'timings'} или None.
+        """
+        print(f"💃 Создаем танец '{query}'...")
+        timings = {}
+        started = time.perf_counter()
+
+        # 1. Ищем позы танца
+        dance_poses = self.find_dance_poses(query)
+        timings["search"] = time.perf_counter() - started
+        if not dance_poses:
+            print(f"❌ Не найдены позы для '{query}'!")
+            return None
 
-        print(f"🎯 Найдено {len(macarena_poses)} поз для Макарены")
+        print(f"🎯 Найдено {len(dance_poses)} поз для '{query}'")
 
-        # 3. Используем ВСЕ найденные позы Макарены
-        sequence = macarena_poses
+        # 2. Используем ВСЕ найденные позы в порядке минимального
+        # перемещения суставов; первая поза остаётся первой
+        stage = time.perf_counter()
+        order = order_poses([p["pose"] for p in dance_poses], start=0)
+        sequence = [dance_poses[i] for i in order]
+        timings["order"] = time.perf_counter() - stage
 
         print(f"🎬 Создаем последовательность из {len(sequence)} поз...")
 
-        # 4. Создаем изображения для каждой позы
-        images = []
-        for i, pose in enumerate(sequence):
-            print(f"  🖼️ Создаем позу {i + 1}/{len(sequence)}: {pose['description'][:30]}...")
-            img = self.create_pose_image(pose['pose'])
-            if img:
-                images.append(img)
-            else:
-                print(f"   ❌ Не удалось создать изображение для позы {i + 1}")
-
-        if len(images) < 2:
-            print(f"❌ Создано только {len(images)} изображений, нужно минимум 2 для анимации!")
-            return False
-
-        # 5. Сохраняем как GIF анимацию
-        print("📹 Сохраняем GIF анимацию...")
-
+        # 3. Рендерим кадры и сразу дописываем их в GIF: общая палитра
+        # + только изменившиеся области кадров
+        timings["render"] = timings["encode"] = 0.0
+        frames = 0
+        tmp_path = output_path + ".tmp"
         try:
-            # Сохраняем первое изображение и добавляем остальные
-            images[0].save(
-                'macarena_dance.gif',
-                save_all=True,
-                append_images=images[1:],
-                duration=800,  # увеличим длительность для лучшей видимости
-                loop=0,  # бесконечный цикл
-                optimize=True
-            )
+            with open(tmp_path, "wb") as f:
+                with AnimationWriter(
+                    f, format="gif", duration=duration, loop=0
+                ) as writer:
+                    stage = time.perf_counter()
+                    for i, pose, img in self.render_sequence(sequence):
+                        timings["render"] += time.perf_counter() - stage
+                        description = pose["description"][:30]
+                        print(f"  🖼️ Поза {i + 1}/{len(sequence)}: {description}...")
+                        stage = time.perf_counter()
+                        if img:
+                            writer.add_frame(img)
+                            frames += 1
+                        else:
+                            print(
+                                f"   ❌ Не удалось создать изображение для позы {i + 1}"
+                            )
+                        timings["encode"] += time.perf_counter() - stage
+                        stage = time.perf_counter()
+
+            if frames < 2:
+                print(
+                    f"❌ Создано только {frames} изображений, "
+                    "нужно минимум 2 для анимации!"
+                )
+                return None
+            os.replace(tmp_path, output_path)
+        except Exception as e:
+            print(f"❌ Ошибка при сохранении GIF: {e}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        timings["total"] = time.perf_counter() - started
+        print(f"✅ Анимация сохранена как '{output_path}'!")
+        print(f"📊 Размер файла: {os.path.getsize(output_path)} байт")
+        print(
+            "⏱️ "
+            + " | ".join(f"{name}: {value:.2f}s" for name, value in timings.items())
+        )
+        return {"path": output_path, "frames": frames, "timings": timings}
+
+    def create_dances(self, queries, output_dir=".", parallel=2):
+        """Создаем несколько танцев параллельно; рендеринг делит общий пул"""
+        os.makedirs(output_dir, exist_ok=True)
+        with ThreadPoolExecutor(parallel, thread_name_prefix="dance") as pool:
+            futures = {
+                query: pool.submit(
+                    self.create_dance_animation,
+                    query,
+                    os.path.join(output_dir, dance_filename(query)),
+                )
+                for query in queries
+            }
+            return {query: future.result() for query, future in futures.items()}
 
-            print("✅ Анимация сохранена как 'macarena_dance.gif'!")
+    def create_macarena_animation(self):
+        """Создаем анимацию танца Макарена"""
+        return (
+            self.create_dance_animation(MACARENA_QUERY, "macarena_dance.gif")
+            is not None
+        )
 
-            # Показываем размер файла
-            file_size = os.path.getsize('macarena_dance.gif')
-            print(f"📊 Размер файла: {file_size} байт")
+    def close(self):
+        self._render_pool.shutdown()
+        self.renderer.close()
 
-            return True
-        except Exception as e:
-            print(f"❌ Ошибка при сохранении GIF: {e}")
-            return False
+
+def dance_filename(query):
+    """'макарен*' -> 'макарен_dance.gif'"""
+    name = "".join(c if c.isalnum() else "_" for c in query.lower()).strip("_")
+    return f"{name or 'dance'}_dance.gif"
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Создание анимаций танцев из базы поз")
+    parser.add_argument(
+        "dances",
+        nargs="*",
+        help="запросы к базе поз, например 'макарен*' \"танец робота\"",
+    )
+    parser.add_argument("--out-dir", default=".", help="папка для GIF")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="одновременных запросов к Pose API"
+    )
+    parser.add_argument(
+        "--parallel", type=int, default=2, help="одновременно создаваемых танцев"
+    )
+    args = parser.parse_args()
+
     print("=" * 50)
-    print("🕺 СОЗДАТЕЛЬ ТАНЦЕВ - ТАНЕЦ МАКАРЕНА")
+    if args.dances:
+        print(f"🕺 СОЗДАТЕЛЬ ТАНЦЕВ - {len(args.dances)} ТАНЦ(ЕВ)")
+    else:
+        print("🕺 СОЗДАТЕЛЬ ТАНЦЕВ - ТАНЕЦ МАКАРЕНА")
     print("=" * 50)
 
-    creator = DanceCreator()
+    creator = DanceCreator(concurrency=args.concurrency)
 
     # Проверяем сервисы
     print("\n🔍 Проверяем сервисы...")
     try:
         # Проверяем Pose API
-        health_response = requests.get(f"{creator.pose_api_url}/health")
+        health_response = requests.get(f"{creator.pose_api_url}/health", timeout=5)
         print(f"✅ Pose API: {health_response.status_code}")
 
         # Проверяем Ollama
-        ollama_response = requests.get(f"{creator.ollama_url}/api/tags")
+        ollama_response = requests.get(f"{creator.ollama_url}/api/tags", timeout=5)
         print(f"✅ Ollama: {ollama_response.status_code}")
     except Exception as e:
         print(f"❌ Ошибка проверки сервисов: {e}")
+        creator.close()
         return
 
-    # Создаем анимацию
     print("\n" + "=" * 30)
-    success = creator.create_macarena_animation()
+    try:
+        if args.dances:
+            # Несколько танцев за один запуск
+            results = creator.create_dances(args.dances, args.out_dir, args.parallel)
+            for query, result in results.items():
+                if result:
+                    print(
+                        f"✅ '{query}': {result['path']} ({result['frames']} кадров,"
+                        f" {result['timings']['total']:.2f}s)"
+                    )
+                else:
+                    print(f"❌ '{query}': не удалось создать анимацию")
+            return
+
+        # Создаем анимацию
+        success = creator.create_macarena_animation()
+    finally:
+        creator.close()
 
     if success:
         print("\n🎉 ТАНЕЦ МАКАРЕНА УСПЕШНО СОЗДАН!")
@@ -145,7 +381,7 @@ def main():
         print("🎯 Задание выполнено!")
 
         # Проверяем, что файл действительно создан
-        if os.path.exists('macarena_dance.gif'):
+        if os.path.exists("macarena_dance.gif"):
             print("✅ Файл 'macarena_dance.gif' найден в папке проекта!")
         else:
             print("❌ Файл 'macarena_dance.gif' не найден!")
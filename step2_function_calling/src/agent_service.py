@@ -0,0 +1,385 @@
+"""Multi-session HTTP service around PoseAgent.
+
+Сессии живут в LRU/TTL-хранилище с ограничением по числу и по памяти,
+вытесненные сессии могут сбрасываться на диск. Все сессии разделяют один
+OpenAI-клиент, один рендерер (пул соединений к Pose API) и один пул потоков.
+Ходы одной сессии сериализуются блокировкой.
+
+    uvicorn src.agent_service:app --port 8002
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import anyio
+from fastapi import FastAPI, HTTPException, Response
+from openai import OpenAI
+from pydantic import BaseModel
+
+from .memory import ConversationMemory
+from .pose_agent import PoseAgent
+from .pose_library import PoseLibrary
+from .renderers import HttpPoseRenderer, InProcessPoseRenderer
+
+MEDIA_TYPES = {"gif": "image/gif", "webp": "image/webp", "apng": "image/apng"}
+
+
+class Session:
+    def __init__(self, session_id: str, agent: PoseAgent):
+        self.session_id = session_id
+        self.agent = agent
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.size_bytes = 0
+        # Сколько запросов держат сессию: закреплённая сессия не вытесняется
+        self.pins = 0
+        # Удалена во время хода: агент закрывается после последнего release()
+        self.deleted = False
+
+    def touch(self):
+        self.last_used = time.monotonic()
+        self.size_bytes = self.agent.memory.size_bytes()
+
+
+class SessionStore:
+    """LRU/TTL-хранилище сессий с лимитом по памяти и сбросом на диск.
+
+    Файлы сброса пишутся и читаются вне общей блокировки: вытесненное
+    состояние ждёт записи в _pending и при повторном запросе берётся
+    оттуда, а новая сессия восстанавливается с диска под своей
+    блокировкой, до первого хода.
+    """
+
+    def __init__(
+        self,
+        agent_factory: Callable[[], PoseAgent],
+        max_sessions: int = 1000,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        spill_dir: Optional[str] = None,
+    ):
+        self.agent_factory = agent_factory
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Порядок записи и удаления файлов сброса; общую блокировку не держит
+        self._io_lock = threading.Lock()
+        self.stats = {"created": 0, "evicted": 0, "expired": 0, "restored": 0}
+
+    def _spill_path(self, session_id: str) -> Optional[Path]:
+        if self.spill_dir is None:
+            return None
+        # session_id приходит из URL: имя файла - хеш, разные id не совпадут
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+        return self.spill_dir / f"{digest}.json"
+
+    def _write_spills(self):
+        """Записать вытесненные состояния на диск (вне общей блокировки)"""
+        with self._io_lock:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        return
+                    session_id, state = next(iter(self._pending.items()))
+                path = self._spill_path(session_id)
+                tmp = path.with_suffix(".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(tmp, path)
+                with self._lock:
+                    written = self._pending.get(session_id) is state
+                    if written:
+                        del self._pending[session_id]
+                    stale = session_id not in self._pending
+                if not written and stale:
+                    # Состояние уже взяли из памяти (get) или сессию удалили
+                    path.unlink(missing_ok=True)
+
+    def _restore(self, session: Session):
+        """Прочитать сброшенную историю; вызывается под session.lock"""
+        path = self._spill_path(session.session_id)
+        if path is None:
+            return
+        with self._io_lock:
+            if not path.exists():
+                return
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            path.unlink()
+        session.agent.memory.load_state(state)
+        with self._lock:
+            self.stats["restored"] += 1
+            old_size = session.size_bytes
+            session.touch()
+            if self._sessions.get(session.session_id) is session:
+                self._bytes += session.size_bytes - old_size
+
+    def _drop(self, session: Session, spill: bool):
+        del self._sessions[session.session_id]
+        self._bytes -= session.size_bytes
+        if spill and self.spill_dir is not None:
+            self._pending[session.session_id] = session.agent.memory.state()
+        session.agent.close()
+
+    def _evict(self):
+        now = time.monotonic()
+        for session in list(self._sessions.values()):
+            if session.pins or session.lock.locked():
+                continue
+            if now - session.last_used > self.ttl_seconds:
+                self._drop(session, spill=False)
+                self.stats["expired"] += 1
+            elif (
+                len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+            ):
+                self._drop(session, spill=True)
+                self.stats["evicted"] += 1
+            else:
+                break
+
+    def get(self, session_id: str) -> Session:
+        """Сессия, закреплённая до release(): её не вытеснят, пока идёт ход"""
+        restore = False
+        with self._lock:
+            session = self._sessions.get(session_id)
+            created = session is None
+            if created:
+                session = Session(session_id, self.agent_factory())
+                state = self._pending.pop(session_id, None)
+                if state is not None:
+                    # Ещё не записано на диск: берём из памяти
+                    session.agent.memory.load_state(state)
+                    self.stats["restored"] += 1
+                elif self.spill_dir is not None:
+                    # Чтение с диска - после общей блокировки; ходы ждут его
+                    session.lock.acquire()
+                    restore = True
+                session.touch()
+                self._sessions[session_id] = session
+                self._bytes += session.size_bytes
+                self.stats["created"] += 1
+            session.pins += 1
+            self._sessions.move_to_end(session_id)
+            if created:
+                self._evict()
+        try:
+            if restore:
+                self._restore(session)
+        finally:
+            if restore:
+                session.lock.release()
+        self._write_spills()
+        return session
+
+    def release(self, session: Session):
+        """Снять закрепление и пересчитать размер сессии после хода"""
+        with self._lock:
+            session.pins -= 1
+            if session.deleted:
+                if not session.pins:
+                    session.agent.close()
+                return
+            old_size = session.size_bytes
+            session.touch()
+            if self._sessions.get(session.session_id) is session:
+                self._bytes += session.size_bytes - old_size
+                self._evict()
+        self._write_spills()
+
+    @contextmanager
+    def checkout(self, session_id: str) -> Iterator[Session]:
+        session = self.get(session_id)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def delete(self, session_id: str):
+        """Удалить сессию; идущий ход доработает, агент закроется после него"""
+        with self._lock:
+            self._pending.pop(session_id, None)
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.size_bytes
+                if session.pins or session.lock.locked():
+                    session.deleted = True
+                else:
+                    session.agent.close()
+        path = self._spill_path(session_id)
+        if path is not None:
+            with self._io_lock:
+                path.unlink(missing_ok=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "bytes": self._bytes, **self.stats}
+
+
+class ArtifactStore:
+    """Последние анимации в памяти, LRU с лимитом по байтам"""
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes, media_type: str) -> str:
+        artifact_id = uuid.uuid4().hex
+        with self._lock:
+            self._items[artifact_id] = (data, media_type)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, (old, _) = self._items.popitem(last=False)
+                self._bytes -= len(old)
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[tuple]:
+        with self._lock:
+            return self._items.get(artifact_id)
+
+
+class ChatRequest(BaseModel):
+    message: str
+    force_llm: bool = False
+    max_iterations: int = 5
+
+
+def create_app(
+    llm_base_url: str = "http://localhost:11434/v1",
+    pose_api_url: str = "http://localhost:8001",
+    model: str = "qwen2.5:1.5b",
+    renderer: str = "http",
+    animation_format: str = "gif",
+    max_sessions: int = 1000,
+    max_session_bytes: int = 256 * 1024 * 1024,
+    session_ttl_seconds: float = 3600,
+    spill_dir: Optional[str] = None,
+    worker_threads: int = 200,
+    lock_timeout_seconds: float = 120,
+) -> FastAPI:
+    # Общие ресурсы для всех сессий
+    client = OpenAI(base_url=llm_base_url, api_key="ollama", max_retries=1)
+    shared_renderer = (
+        InProcessPoseRenderer(output="numpy")
+        if renderer == "inprocess"
+        else HttpPoseRenderer(pose_api_url)
+    )
+    library = PoseLibrary()
+    executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="agent-service")
+
+    def agent_factory() -> PoseAgent:
+        return PoseAgent(
+            model=model,
+            client=client,
+            renderer=shared_renderer,
+            pose_library=library,
+            executor=executor,
+            animation_format=animation_format,
+            memory=ConversationMemory(),
+        )
+
+    sessions = SessionStore(
+        agent_factory,
+        max_sessions=max_sessions,
+        max_bytes=max_session_bytes,
+        ttl_seconds=session_ttl_seconds,
+        spill_dir=spill_dir,
+    )
+    artifacts = ArtifactStore()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # chat блокирующий: sync-эндпоинты выполняются в пуле потоков anyio
+        anyio.to_thread.current_default_thread_limiter().total_tokens = worker_threads
+        yield
+        executor.shutdown(wait=False)
+        shared_renderer.close()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.sessions = sessions
+    app.state.artifacts = artifacts
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "healthy"}
+
+    @app.get("/stats")
+    def stats():
+        return {"sessions": sessions.snapshot()}
+
+    @app.post("/sessions/{session_id}/chat")
+    def chat(session_id: str, request: ChatRequest):
+        with sessions.checkout(session_id) as session:
+            if not session.lock.acquire(timeout=lock_timeout_seconds):
+                raise HTTPException(409, "Another turn is in progress for this session")
+            try:
+                result = session.agent.chat(
+                    request.message,
+                    max_iterations=request.max_iterations,
+                    force_llm=request.force_llm,
+                )
+            finally:
+                session.lock.release()
+
+        response = {k: v for k, v in result.items() if k != "image"}
+        if result.get("image"):
+            artifact_id = artifacts.put(
+                base64.b64decode(result["image"]), MEDIA_TYPES[animation_format]
+            )
+            response["artifact_id"] = artifact_id
+            response["artifact_url"] = f"/artifacts/{artifact_id}"
+        return response
+
+    @app.post("/sessions/{session_id}/reset")
+    def reset(session_id: str):
+        with sessions.checkout(session_id) as session, session.lock:
+            session.agent.reset_conversation()
+        return {"success": True}
+
+    @app.delete("/sessions/{session_id}")
+    def delete(session_id: str):
+        sessions.delete(session_id)
+        return {"success": True}
+
+    @app.get("/artifacts/{artifact_id}")
+    def get_artifact(artifact_id: str):
+        item = artifacts.get(artifact_id)
+        if item is None:
+            raise HTTPException(404, "Artifact not found")
+        data, media_type = item
+        return Response(content=data, media_type=media_type)
+
+    return app
+
+
+app = create_app(
+    llm_base_url=os.getenv("LLM_BASE_URL", "http://localhost:11434/v1"),
+    pose_api_url=os.getenv("POSE_API_URL", "http://localhost:8001"),
+    model=os.getenv("LLM_MODEL", "qwen2.5:1.5b"),
+    renderer=os.getenv("POSE_RENDERER", "http"),
+    spill_dir=os.getenv("SESSION_SPILL_DIR") or None,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8002)
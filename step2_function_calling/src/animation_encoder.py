@@ -0,0 +1,215 @@
+"""Animation encoder for pose frames: shared palette, frame-diff cropping.
+
+Кадры pose_api рисуются фиксированным набором цветов на белом фоне, поэтому
+вместо независимой квантизации каждого кадра используется одна глобальная
+палитра: цвета скелета и их сглаженные переходы к белому. В GIF каждый кадр
+хранит только изменившийся прямоугольник, неизменные пиксели внутри него
+прозрачны. GIF пишется потоково, кадр за кадром; WebP и APNG собираются
+средствами Pillow.
+"""
+import io
+import struct
+from typing import BinaryIO, List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+FORMATS = ("gif", "webp", "apng")
+
+BACKGROUND = (255, 255, 255)
+# Цвета из pose_api.draw_pose: туловище, голова, правая и левая сторона
+SKELETON_COLORS = ("#4A90E2", "#FFD700", "#E74C3C", "#2ECC71")
+TRANSPARENT_INDEX = 0
+
+Frame = Union[Image.Image, np.ndarray]
+
+
+def _hex_to_rgb(color: str) -> tuple:
+    color = color.lstrip("#")
+    return tuple(int(color[i : i + 2], 16) for i in (0, 2, 4))
+
+
+def build_palette(
+    colors: Sequence[str] = SKELETON_COLORS, steps: int = 16
+) -> np.ndarray:
+    """Палитра: фон и steps оттенков перехода каждого цвета к фону.
+
+    16 оттенков хватает для сглаживания matplotlib, а плотная палитра хуже
+    сжимается LZW и хуже работает с приближённым поиском цвета в Pillow.
+    """
+    background = np.array(BACKGROUND, dtype=np.float64)
+    palette = [background]
+    for color in colors:
+        rgb = np.array(_hex_to_rgb(color), dtype=np.float64)
+        for t in np.linspace(1.0, 0.0, steps, endpoint=False):
+            palette.append(background + (rgb - background) * t)
+    return np.clip(np.rint(palette), 0, 255).astype(np.uint8)[:255]
+
+
+class _Quantizer:
+    """Отображение RGB -> индекс глобальной палитры (индекс 0 - прозрачный)"""
+
+    def __init__(self, palette: np.ndarray):
+        self.palette = palette
+        padded = np.vstack([palette, np.repeat(palette[:1], 256 - len(palette), 0)])
+        self._palette_image = Image.new("P", (1, 1))
+        self._palette_image.putpalette(padded.tobytes())
+        # Индексы quantize сдвигаются на 1, дубликаты фона -> фон
+        self._lut = np.array(
+            [i + 1 if i < len(palette) else 1 for i in range(256)], dtype=np.uint8
+        )
+        self.gif_palette = np.vstack([np.zeros((1, 3), np.uint8), padded[:255]])
+
+    def __call__(self, frame: Frame) -> np.ndarray:
+        image = frame if isinstance(frame, Image.Image) else Image.fromarray(frame)
+        if image.mode == "RGBA":
+            flattened = Image.new("RGB", image.size, BACKGROUND)
+            flattened.paste(image, mask=image.getchannel("A"))
+            image = flattened
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        indexed = image.quantize(palette=self._palette_image, dither=Image.Dither.NONE)
+        return self._lut[np.asarray(indexed)]
+
+
+def _to_rgba(frame: Frame) -> Image.Image:
+    image = frame if isinstance(frame, Image.Image) else Image.fromarray(frame)
+    return image if image.mode == "RGBA" else image.convert("RGBA")
+
+
+class AnimationWriter:
+    """Пишет анимацию кадр за кадром.
+
+    Для GIF кадр сразу кодируется в fp, в памяти остаётся только предыдущий
+    индексированный кадр. Для WebP и APNG кадры копятся до close(): APNG
+    хранится в общей палитре, WebP - без потерь в RGBA.
+    """
+
+    def __init__(
+        self,
+        fp: BinaryIO,
+        format: str = "gif",
+        duration: int = 500,
+        loop: int = 0,
+        palette: Optional[np.ndarray] = None,
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown animation format: {format}")
+
+        self.fp = fp
+        self.format = format
+        self.duration = duration
+        self.loop = loop
+        self.frames = 0
+        self._quantize = _Quantizer(build_palette() if palette is None else palette)
+        self._previous: Optional[np.ndarray] = None
+        self._buffered: List[Image.Image] = []
+
+    def _write_gif_header(self, width: int, height: int):
+        self.fp.write(
+            b"GIF89a"
+            + struct.pack("<HHBBB", width, height, 0xF7, TRANSPARENT_INDEX, 0)
+            + self._quantize.gif_palette.tobytes()
+            # NETSCAPE2.0: число повторов
+            + b"!\xff\x0bNETSCAPE2.0\x03\x01"
+            + struct.pack("<H", self.loop)
+            + b"\x00"
+        )
+
+    def _write_gif_frame(self, indexed: np.ndarray, x: int, y: int):
+        image = Image.frombytes(
+            "P", (indexed.shape[1], indexed.shape[0]), indexed.tobytes()
+        )
+        params = {"duration": self.duration, "disposal": 1}
+        if self._previous is not None:
+            params["transparency"] = TRANSPARENT_INDEX
+        for chunk in GifImagePlugin.getdata(image, offset=(x, y), **params):
+            self.fp.write(chunk)
+
+    def _indexed_image(self, indexed: np.ndarray) -> Image.Image:
+        height, width = indexed.shape
+        image = Image.frombytes("P", (width, height), indexed.tobytes())
+        image.putpalette(self._quantize.gif_palette.tobytes())
+        return image
+
+    def add_frame(self, frame: Frame):
+        if self.format == "webp":
+            self._buffered.append(_to_rgba(frame))
+            self.frames += 1
+            return
+        if self.format == "apng":
+            # Палитровый PNG заметно меньше RGBA при той же картинке
+            self._buffered.append(self._indexed_image(self._quantize(frame)))
+            self.frames += 1
+            return
+
+        indexed = self._quantize(frame)
+        if self._previous is None:
+            self._write_gif_header(indexed.shape[1], indexed.shape[0])
+            self._write_gif_frame(indexed, 0, 0)
+        else:
+            if indexed.shape != self._previous.shape:
+                raise ValueError("All frames must have the same size")
+            changed = indexed != self._previous
+            if changed.any():
+                rows = np.flatnonzero(changed.any(axis=1))
+                cols = np.flatnonzero(changed.any(axis=0))
+                y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+            else:
+                # Кадр не изменился: 1 прозрачный пиксель держит длительность
+                y0, y1, x0, x1 = 0, 1, 0, 1
+            patch = indexed[y0:y1, x0:x1].copy()
+            patch[~changed[y0:y1, x0:x1]] = TRANSPARENT_INDEX
+            self._write_gif_frame(patch, int(x0), int(y0))
+
+        self._previous = indexed
+        self.frames += 1
+
+    def close(self):
+        if self.format == "gif":
+            if self._previous is not None:
+                self.fp.write(b";")
+            return
+        if not self._buffered:
+            return
+
+        first, rest = self._buffered[0], self._buffered[1:]
+        if self.format == "webp":
+            first.save(
+                self.fp,
+                format="WEBP",
+                save_all=True,
+                append_images=rest,
+                duration=self.duration,
+                loop=self.loop,
+                lossless=True,
+                method=4,
+            )
+        else:
+            first.save(
+                self.fp,
+                format="PNG",
+                save_all=True,
+                append_images=rest,
+                duration=self.duration,
+                loop=self.loop,
+                disposal=0,
+                blend=0,
+            )
+        self._buffered = []
+
+    def __enter__(self) -> "AnimationWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def encode_animation(
+    frames: Sequence[Frame], format: str = "gif", duration: int = 500, loop: int = 0
+) -> bytes:
+    buffer = io.BytesIO()
+    with AnimationWriter(buffer, format=format, duration=duration, loop=loop) as w:
+        for frame in frames:
+            w.add_frame(frame)
+    return buffer.getvalue()
@@ -0,0 +1,324 @@
+"""Batch generation of animations from a JSONL file of prompts.
+
+Каждая строка входного файла - {"prompt": "..."} или {"action": "wave"}
+(необязательно с "id") либо просто строка JSON. Запросы выполняются
+параллельно: число одновременных ходов агента (и запросов к LLM) ограничено
+--concurrency, число одновременных рендеров - --render-concurrency.
+Анимации пишутся в --out, выполненные элементы - в manifest.jsonl, поэтому
+повторный запуск продолжает с места остановки. В конце пишется report.json.
+
+    python -m src.batch_generate prompts.jsonl --out animations \\
+        --concurrency 4 --renderer inprocess
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from openai import OpenAI
+
+from .pose_agent import PoseAgent
+from .pose_codec import ENCODINGS
+from .pose_library import PoseLibrary
+from .renderers import HttpPoseRenderer, InProcessPoseRenderer, PoseRenderer
+
+MANIFEST = "manifest.jsonl"
+REPORT = "report.json"
+
+
+class BoundedRenderer(PoseRenderer):
+    """Ограничивает число одновременных рендеров общего рендерера"""
+
+    def __init__(self, renderer: PoseRenderer, limit: int):
+        self.renderer = renderer
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def render(self, pose):
+        with self._slots:
+            return self.renderer.render(pose)
+
+    def close(self):
+        self.renderer.close()
+
+
+def file_stem(item_id: str) -> str:
+    """id -> имя файла: только безопасные символы, разные id - разные имена.
+
+    Если пришлось что-то выбросить или обрезать, добавляется хеш исходного
+    id: иначе "pose 1" и "pose1" писали бы в один файл.
+    """
+    safe = "".join(c for c in item_id if c.isalnum() or c in "-_")
+    if safe == item_id and len(safe) <= 128:
+        return safe
+    return f"{safe[:111]}-{hashlib.sha1(item_id.encode()).hexdigest()[:16]}"
+
+
+def load_items(path: str) -> List[Dict[str, Any]]:
+    """Прочитать JSONL; id по умолчанию - хеш текста запроса"""
+    items = []
+    seen: Dict[str, str] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            text = record.get("prompt") or record.get("action")
+            if not text:
+                raise ValueError(f"{path}:{line_number}: expected prompt or action")
+
+            if record.get("id"):
+                raw_id = str(record["id"])
+            else:
+                # Одинаковые запросы без id - один и тот же элемент
+                raw_id = hashlib.sha1(text.encode()).hexdigest()
+                if raw_id in seen:
+                    continue
+            item_id = file_stem(raw_id)
+            if item_id in seen:
+                raise ValueError(
+                    f"{path}:{line_number}: duplicate id {raw_id!r} "
+                    f"(file name {item_id!r} is taken by {seen[item_id]!r})"
+                )
+            seen[item_id] = raw_id
+            items.append({**record, "id": item_id, "text": text})
+    return items
+
+
+def load_manifest(out_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Успешно выполненные элементы прошлых запусков"""
+    done = {}
+    path = out_dir / MANIFEST
+    if not path.exists():
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Недописанная строка после аварийной остановки
+                continue
+            if entry.get("status") == "ok":
+                done[entry["id"]] = entry
+    return done
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        agent_factory,
+        out_dir: str,
+        animation_format: str = "gif",
+        concurrency: int = 4,
+        retries: int = 1,
+        force_llm: bool = False,
+    ):
+        self.agent_factory = agent_factory
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.animation_format = animation_format
+        self.concurrency = concurrency
+        self.retries = retries
+        self.force_llm = force_llm
+        self._local = threading.local()
+        self._agents: List[PoseAgent] = []
+        self._manifest_lock = threading.Lock()
+
+    def _agent(self) -> PoseAgent:
+        # Один агент на рабочий поток: история между элементами сбрасывается
+        agent = getattr(self._local, "agent", None)
+        if agent is None:
+            agent = self._local.agent = self.agent_factory()
+            with self._manifest_lock:
+                self._agents.append(agent)
+        return agent
+
+    def _record(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._manifest_lock:
+            with open(self.out_dir / MANIFEST, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+
+    def _generate(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        agent = self._agent()
+        start = time.perf_counter()
+        error = None
+        for attempt in range(self.retries + 1):
+            agent.reset_conversation()
+            try:
+                result = agent.chat(
+                    item["text"], force_llm=self.force_llm and "prompt" in item
+                )
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+            if not result.get("image"):
+                error = result.get("text") or "No animation produced"
+                continue
+
+            path = self.out_dir / f"{item['id']}.{self.animation_format}"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(base64.b64decode(result["image"]))
+            os.replace(tmp, path)
+            return {
+                "id": item["id"],
+                "text": item["text"],
+                "status": "ok",
+                "file": path.name,
+                "source": result.get("source"),
+                "attempts": attempt + 1,
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+
+        return {
+            "id": item["id"],
+            "text": item["text"],
+            "status": "failed",
+            "error": error,
+            "attempts": self.retries + 1,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def run(self, items: List[Dict[str, Any]], verbose: bool = True) -> Dict[str, Any]:
+        done = load_manifest(self.out_dir)
+        pending = [
+            item
+            for item in items
+            if item["id"] not in done
+            or not (self.out_dir / done[item["id"]]["file"]).exists()
+        ]
+        if verbose:
+            print(
+                f"📦 Элементов: {len(items)}, уже готово: {len(items) - len(pending)}, "
+                f"в работе: {len(pending)}"
+            )
+
+        results = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="batch"
+        ) as pool:
+            futures = [pool.submit(self._generate, item) for item in pending]
+            for future in as_completed(futures):
+                entry = future.result()
+                self._record(entry)
+                results.append(entry)
+                if verbose:
+                    mark = "✅" if entry["status"] == "ok" else "❌"
+                    print(
+                        f"{mark} [{len(results)}/{len(pending)}] {entry['id']} "
+                        f"{entry['seconds']:.2f}s {entry.get('error', '')}"
+                    )
+        elapsed = time.perf_counter() - start
+
+        for agent in self._agents:
+            agent.close()
+        self._agents = []
+
+        report = build_report(results, elapsed, skipped=len(items) - len(pending))
+        with open(self.out_dir / REPORT, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+def build_report(
+    results: List[Dict[str, Any]], elapsed: float, skipped: int = 0
+) -> Dict[str, Any]:
+    ok = [r for r in results if r["status"] == "ok"]
+    failed = [r for r in results if r["status"] != "ok"]
+    seconds = sorted(r["seconds"] for r in ok)
+    sources: Dict[str, int] = {}
+    for r in ok:
+        sources[r["source"]] = sources.get(r["source"], 0) + 1
+
+    return {
+        "processed": len(results),
+        "succeeded": len(ok),
+        "failed": len(failed),
+        "skipped": skipped,
+        "elapsed_seconds": round(elapsed, 3),
+        "items_per_second": round(len(results) / elapsed, 3) if elapsed else None,
+        "latency_p50": statistics.median(seconds) if seconds else None,
+        "latency_p95": seconds[int(0.95 * (len(seconds) - 1))] if seconds else None,
+        "retried": sum(1 for r in results if r["attempts"] > 1),
+        "sources": sources,
+        "failures": [{"id": r["id"], "error": r["error"]} for r in failed],
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Пакетная генерация анимаций")
+    parser.add_argument("input", help="JSONL с prompt/action")
+    parser.add_argument("--out", default="batch_output")
+    parser.add_argument("--llm-base-url", default="http://localhost:11434/v1")
+    parser.add_argument("--pose-api-url", nargs="+", default=["http://localhost:8001"])
+    parser.add_argument("--model", default="qwen2.5:1.5b")
+    parser.add_argument("--renderer", default="http", choices=["http", "inprocess"])
+    parser.add_argument("--format", default="gif", choices=["gif", "webp", "apng"])
+    parser.add_argument("--pose-encoding", default="compact", choices=ENCODINGS)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--render-concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument(
+        "--force-llm",
+        action="store_true",
+        help="не брать prompt-элементы из библиотеки поз",
+    )
+    args = parser.parse_args(argv)
+
+    client = OpenAI(base_url=args.llm_base_url, api_key="ollama", max_retries=1)
+    renderer = BoundedRenderer(
+        InProcessPoseRenderer(output="numpy")
+        if args.renderer == "inprocess"
+        else HttpPoseRenderer(args.pose_api_url),
+        args.render_concurrency,
+    )
+    library = PoseLibrary()
+
+    def agent_factory() -> PoseAgent:
+        return PoseAgent(
+            model=args.model,
+            client=client,
+            renderer=renderer,
+            pose_library=library,
+            pose_encoding=args.pose_encoding,
+            animation_format=args.format,
+        )
+
+    runner = BatchRunner(
+        agent_factory,
+        args.out,
+        animation_format=args.format,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        force_llm=args.force_llm,
+    )
+    try:
+        report = runner.run(load_items(args.input))
+    finally:
+        renderer.close()
+
+    print("\n📊 Итог:")
+    print(
+        f"   успешно {report['succeeded']}, ошибок {report['failed']}, "
+        f"пропущено {report['skipped']}"
+    )
+    print(
+        f"   {report['items_per_second']} эл/с, p50 {report['latency_p50']}s, "
+        f"p95 {report['latency_p95']}s"
+    )
+    print(f"   отчёт: {Path(args.out) / REPORT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Order poses into a smooth sequence with minimal joint travel.
+
+Расстояние между позами - суммарный путь шести суставов. Порядок строится
+эвристикой коммивояжёра для открытого пути: ближайший сосед, затем 2-opt.
+Начальную и конечную позу можно закрепить. Открытый путь сводится к циклу
+через фиктивную вершину: от неё 0 до допустимого начала, до неё 0 от
+допустимого конца, до остальных - штраф.
+"""
+from typing import Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from .pose_codec import JOINTS
+from .pose_library import Pose
+from .pose_neighbors import pose_vectors
+
+
+def distance_matrix(coords: np.ndarray) -> np.ndarray:
+    """(N, N): сумма евклидовых расстояний по суставам"""
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, len(JOINTS), 2)
+    dist = np.zeros((len(points), len(points)))
+    for joint in range(len(JOINTS)):
+        dist += cdist(points[:, joint], points[:, joint])
+    return dist
+
+
+def path_length(dist: np.ndarray, order: Sequence[int]) -> float:
+    order = np.asarray(order)
+    return float(dist[order[:-1], order[1:]].sum())
+
+
+def _augmented(
+    dist: np.ndarray, start: Optional[int], end: Optional[int]
+) -> np.ndarray:
+    n = len(dist)
+    penalty = dist.max() * n + 1.0
+    matrix = np.zeros((n + 1, n + 1))
+    matrix[:n, :n] = dist
+    # Строка фиктивной вершины - переход к началу, столбец - переход от конца
+    if start is not None:
+        matrix[n, :n] = penalty
+        matrix[n, start] = 0.0
+    if end is not None:
+        matrix[:n, n] = penalty
+        matrix[end, n] = 0.0
+    return matrix
+
+
+def _nearest_neighbour(matrix: np.ndarray, end: Optional[int]) -> np.ndarray:
+    n = len(matrix) - 1
+    visited = np.zeros(n + 1, dtype=bool)
+    visited[n] = True
+    if end is not None and n > 1:
+        visited[end] = True
+    order = [n]
+    current = n
+    for _ in range(n - int(end is not None and n > 1)):
+        row = np.where(visited, np.inf, matrix[current])
+        current = int(np.argmin(row))
+        visited[current] = True
+        order.append(current)
+    if end is not None and n > 1:
+        order.append(end)
+    return np.array(order)
+
+
+def _two_opt(matrix: np.ndarray, order: np.ndarray, max_passes: int) -> np.ndarray:
+    """Разворот отрезков order[i..j]; позиция 0 (фиктивная вершина) неподвижна"""
+    size = len(order)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, size - 1):
+            j = np.arange(i + 1, size)
+            a, b = order[i - 1], order[i]
+            c, e = order[j], order[(j + 1) % size]
+            gain = matrix[a, b] + matrix[c, e] - matrix[a, c] - matrix[b, e]
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                k = j[best]
+                order[i : k + 1] = order[i : k + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def order_poses(
+    poses: Union[Iterable[Pose], np.ndarray],
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    max_passes: int = 50,
+) -> List[int]:
+    """Порядок индексов поз с минимальным суммарным перемещением суставов"""
+    coords = poses if isinstance(poses, np.ndarray) else pose_vectors(poses)
+    n = len(coords)
+    if n <= 2:
+        order = list(range(n))
+        if n == 2 and (start == 1 or end == 0):
+            order.reverse()
+        return order
+    if start is not None and start == end:
+        raise ValueError("start and end must be different poses")
+
+    matrix = _augmented(distance_matrix(coords), start, end)
+    order = _two_opt(matrix, _nearest_neighbour(matrix, end), max_passes)
+    return [int(i) for i in order[1:]]
@@ -0,0 +1,205 @@
+"""Bounded conversation memory with approximate token budgeting"""
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+Message = Dict[str, Any]
+
+MESSAGE_OVERHEAD = 4
+# Payload-поля результатов инструментов, которые не нужны модели в истории
+HEAVY_FIELDS = ("animation", "image")
+
+
+def approx_tokens(text: str) -> int:
+    """~3 символа на токен: компромисс между латиницей (~4) и кириллицей (~2.5)"""
+    if not text:
+        return 0
+    return len(text) // 3 + 1
+
+
+def message_tokens(message: Message) -> int:
+    tokens = MESSAGE_OVERHEAD + approx_tokens(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call["function"]
+        tokens += approx_tokens(function["name"]) + approx_tokens(function["arguments"])
+    return tokens
+
+
+def messages_tokens(messages: List[Message]) -> int:
+    return sum(message_tokens(m) for m in messages)
+
+
+def strip_tool_payload(message: Message) -> Message:
+    """Заменить base64-артефакты в ответе инструмента на короткую пометку"""
+    if message.get("role") != "tool":
+        return message
+    try:
+        result = json.loads(message["content"])
+    except (TypeError, ValueError):
+        return message
+    if not isinstance(result, dict):
+        return message
+    for key in HEAVY_FIELDS:
+        value = result.get(key)
+        if isinstance(value, str) and not value.endswith(" bytes omitted>"):
+            result[key] = f"<{len(value)} bytes omitted>"
+    return {**message, "content": json.dumps(result, ensure_ascii=False)}
+
+
+def extractive_summary(messages: List[Message], max_chars: int = 80) -> str:
+    lines = []
+    for message in messages:
+        if message["role"] == "tool":
+            continue
+        content = (message.get("content") or "").replace("\n", " ")
+        if message.get("tool_calls"):
+            names = ", ".join(tc["function"]["name"] for tc in message["tool_calls"])
+            content = f"{content} [tool: {names}]".strip()
+        if content:
+            lines.append(f"{message['role']}: {content[:max_chars]}")
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """История диалога с ограничением размера промпта.
+
+    policy="sliding_window" отбрасывает старые реплики, policy="summarize"
+    сворачивает их в краткое резюме. Системный промпт и последний вызов
+    инструмента (с его результатами) никогда не вытесняются.
+    """
+
+    POLICIES = ("sliding_window", "summarize")
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 3000,
+        policy: str = "sliding_window",
+        session_token_budget: Optional[int] = None,
+        summarizer: Optional[Callable[[List[Message]], str]] = None,
+        max_summary_tokens: int = 300,
+    ):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown memory policy: {policy}")
+
+        self.max_prompt_tokens = max_prompt_tokens
+        self.policy = policy
+        self.session_token_budget = session_token_budget
+        self.summarizer = summarizer or extractive_summary
+        self.max_summary_tokens = max_summary_tokens
+
+        self.messages: List[Message] = []
+        self.summary = ""
+        self.session_tokens = 0
+        self.last_prompt_tokens = 0
+
+    def append(self, message: Message):
+        self.messages.append(strip_tool_payload(message))
+
+    def extend(self, messages: List[Message]):
+        for message in messages:
+            self.append(message)
+
+    def clear(self):
+        self.messages = []
+        self.summary = ""
+        self.session_tokens = 0
+        self.last_prompt_tokens = 0
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "messages": self.messages,
+            "summary": self.summary,
+            "session_tokens": self.session_tokens,
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        self.messages = list(state.get("messages", []))
+        self.summary = state.get("summary", "")
+        self.session_tokens = state.get("session_tokens", 0)
+
+    def size_bytes(self) -> int:
+        """Приблизительный объём истории в памяти"""
+        return len(self.summary) * 2 + sum(
+            len(m.get("content") or "") * 2 + 200 for m in self.messages
+        )
+
+    @property
+    def budget_remaining(self) -> Optional[int]:
+        if self.session_token_budget is None:
+            return None
+        return max(0, self.session_token_budget - self.session_tokens)
+
+    def budget_exhausted(self) -> bool:
+        return self.budget_remaining == 0
+
+    def charge(self, prompt_messages: List[Message]) -> int:
+        """Учесть промпт, отправленный в LLM, и вернуть его размер"""
+        tokens = messages_tokens(prompt_messages)
+        self.last_prompt_tokens = tokens
+        self.session_tokens += tokens
+        return tokens
+
+    def _blocks(self) -> List[List[Message]]:
+        """Разбить историю на блоки, не разрывая tool_calls и их результаты"""
+        blocks: List[List[Message]] = []
+        for message in self.messages:
+            if message["role"] == "tool" and blocks:
+                blocks[-1].append(message)
+            else:
+                blocks.append([message])
+        return blocks
+
+    def _pinned_block(self, blocks: List[List[Message]]) -> Optional[int]:
+        for index in range(len(blocks) - 1, -1, -1):
+            if blocks[index][0].get("tool_calls"):
+                return index
+        return None
+
+    def _fold_into_summary(self, evicted: List[Message]):
+        text = self.summarizer(evicted)
+        if not text:
+            return
+        summary = f"{self.summary}\n{text}".strip()
+        # Резюме тоже ограничено: оставляем самые свежие строки
+        max_chars = self.max_summary_tokens * 3
+        while len(summary) > max_chars and "\n" in summary:
+            summary = summary.split("\n", 1)[1]
+        self.summary = summary[-max_chars:]
+
+    def build_messages(self, system_message: str) -> List[Message]:
+        """Собрать промпт в пределах max_prompt_tokens, вытесняя старые реплики"""
+        blocks = self._blocks()
+        pinned = self._pinned_block(blocks)
+
+        def render(kept: List[List[Message]]) -> List[Message]:
+            system = system_message
+            if self.summary:
+                system = f"{system}\n\nКРАТКО О ПРЕДЫДУЩЕМ ДИАЛОГЕ:\n{self.summary}"
+            prompt = [{"role": "system", "content": system}]
+            for block in kept:
+                prompt.extend(block)
+            return prompt
+
+        kept = list(blocks)
+        while True:
+            evicted: List[Message] = []
+            while (
+                len(kept) > 1 and messages_tokens(render(kept)) > self.max_prompt_tokens
+            ):
+                # Последний блок - текущая реплика пользователя, его не трогаем
+                victim = 0
+                if pinned is not None and kept[0] is blocks[pinned]:
+                    if len(kept) == 2:
+                        break
+                    victim = 1
+                evicted.extend(kept.pop(victim))
+
+            if not evicted:
+                break
+            evicted_ids = {id(m) for m in evicted}
+            self.messages = [m for m in self.messages if id(m) not in evicted_ids]
+            if self.policy != "summarize":
+                break
+            # Резюме выросло - промпт мог снова выйти за бюджет, проверяем заново
+            self._fold_into_summary(evicted)
+
+        return render(kept)
@@ -0,0 +1,283 @@
+"""OpenAI-compatible stand-in for the LLM: tool calls, streaming, scripts.
+
+Заменяет Ollama там, где нужна воспроизводимость: в тестах и бенчмарках
+агентного цикла. Реализует POST /v1/chat/completions (обычный ответ и SSE
+при stream=true) и GET /v1/models.
+
+Ответы:
+- по умолчанию на сообщение пользователя модель вызывает первый инструмент из
+  запроса с позами из PoseLibrary (поля poses или frames - по схеме
+  инструмента), а после результата инструмента отвечает текстом;
+- script - список правил {"match": "подстрока", "responses": [...]}: первое
+  правило, чья подстрока есть в последнем сообщении пользователя (или без
+  match), отдаёт responses[k], где k - число ответов ассистента после этого
+  сообщения. Ответ: {"content": "...", "tool_calls": [{"name": ...,
+  "arguments": {...}}]}.
+
+Задержка: prefill_latency + prefill_per_token * токены промпта до первого
+токена, затем token_latency на каждый токен ответа.
+
+    python -m src.mock_llm --port 11435 --token-latency 0.02
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from .memory import approx_tokens, messages_tokens
+from .pose_codec import encode_pose
+from .pose_library import BUILTIN_SEQUENCES, PoseLibrary
+
+Message = Dict[str, Any]
+
+DEFAULT_TEXT = "Готово! Анимация создана."
+
+
+def _last_user_index(messages: List[Message]) -> int:
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get("role") == "user":
+            return i
+    return -1
+
+
+def _split_tokens(text: str, size: int = 3) -> List[str]:
+    """Куски текста примерно по токену (~3 символа, как approx_tokens)"""
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+class MockLLM:
+    """Выбор ответа и подсчёт токенов; не зависит от HTTP"""
+
+    def __init__(
+        self,
+        script: Optional[List[Dict[str, Any]]] = None,
+        frames_encoding: str = "compact",
+        model: str = "mock",
+    ):
+        self.script = script or []
+        self.frames_encoding = frames_encoding
+        self.model = model
+        self.library = PoseLibrary()
+        self.stats = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _default_tool_call(
+        self, user_text: str, tools: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        match = self.library.match(user_text)
+        if match is not None:
+            sequence = match.sequence
+        else:
+            index = sum(map(ord, user_text)) % len(BUILTIN_SEQUENCES)
+            sequence = BUILTIN_SEQUENCES[index]
+
+        function = tools[0]["function"]
+        properties = function.get("parameters", {}).get("properties", {})
+        arguments: Dict[str, Any] = {"action": sequence.name}
+        if "frames" in properties:
+            arguments["frames"] = [
+                encode_pose(p, self.frames_encoding) for p in sequence.poses
+            ]
+        else:
+            arguments["poses"] = sequence.poses
+        return {"name": function["name"], "arguments": arguments}
+
+    def respond(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Ответ ассистента: {"content": str, "tool_calls": [...]}"""
+        messages = body.get("messages", [])
+        user_index = _last_user_index(messages)
+        user_text = str(messages[user_index].get("content", "")) if messages else ""
+        step = sum(1 for m in messages[user_index + 1 :] if m["role"] == "assistant")
+
+        for rule in self.script:
+            if rule.get("match", "") in user_text:
+                responses = rule["responses"]
+                return responses[min(step, len(responses) - 1)]
+
+        tools = body.get("tools") or []
+        if step == 0 and tools and body.get("tool_choice") != "none":
+            return {
+                "content": "",
+                "tool_calls": [self._default_tool_call(user_text, tools)],
+            }
+        return {"content": DEFAULT_TEXT}
+
+    def completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Тело ответа chat.completion (без задержек)"""
+        reply = self.respond(body)
+        tool_calls = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {
+                    "name": call["name"],
+                    "arguments": json.dumps(call["arguments"], ensure_ascii=False),
+                },
+            }
+            for call in reply.get("tool_calls", [])
+        ]
+        content = reply.get("content", "")
+        prompt_tokens = messages_tokens(body.get("messages", []))
+        completion_tokens = approx_tokens(content) + sum(
+            approx_tokens(tc["function"]["arguments"]) for tc in tool_calls
+        )
+
+        self.stats["requests"] += 1
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["completion_tokens"] += completion_tokens
+
+        message: Dict[str, Any] = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:16]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", self.model),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def stream_chunks(completion: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Разбить chat.completion на chat.completion.chunk по токену"""
+    choice = completion["choices"][0]
+    message = choice["message"]
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None):
+        return {
+            "id": completion["id"],
+            "object": "chat.completion.chunk",
+            "created": completion["created"],
+            "model": completion["model"],
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    yield chunk({"role": "assistant", "content": ""})
+    for piece in _split_tokens(message["content"]):
+        yield chunk({"content": piece})
+    for index, call in enumerate(message.get("tool_calls", [])):
+        yield chunk(
+            {
+                "tool_calls": [
+                    {
+                        "index": index,
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {"name": call["function"]["name"], "arguments": ""},
+                    }
+                ]
+            }
+        )
+        for piece in _split_tokens(call["function"]["arguments"]):
+            yield chunk(
+                {"tool_calls": [{"index": index, "function": {"arguments": piece}}]}
+            )
+    final = chunk({}, choice["finish_reason"])
+    final["usage"] = completion["usage"]
+    yield final
+
+
+def create_app(
+    script: Optional[List[Dict[str, Any]]] = None,
+    token_latency: float = 0.0,
+    prefill_latency: float = 0.0,
+    prefill_per_token: float = 0.0,
+    frames_encoding: str = "compact",
+) -> FastAPI:
+    llm = MockLLM(script=script, frames_encoding=frames_encoding)
+    app = FastAPI()
+    app.state.llm = llm
+
+    def prefill_seconds(completion: Dict[str, Any]) -> float:
+        return (
+            prefill_latency + prefill_per_token * completion["usage"]["prompt_tokens"]
+        )
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy"}
+
+    @app.get("/v1/models")
+    async def models():
+        return {
+            "object": "list",
+            "data": [{"id": llm.model, "object": "model", "owned_by": "mock"}],
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return llm.stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        completion = llm.completion(body)
+
+        if not body.get("stream"):
+            tokens = completion["usage"]["completion_tokens"]
+            await asyncio.sleep(prefill_seconds(completion) + token_latency * tokens)
+            return completion
+
+        async def events():
+            await asyncio.sleep(prefill_seconds(completion))
+            for chunk in stream_chunks(completion):
+                if token_latency:
+                    await asyncio.sleep(token_latency)
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--script", help="JSON-файл со списком правил")
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--prefill-latency", type=float, default=0.0)
+    parser.add_argument("--prefill-per-token", type=float, default=0.0)
+    parser.add_argument(
+        "--frames-encoding", default="compact", choices=["compact", "delta"]
+    )
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(
+            script=script,
+            token_latency=args.token_latency,
+            prefill_latency=args.prefill_latency,
+            prefill_per_token=args.prefill_per_token,
+            frames_encoding=args.frames_encoding,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
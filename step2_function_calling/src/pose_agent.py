@@ -1,21 +1,86 @@
 import json
-from typing import Any, Dict, List
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Union
 
-import requests
 from openai import OpenAI
 
+from . import tracing
+from .animation_encoder import FORMATS, encode_animation
+from .memory import ConversationMemory, messages_tokens, strip_tool_payload
+from .pose_codec import (
+    ENCODINGS,
+    PoseDecodeError,
+    compact_animation_tool,
+    compact_system_message,
+    decode_frames,
+)
+from .pose_library import PoseLibrary
+from .renderers import HttpPoseRenderer, PoseRenderer
+from .tool_args import ToolArgumentsError, parse_tool_arguments
+
+ANIMATION_TEXT_TEMPLATE = "Готово: анимация «{action}» ({frames} кадр.)"
+
 
 class PoseAgent:
     def __init__(
         self,
         llm_base_url: str = "http://localhost:11434/v1",
-        pose_api_url: str = "http://localhost:8001",
+        pose_api_url: Union[str, List[str]] = "http://localhost:8001",
         model: str = "qwen2.5:1.5b",
+        pose_library: Optional[PoseLibrary] = None,
+        intent_threshold: float = 0.8,
+        use_pose_library: bool = True,
+        memory: Optional[ConversationMemory] = None,
+        terminal_tools: Optional[Dict[str, str]] = None,
+        pose_encoding: str = "verbose",
+        tool_timeout: float = 60.0,
+        max_parallel_tools: int = 4,
+        renderer: Optional[PoseRenderer] = None,
+        animation_format: str = "gif",
+        client: Optional[OpenAI] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
     ):
-        self.client = OpenAI(base_url=llm_base_url, api_key="ollama")
+        if pose_encoding not in ENCODINGS:
+            raise ValueError(f"Unknown pose encoding: {pose_encoding}")
+        if animation_format not in FORMATS:
+            raise ValueError(f"Unknown animation format: {animation_format}")
+
+        # client, renderer и executor можно разделять между агентами (сессиями)
+        self.client = client or OpenAI(base_url=llm_base_url, api_key="ollama")
         self.pose_api_url = pose_api_url
+        self.renderer = renderer or HttpPoseRenderer(pose_api_url)
         self.model = model
-        self.conversation_history: List[Dict[str, Any]] = []
+        self.memory = memory or ConversationMemory()
+        self.pose_library = pose_library or PoseLibrary()
+        self.intent_threshold = intent_threshold
+        self.use_pose_library = use_pose_library
+        # Инструмент -> шаблон ответа: после успешного вызова цикл завершается
+        # без повторного обращения к LLM
+        self.terminal_tools = (
+            {"create_animation": ANIMATION_TEXT_TEMPLATE}
+            if terminal_tools is None
+            else terminal_tools
+        )
+        self.stats = {
+            "turns": 0,
+            "iterations": 0,
+            "llm_calls": 0,
+            "llm_calls_saved": 0,
+            "llm_seconds": 0.0,
+            "time_saved_seconds": 0.0,
+            "tool_args_repaired": 0,
+            "tool_args_rejected": 0,
+        }
+        self.pose_encoding = pose_encoding
+        self.animation_format = animation_format
+        self.tool_timeout = tool_timeout
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_parallel_tools, thread_name_prefix="pose-agent"
+        )
 
         self.tools = [
             {
@@ -85,76 +150,252 @@ WAVE: [{"Torso":[0,0],"Head":[0,60],"RH":[20,40],"LH":[-40,30],"RK":[15,-50],"LK
 JUMP: [{"Torso":[0,0],"Head":[0,60],"RH":[25,35],"LH":[-25,35],"RK":[15,-50],"LK":[-15,-50]},
        {"Torso":[0,10],"Head":[0,70],"RH":[30,55],"LH":[-30,55],"RK":[10,-30],"LK":[-10,-30]}]"""
 
+        if pose_encoding != "verbose":
+            self.tools = [compact_animation_tool(pose_encoding)]
+            self.system_message = compact_system_message(pose_encoding)
+
     def _call_function(self, function_name: str, arguments: Dict[str, Any]) -> Dict:
         import base64
-        import io
-
-        from PIL import Image
 
         if function_name == "create_animation":
             poses = arguments.get("poses", [])
+            if not poses and arguments.get("frames"):
+                encoding = "delta" if self.pose_encoding == "delta" else "compact"
+                try:
+                    poses = decode_frames(arguments["frames"], encoding)
+                except PoseDecodeError as e:
+                    return {"error": str(e)}
             if not poses:
                 return {"error": "No poses"}
 
-            frames = []
-            for pose in poses:
-                response = requests.post(
-                    f"{self.pose_api_url}/visualize",
-                    json={"pose": pose},
-                    timeout=10,
-                )
-                result = response.json()
-
-                if result.get("success") and result.get("image"):
-                    img_data = base64.b64decode(result["image"])
-                    img = Image.open(io.BytesIO(img_data))
-                    frames.append(img)
+            with tracing.span("render.frames", poses=len(poses)):
+                frames = self.renderer.render_many(poses)
 
             if not frames:
                 return {"error": "Failed to generate frames"}
 
-            gif_buffer = io.BytesIO()
-            frames[0].save(
-                gif_buffer,
-                format="GIF",
-                save_all=True,
-                append_images=frames[1:],
-                duration=500,
-                loop=0,
-            )
-            gif_buffer.seek(0)
-
-            gif_base64 = base64.b64encode(gif_buffer.read()).decode("utf-8")
+            with tracing.span("animation.encode", format=self.animation_format):
+                animation = encode_animation(
+                    frames,
+                    format=self.animation_format,
+                    duration=arguments.get("duration", 500),
+                )
 
             return {
                 "success": True,
-                "animation": gif_base64,
-                "format": "base64_gif",
+                "animation": base64.b64encode(animation).decode("utf-8"),
+                "format": f"base64_{self.animation_format}",
                 "frames": len(frames),
             }
 
         return {"error": f"Unknown function: {function_name}"}
 
-    def chat(self, user_message: str, max_iterations: int = 5) -> Dict[str, Any]:
-        self.conversation_history.append({"role": "user", "content": user_message})
-
-        messages = [{"role": "system", "content": self.system_message}]
-        messages.extend(self.conversation_history)
-
-        iteration = 0
-        last_image = None
+    @property
+    def conversation_history(self) -> List[Dict[str, Any]]:
+        return self.memory.messages
+
+    def _chat_from_library(self, user_message: str) -> Optional[Dict[str, Any]]:
+        with tracing.span("agent.intent_match") as current:
+            match = self.pose_library.match(user_message)
+            if current is not None and match is not None:
+                current.set(intent=match.sequence.name, confidence=match.confidence)
+        if match is None or match.confidence < self.intent_threshold:
+            return None
+
+        sequence = match.sequence
+        try:
+            function_result = self._call_function(
+                "create_animation",
+                {
+                    "action": sequence.name,
+                    "poses": sequence.poses,
+                    "duration": sequence.duration,
+                },
+            )
+        except Exception:
+            # Рендер не удался - тот же запрос обработает LLM
+            return None
+        if "animation" not in function_result:
+            return None
+
+        text = ANIMATION_TEXT_TEMPLATE.format(
+            action=sequence.name, frames=function_result["frames"]
+        )
+        self.memory.append({"role": "user", "content": user_message})
+        self.memory.append({"role": "assistant", "content": text})
+
+        return {
+            "text": text,
+            "image": function_result["animation"],
+            "source": "pose_library",
+            "intent": sequence.name,
+            "confidence": match.confidence,
+        }
+
+    def _run_tool_call(self, function_name: str, arguments: str) -> tuple:
+        with tracing.span("tool.parse_args", tool=function_name) as current:
+            try:
+                function_args, repairs = parse_tool_arguments(
+                    function_name, arguments, self.pose_encoding
+                )
+            except ToolArgumentsError as e:
+                self.stats["tool_args_rejected"] += 1
+                return {}, e.to_result(self.pose_encoding)
+            if repairs:
+                self.stats["tool_args_repaired"] += 1
+                if current is not None:
+                    current.set(repairs=repairs)
+        with tracing.span(f"tool.{function_name}"):
+            try:
+                return function_args, self._call_function(function_name, function_args)
+            except Exception as e:
+                return function_args, {"error": f"{function_name} failed: {e}"}
+
+    def _run_tool_calls(self, tool_calls) -> List[tuple]:
+        """Выполнить вызовы одного хода параллельно, сохранив порядок tool_calls.
+
+        tool_timeout отсчитывается от начала каждого вызова, а не от начала
+        хода: ожидание свободного потока (max_parallel_tools) в него не
+        входит. Вызов, не начавшийся за tool_timeout, снимается с очереди.
+        Поток зависшего вызова остановить нельзя - агент просто перестаёт
+        его ждать. Ошибка или таймаут одного вызова не отменяет соседние.
+        """
+        starts: List[Optional[float]] = [None] * len(tool_calls)
+        started = [threading.Event() for _ in tool_calls]
+
+        def run(index: int, function_name: str, arguments: str) -> tuple:
+            starts[index] = time.monotonic()
+            started[index].set()
+            return self._run_tool_call(function_name, arguments)
+
+        submitted = time.monotonic()
+        futures = [
+            self._executor.submit(
+                tracing.bind(run), index, tc.function.name, tc.function.arguments
+            )
+            for index, tc in enumerate(tool_calls)
+        ]
 
-        while iteration < max_iterations:
-            iteration += 1
+        results = []
+        for index, (tool_call, future) in enumerate(zip(tool_calls, futures)):
+            function_name = tool_call.function.name
+            queue_timeout = max(0.0, submitted + self.tool_timeout - time.monotonic())
+            if not started[index].wait(queue_timeout) and future.cancel():
+                function_args = {}
+                function_result = {
+                    "error": f"{function_name} was not started within "
+                    f"{self.tool_timeout}s: all tool workers are busy"
+                }
+                results.append((function_name, function_args, function_result))
+                continue
 
+            # cancel() не удался - вызов уже взят потоком и вот-вот отметит старт
+            started[index].wait()
+            timeout = starts[index] + self.tool_timeout - time.monotonic()
+            try:
+                function_args, function_result = future.result(
+                    timeout=max(0.0, timeout)
+                )
+            except FutureTimeoutError:
+                function_args = {}
+                function_result = {
+                    "error": f"{function_name} timed out after {self.tool_timeout}s"
+                }
+            results.append((function_name, function_args, function_result))
+        return results
+
+    def _complete(self, messages: List[Dict[str, Any]], **kwargs):
+        prompt_tokens = self.memory.charge(messages)
+        with tracing.span("llm.completion", prompt_tokens_est=prompt_tokens) as current:
+            start = time.perf_counter()
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                tools=self.tools,
-                tool_choice="auto",
                 temperature=0.7,
                 max_tokens=1024,
+                **kwargs,
             )
+            usage = getattr(response, "usage", None)
+            if current is not None and usage is not None:
+                current.set(
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens,
+                )
+        self.stats["llm_calls"] += 1
+        self.stats["llm_seconds"] += time.perf_counter() - start
+        return response
+
+    def _average_llm_seconds(self) -> float:
+        return self.stats["llm_seconds"] / max(1, self.stats["llm_calls"])
+
+    def _terminal_text(self, tool_results: List[tuple]) -> Optional[str]:
+        """Текст ответа, если ход завершился успешным терминальным инструментом"""
+        if any("error" in result for _, _, result in tool_results):
+            return None
+        for function_name, function_args, result in tool_results:
+            template = self.terminal_tools.get(function_name)
+            if template is not None and result.get("success"):
+                return template.format(
+                    action=function_args.get("action", function_name), **result
+                )
+        return None
+
+    def _generate_text_async(
+        self, messages: List[Dict[str, Any]], final_message: Dict[str, Any]
+    ) -> Future:
+        def generate() -> str:
+            response = self._complete(list(messages))
+            text = response.choices[0].message.content or final_message["content"]
+            final_message["content"] = text
+            return text
+
+        return self._executor.submit(tracing.bind(generate))
+
+    def chat(
+        self,
+        user_message: str,
+        max_iterations: int = 5,
+        force_llm: bool = False,
+        async_text: bool = False,
+    ) -> Dict[str, Any]:
+        with tracing.span("agent.chat", model=self.model) as current:
+            result = self._chat(user_message, max_iterations, force_llm, async_text)
+            if current is not None:
+                current.set(
+                    source=result.get("source"), iterations=result.get("iterations")
+                )
+            return result
+
+    def _chat(
+        self,
+        user_message: str,
+        max_iterations: int,
+        force_llm: bool,
+        async_text: bool,
+    ) -> Dict[str, Any]:
+        if self.use_pose_library and not force_llm:
+            library_result = self._chat_from_library(user_message)
+            if library_result is not None:
+                return library_result
+
+        if self.memory.budget_exhausted():
+            return {"text": "Session token budget exhausted", "image": None}
+
+        self.memory.append({"role": "user", "content": user_message})
+        self.stats["turns"] += 1
+
+        messages = self.memory.build_messages(self.system_message)
+        turn_start = len(messages)
+        prompt_tokens = messages_tokens(messages)
+
+        iteration = 0
+        last_image = None
+
+        while iteration < max_iterations:
+            iteration += 1
+            self.stats["iterations"] += 1
+
+            response = self._complete(messages, tools=self.tools, tool_choice="auto")
 
             assistant_message = response.choices[0].message
 
@@ -177,36 +418,78 @@ JUMP: [{"Torso":[0,0],"Head":[0,60],"RH":[25,35],"LH":[-25,35],"RK":[15,-50],"LK
                     }
                 )
 
-                for tool_call in assistant_message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-
-                    function_result = self._call_function(function_name, function_args)
-
+                tool_results = self._run_tool_calls(assistant_message.tool_calls)
+                for tool_call, (_, _, function_result) in zip(
+                    assistant_message.tool_calls, tool_results
+                ):
                     if "animation" in function_result:
                         last_image = function_result["animation"]
                     elif "image" in function_result:
                         last_image = function_result["image"]
 
+                    # base64-анимация модели не нужна и только раздувает контекст
                     messages.append(
-                        {
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "content": json.dumps(function_result, ensure_ascii=False),
-                        }
+                        strip_tool_payload(
+                            {
+                                "role": "tool",
+                                "tool_call_id": tool_call.id,
+                                "content": json.dumps(
+                                    function_result, ensure_ascii=False
+                                ),
+                            }
+                        )
                     )
 
-                continue
+                terminal_text = self._terminal_text(tool_results)
+                if terminal_text is None:
+                    continue
+
+                self.stats["llm_calls_saved"] += 1
+                self.stats["time_saved_seconds"] += self._average_llm_seconds()
+
+                final_message = {"role": "assistant", "content": terminal_text}
+                self.memory.extend(messages[turn_start:])
+                self.memory.append(final_message)
+
+                result = {
+                    "text": terminal_text,
+                    "image": last_image,
+                    "source": "llm",
+                    "terminal": True,
+                    "iterations": iteration,
+                    "prompt_tokens": prompt_tokens,
+                    "session_tokens": self.memory.session_tokens,
+                }
+                if async_text:
+                    result["text_future"] = self._generate_text_async(
+                        messages, final_message
+                    )
+                return result
 
             else:
                 final_response = assistant_message.content or ""
-                self.conversation_history.append(
-                    {"role": "assistant", "content": final_response}
-                )
-
-                return {"text": final_response, "image": last_image}
-
-        return {"text": "Max iterations exceeded", "image": None}
+                self.memory.extend(messages[turn_start:])
+                self.memory.append({"role": "assistant", "content": final_response})
+
+                return {
+                    "text": final_response,
+                    "image": last_image,
+                    "source": "llm",
+                    "iterations": iteration,
+                    "prompt_tokens": prompt_tokens,
+                    "session_tokens": self.memory.session_tokens,
+                }
+
+        self.memory.extend(messages[turn_start:])
+        return {
+            "text": "Max iterations exceeded",
+            "image": None,
+            "iterations": iteration,
+        }
 
     def reset_conversation(self):
-        self.conversation_history = []
+        self.memory.clear()
+
+    def close(self):
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
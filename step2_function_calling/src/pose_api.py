@@ -5,13 +5,29 @@ from typing import List
 import matplotlib
 
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from fastapi import FastAPI
+import numpy as np
+from fastapi import FastAPI, Request
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle
 from pydantic import BaseModel
 
+try:
+    from .tracing import remote_parent, span
+except ImportError:
+    # В контейнере pose_api.py и tracing.py лежат рядом, без пакета src
+    from tracing import remote_parent, span
+
 app = FastAPI()
 
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with remote_parent(request.headers):
+        with span(f"pose_api {request.url.path}"):
+            return await call_next(request)
+
+
 class PoseData(BaseModel):
     Torso: List[float]
     Head: List[float]
@@ -25,8 +41,15 @@ class PoseRequest(BaseModel):
     pose: PoseData
 
 
-def draw_pose(pose: PoseData) -> str:
-    fig, ax = plt.subplots(figsize=(6, 8))
+DPI = 100
+PAD_INCHES = 0.1
+
+
+def _plot_pose(pose: PoseData) -> Figure:
+    # Объектный API вместо pyplot: без глобального состояния, можно из потоков
+    fig = Figure(figsize=(6, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
 
     torso_x, torso_y = pose.Torso
     head_x, head_y = pose.Head
@@ -43,7 +66,7 @@ def draw_pose(pose: PoseData) -> str:
     r_hip = (torso_x + hip_offset, torso_y - 20)
     l_hip = (torso_x - hip_offset, torso_y - 20)
 
-    head_circle = plt.Circle((head_x, head_y), 8, color="#FFD700", zorder=3)
+    head_circle = Circle((head_x, head_y), 8, color="#FFD700", zorder=3)
     ax.add_patch(head_circle)
 
     ax.plot(
@@ -116,13 +139,42 @@ def draw_pose(pose: PoseData) -> str:
     ax.set_aspect("equal")
     ax.axis("off")
 
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format="png", dpi=100, bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
+    fig.tight_layout()
+    return fig
+
 
-    return base64.b64encode(buf.read()).decode("utf-8")
+def render_pose_png(pose: PoseData) -> bytes:
+    with span("render.plot"):
+        fig = _plot_pose(pose)
+    with span("render.png_encode"):
+        buf = io.BytesIO()
+        fig.savefig(
+            buf, format="png", dpi=DPI, bbox_inches="tight", pad_inches=PAD_INCHES
+        )
+    return buf.getvalue()
+
+
+def render_pose_array(pose: PoseData) -> np.ndarray:
+    """RGBA-кадр (H, W, 4) без PNG-кодирования, с той же обрезкой, что и PNG"""
+    with span("render.plot"):
+        fig = _plot_pose(pose)
+    with span("render.rasterize"):
+        fig.set_dpi(DPI)
+        canvas = fig.canvas
+        canvas.draw()
+        frame = np.asarray(canvas.buffer_rgba())
+
+    bbox = fig.get_tightbbox(canvas.get_renderer()).padded(PAD_INCHES)
+    height = frame.shape[0]
+    x0, x1 = round(bbox.x0 * DPI), round(bbox.x1 * DPI)
+    y0, y1 = round(bbox.y0 * DPI), round(bbox.y1 * DPI)
+    return frame[max(0, height - y1) : height - max(0, y0), max(0, x0) : x1].copy()
+
+
+def draw_pose(pose: PoseData) -> str:
+    png = render_pose_png(pose)
+    with span("render.base64"):
+        return base64.b64encode(png).decode("utf-8")
 
 
 @app.get("/health")
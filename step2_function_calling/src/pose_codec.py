@@ -0,0 +1,119 @@
+"""Compact pose encoding for the create_animation tool schema.
+
+Вместо объекта {"Torso":[0,0],"Head":[0,60],...} модель выдаёт кадр как
+плоский массив из 12 целых чисел в порядке JOINTS. В режиме "delta" числа
+- смещения от REST_POSE, поэтому неподвижные суставы кодируются нулями.
+"""
+import json
+import math
+from typing import Any, Dict, List, Sequence
+
+from .pose_library import BUILTIN_SEQUENCES, REST_POSE, Pose
+
+JOINTS = ("Torso", "Head", "RH", "LH", "RK", "LK")
+FRAME_SIZE = len(JOINTS) * 2
+ENCODINGS = ("verbose", "compact", "delta")
+
+REST_FRAME = [int(v) for joint in JOINTS for v in REST_POSE[joint]]
+
+
+class PoseDecodeError(ValueError):
+    pass
+
+
+def encode_pose(pose: Pose, encoding: str = "compact") -> List[int]:
+    frame = [int(round(v)) for joint in JOINTS for v in pose[joint]]
+    if encoding == "delta":
+        frame = [v - rest for v, rest in zip(frame, REST_FRAME)]
+    return frame
+
+
+def decode_frame(frame: Sequence[Any], encoding: str = "compact") -> Pose:
+    if not isinstance(frame, (list, tuple)) or len(frame) != FRAME_SIZE:
+        raise PoseDecodeError(f"Frame must be an array of {FRAME_SIZE} numbers")
+    values = []
+    for v in frame:
+        # float(True) == 1.0: булевы значения - ошибка модели, а не координата
+        if isinstance(v, bool):
+            raise PoseDecodeError("Frame must contain only numbers")
+        try:
+            value = float(v)
+        except (TypeError, ValueError):
+            raise PoseDecodeError("Frame must contain only numbers")
+        if not math.isfinite(value):
+            raise PoseDecodeError("Frame must contain only finite numbers")
+        values.append(value)
+
+    if encoding == "delta":
+        values = [v + rest for v, rest in zip(values, REST_FRAME)]
+
+    return {joint: values[2 * i : 2 * i + 2] for i, joint in enumerate(JOINTS)}
+
+
+def decode_frames(frames: Sequence[Any], encoding: str = "compact") -> List[Pose]:
+    poses = []
+    for index, frame in enumerate(frames):
+        try:
+            poses.append(decode_frame(frame, encoding))
+        except PoseDecodeError as e:
+            raise PoseDecodeError(f"Frame {index}: {e}")
+    return poses
+
+
+def compact_animation_tool(encoding: str = "compact") -> Dict[str, Any]:
+    relative = "смещения от позы покоя" if encoding == "delta" else "координаты"
+    return {
+        "type": "function",
+        "function": {
+            "name": "create_animation",
+            "description": (
+                "Создать анимацию из последовательности поз. Кадр - 12 целых "
+                f"чисел ({relative}): " + ",".join(f"{j}.x,{j}.y" for j in JOINTS)
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string"},
+                    "frames": {
+                        "type": "array",
+                        "items": {
+                            "type": "array",
+                            "items": {"type": "integer"},
+                            "minItems": FRAME_SIZE,
+                            "maxItems": FRAME_SIZE,
+                        },
+                    },
+                },
+                "required": ["action", "frames"],
+            },
+        },
+    }
+
+
+def _example(poses: List[Pose], encoding: str) -> str:
+    return json.dumps([encode_pose(p, encoding) for p in poses], separators=(",", ":"))
+
+
+def compact_system_message(encoding: str = "compact") -> str:
+    examples = {s.name: s.poses[:2] for s in BUILTIN_SEQUENCES}
+    order = ",".join(f"{j}.x,{j}.y" for j in JOINTS)
+
+    if encoding == "delta":
+        coordinates = (
+            f"FRAME: 12 ints = offsets from rest pose {REST_FRAME}\n"
+            f"ORDER: {order}\n0 = joint at rest"
+        )
+    else:
+        coordinates = (
+            f"FRAME: 12 ints\nORDER: {order}\n"
+            "COORDINATES: Torso (0,0), Head (0,60), Hands Y=35, Knees Y=-50"
+        )
+
+    return f"""Create pose sequences for actions.
+
+{coordinates}
+
+EXAMPLES:
+WAVE: {_example(examples["wave"], encoding)}
+
+JUMP: {_example(examples["jump"], encoding)}"""
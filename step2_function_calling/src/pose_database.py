@@ -0,0 +1,227 @@
+"""In-memory inverted index over the pose database descriptions.
+
+База (poses_database.json: список {"description": ..., "pose": {...}})
+читается один раз; каждое слово описания после normalize() указывает на
+множество поз. Запрос - слова через пробел (все должны встретиться),
+"фраза в кавычках" (слова подряд) и префиксы со звёздочкой: "макарен*"
+находит "макарена", "макарены", "макарену". Время запроса зависит от длины
+списков совпадений, а не от размера базы.
+
+refresh() перечитывает файл только при изменении mtime/размера и
+переиндексирует только изменившиеся записи.
+"""
+import bisect
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .pose_library import normalize
+from .pose_stream import iter_records
+
+Record = Dict[str, Any]
+
+_QUERY = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def _record_key(record: Record) -> str:
+    data = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class PoseDatabase:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._records: List[Optional[Record]] = []
+        self._texts: List[Optional[str]] = []
+        self._keys: Dict[str, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._vocabulary: Optional[List[str]] = []
+        self._signature: Optional[Tuple[float, int]] = None
+        self.stats = {"loads": 0, "added": 0, "removed": 0}
+        if path is not None:
+            self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def records(self) -> List[Record]:
+        return [r for r in self._records if r is not None]
+
+    def get(self, doc_id: int) -> Record:
+        record = self._records[doc_id]
+        if record is None:
+            raise KeyError(doc_id)
+        return record
+
+    def _index(self, record: Record) -> int:
+        doc_id = len(self._records)
+        self._records.append(record)
+        self._index_text(doc_id, record.get("description", ""))
+        return doc_id
+
+    def _index_text(self, doc_id: int, description: str):
+        tokens = normalize(description)
+        # Пробелы по краям: проверка фразы по границам слов через "in"
+        self._texts.append(" " + " ".join(tokens) + " ")
+        for token in set(tokens):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                self._vocabulary = None
+            postings.add(doc_id)
+
+    def _unindex(self, doc_id: int):
+        for token in set(self._texts[doc_id].split()):
+            postings = self._postings[token]
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary = None
+        self._records[doc_id] = None
+        self._texts[doc_id] = None
+
+    def add_records(self, records: Iterable[Record]) -> int:
+        """Добавить записи (дубликаты по содержимому пропускаются)"""
+        added = 0
+        for record in records:
+            key = _record_key(record)
+            if key not in self._keys:
+                self._keys[key] = self._index(record)
+                added += 1
+        self.stats["added"] += added
+        return added
+
+    def replace_records(self, records: Iterable[Record]):
+        """Привести индекс к новому набору записей, трогая только разницу"""
+        new_records = {_record_key(r): r for r in records}
+        for key in set(self._keys) - set(new_records):
+            self._unindex(self._keys.pop(key))
+            self.stats["removed"] += 1
+        self.add_records(r for k, r in new_records.items() if k not in self._keys)
+        self._compact(list(new_records))
+
+    def _compact(self, order: List[str]):
+        """Перенумеровать записи в порядке файла и убрать удалённые.
+
+        Новые и изменённые записи индексируются в конец, поэтому без этого
+        id (и порядок выдачи) расходились бы с порядком базы, а удалённые
+        записи копились бы пустыми слотами. Слова заново не разбираются:
+        переписываются только номера в списках совпадений.
+        """
+        mapping = {self._keys[key]: new_id for new_id, key in enumerate(order)}
+        if len(mapping) == len(self._records) and all(
+            old == new for old, new in mapping.items()
+        ):
+            return
+        records: List[Optional[Record]] = [None] * len(order)
+        texts: List[Optional[str]] = [None] * len(order)
+        for old, new in mapping.items():
+            records[new] = self._records[old]
+            texts[new] = self._texts[old]
+        self._records = records
+        self._texts = texts
+        self._keys = {key: new_id for new_id, key in enumerate(order)}
+        self._postings = {
+            token: {mapping[doc_id] for doc_id in postings}
+            for token, postings in self._postings.items()
+        }
+
+    def refresh(self) -> bool:
+        """Перечитать файл, если он изменился; True - если индекс обновлён"""
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime, stat.st_size)
+        if signature == self._signature:
+            return False
+        # Поток записей: разобранный документ целиком в памяти не держится
+        self.replace_records(iter_records(self.path))
+        self._signature = signature
+        self.stats["loads"] += 1
+        return True
+
+    def _prefix_postings(self, prefix: str) -> Set[int]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        result: Set[int] = set()
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            result |= self._postings[term]
+        return result
+
+    def _term_postings(self, term: str) -> Set[int]:
+        if term.endswith("*"):
+            return self._prefix_postings(term[:-1])
+        return self._postings.get(term, set())
+
+    def search_ids(self, query: str) -> List[int]:
+        """id записей, подходящих под все части запроса, в порядке базы"""
+        candidates: List[Set[int]] = []
+        phrases: List[str] = []
+        for phrase, word in _QUERY.findall(query):
+            if phrase:
+                tokens = normalize(phrase)
+                if len(tokens) > 1:
+                    phrases.append(" " + " ".join(tokens) + " ")
+                candidates.extend(self._postings.get(t, set()) for t in tokens)
+            else:
+                prefix = word.endswith("*")
+                candidates.extend(
+                    self._term_postings(t + "*" if prefix else t)
+                    for t in normalize(word)
+                )
+        if not candidates:
+            return []
+
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for postings in candidates[1:]:
+            if not result:
+                break
+            result &= postings
+        if phrases:
+            result = {
+                doc_id
+                for doc_id in result
+                if all(p in self._texts[doc_id] for p in phrases)
+            }
+        return sorted(result)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Record]:
+        ids = self.search_ids(query)
+        return [self.get(i) for i in ids[:limit]]
+
+
+class StorePoseDatabase(PoseDatabase):
+    """Тот же индекс описаний поверх PoseStore (mmap).
+
+    JSON не разбирается: слова берутся из descriptions.bin, а записи
+    собираются из столбцов хранилища только для найденных поз. Свежесть
+    хранилища проверяет тот, кто его открыл (PoseStore.is_stale).
+    """
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        for doc_id, description in enumerate(store.descriptions()):
+            self._index_text(doc_id, description)
+        self.stats["loads"] += 1
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def records(self) -> List[Record]:
+        return list(self.store.records())
+
+    def get(self, doc_id: int) -> Record:
+        return self.store.record(doc_id)
+
+    def add_records(self, records: Iterable[Record]) -> int:
+        raise TypeError("PoseStore is read-only: rebuild it with build_store()")
+
+    def refresh(self) -> bool:
+        return False
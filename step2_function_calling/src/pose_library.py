@@ -0,0 +1,361 @@
+"""Local library of named pose sequences and intent matching"""
+import difflib
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+Pose = Dict[str, List[float]]
+
+STOP_WORDS = {
+    # ru
+    "создай",
+    "создать",
+    "сделай",
+    "сделать",
+    "покажи",
+    "показать",
+    "нарисуй",
+    "анимацию",
+    "анимация",
+    "позу",
+    "поза",
+    "позы",
+    "как",
+    "человек",
+    "человечка",
+    "пожалуйста",
+    "мне",
+    "и",
+    "с",
+    "в",
+    "на",
+    # en
+    "create",
+    "make",
+    "show",
+    "draw",
+    "me",
+    "a",
+    "an",
+    "the",
+    "pose",
+    "animation",
+    "animate",
+    "please",
+    "of",
+    "person",
+    "doing",
+    "your",
+    # рука/руки не уточняют встроенные движения ("помаши рукой")
+    "рукой",
+    "руками",
+    "hand",
+    "hands",
+}
+
+
+# Окончания словоформ: основа слова совпадает с основой алиаса только после
+# снятия одного из них ("jumps" -> "jump"), а не по любому общему префиксу
+# ("jumpsuit" не "jump")
+INFLECTIONS = (
+    # en
+    "s",
+    "es",
+    "ed",
+    "ing",
+    # ru
+    "а",
+    "я",
+    "у",
+    "ю",
+    "е",
+    "и",
+    "ы",
+    "о",
+    "ь",
+    "й",
+    "ой",
+    "ей",
+    "ом",
+    "ем",
+    "ам",
+    "ям",
+    "ах",
+    "ях",
+    "ами",
+    "ями",
+    "ов",
+    "ев",
+    "ие",
+    "ия",
+    "ию",
+    "ии",
+    "ием",
+    "ание",
+    "ания",
+    "анию",
+    "ании",
+    "анием",
+    "ть",
+    "ать",
+    "ять",
+    "ить",
+    "еть",
+    "ет",
+    "ит",
+    "ут",
+    "ют",
+    "ат",
+    "ят",
+    "ает",
+    "яет",
+    "ует",
+    "уй",
+    "ай",
+    "ись",
+    "ся",
+    "сь",
+)
+
+
+# Короче основы слишком многозначны: "hope" -> "hop", "site" -> "sit"
+MIN_STEM = 4
+
+
+def stems(word: str) -> set:
+    """Возможные основы слова: само слово и слово без каждого из окончаний"""
+    result = {word}
+    for suffix in INFLECTIONS:
+        if not word.endswith(suffix) or len(word) - len(suffix) < 2:
+            continue
+        stem = word[: -len(suffix)]
+        candidates = [stem]
+        if suffix in ("ing", "ed"):
+            # waved -> wave: немое e вместо отдельного окончания "e";
+            # skipping -> skip
+            candidates.append(stem + "e")
+            if stem[-1] == stem[-2]:
+                candidates.append(stem[:-1])
+        result.update(c for c in candidates if len(c) >= MIN_STEM)
+    # Беглая гласная: прыжок -> прыжк(а)
+    for stem in list(result):
+        if len(stem) >= 5 and stem[-2] in "ое" and re.match(r"[а-я]$", stem[-1]):
+            result.add(stem[:-2] + stem[-1])
+    return result
+
+
+def _pose(torso, head, rh, lh, rk, lk) -> Pose:
+    return {"Torso": torso, "Head": head, "RH": rh, "LH": lh, "RK": rk, "LK": lk}
+
+
+REST_POSE = _pose([0, 0], [0, 60], [25, 35], [-25, 35], [15, -50], [-15, -50])
+
+
+@dataclass
+class PoseSequence:
+    name: str
+    poses: List[Pose]
+    aliases: List[str] = field(default_factory=list)
+    duration: int = 500
+
+
+# Канонические последовательности из test_scripts/demo_animation.py и demo_simple.py
+BUILTIN_SEQUENCES = [
+    PoseSequence(
+        "wave",
+        [
+            _pose([0, 0], [0, 60], [20, 40], [-40, 30], [15, -50], [-15, -50]),
+            _pose([0, 0], [0, 60], [30, 70], [-40, 30], [15, -50], [-15, -50]),
+            _pose([0, 0], [0, 60], [40, 50], [-40, 30], [15, -50], [-15, -50]),
+            _pose([0, 0], [0, 60], [30, 70], [-40, 30], [15, -50], [-15, -50]),
+        ],
+        aliases=[
+            "wave",
+            "waving",
+            "greeting",
+            "помаши",
+            "помахать",
+            "махать",
+            "машет",
+            "взмах",
+            "приветствие",
+            "winken",
+            "saludo",
+        ],
+    ),
+    PoseSequence(
+        "jump",
+        [
+            _pose([0, 0], [0, 60], [25, 35], [-25, 35], [15, -50], [-15, -50]),
+            _pose([0, 10], [0, 70], [30, 55], [-30, 55], [10, -30], [-10, -30]),
+            _pose([0, 0], [0, 60], [25, 35], [-25, 35], [15, -50], [-15, -50]),
+        ],
+        aliases=[
+            "jump",
+            "jumping",
+            "hop",
+            "прыжок",
+            "прыгни",
+            "прыгать",
+            "прыгает",
+            "springen",
+            "salto",
+        ],
+    ),
+    PoseSequence(
+        "squat",
+        [
+            _pose([0, 0], [0, 60], [40, 30], [-40, 30], [15, -50], [-15, -50]),
+            _pose([0, -30], [0, 30], [40, 0], [-40, 0], [20, -60], [-20, -60]),
+            _pose([0, 0], [0, 60], [40, 30], [-40, 30], [15, -50], [-15, -50]),
+        ],
+        aliases=[
+            "squat",
+            "squats",
+            "squatting",
+            "присед",
+            "приседание",
+            "присядь",
+            "приседать",
+            "kniebeuge",
+            "sentadilla",
+        ],
+    ),
+    PoseSequence(
+        "dance",
+        [
+            _pose([0, 0], [0, 60], [50, 35], [-50, 35], [15, -50], [-15, -50]),
+            _pose([5, 0], [5, 60], [55, 50], [-45, 20], [20, -50], [-10, -50]),
+            _pose([-5, 0], [-5, 60], [45, 20], [-55, 50], [10, -50], [-20, -50]),
+            _pose([0, 0], [0, 60], [50, 35], [-50, 35], [15, -50], [-15, -50]),
+        ],
+        aliases=[
+            "dance",
+            "dancing",
+            "танец",
+            "танцуй",
+            "танцевать",
+            "станцуй",
+            "tanzen",
+            "baile",
+        ],
+    ),
+    PoseSequence(
+        "t-pose",
+        [_pose([0, 0], [0, 60], [50, 35], [-50, 35], [15, -50], [-15, -50])],
+        aliases=["t-pose", "tpose", "t-поза", "t-позу", "т-поза", "т-позу", "тпоза"],
+    ),
+    PoseSequence(
+        "star",
+        [_pose([0, 0], [0, 60], [60, 40], [-60, 40], [40, -60], [-40, -60])],
+        aliases=["star", "starfish", "звезда", "звезду", "звездочка", "stern"],
+    ),
+    PoseSequence(
+        "sitting",
+        [_pose([0, -20], [0, 40], [30, -10], [-30, -10], [25, -50], [-25, -50])],
+        aliases=["sit", "sitting", "seated", "сидя", "сидит", "сядь", "сидеть"],
+    ),
+]
+
+
+@dataclass
+class IntentMatch:
+    sequence: PoseSequence
+    confidence: float
+    method: str
+    matched: str
+
+
+def normalize(text: str) -> List[str]:
+    text = text.lower().replace("ё", "е")
+    return re.findall(r"[\w-]+", text)
+
+
+class PoseLibrary:
+    """Registry of named pose sequences with keyword, stem and fuzzy matching"""
+
+    def __init__(self, sequences: Optional[Iterable[PoseSequence]] = None):
+        self.sequences: Dict[str, PoseSequence] = {}
+        self._aliases: Dict[str, str] = {}
+        self._stems: Dict[str, set] = {}
+        for sequence in BUILTIN_SEQUENCES if sequences is None else sequences:
+            self.register(sequence)
+
+    def register(self, sequence: PoseSequence):
+        self.sequences[sequence.name] = sequence
+        for alias in [sequence.name, *sequence.aliases]:
+            alias = alias.lower().replace("ё", "е")
+            self._aliases[alias] = sequence.name
+            self._stems[alias] = stems(alias)
+
+    def get(self, name: str) -> Optional[PoseSequence]:
+        return self.sequences.get(name)
+
+    @classmethod
+    def from_json(cls, path: str, include_builtin: bool = True) -> "PoseLibrary":
+        """Загрузить последовательности из JSON: [{"name", "poses", "aliases"}]"""
+        library = cls(None if include_builtin else [])
+        with open(Path(path), "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                library.register(
+                    PoseSequence(
+                        name=item["name"],
+                        poses=item["poses"],
+                        aliases=item.get("aliases", []),
+                        duration=item.get("duration", 500),
+                    )
+                )
+        return library
+
+    def _match_token(self, token: str):
+        if token in self._aliases:
+            return self._aliases[token], 1.0, "keyword", token
+
+        # Словоформы: "прыжка" -> "прыжок", "jumps" -> "jump"
+        if len(token) >= 4:
+            token_stems = stems(token)
+            for alias, name in self._aliases.items():
+                if token_stems & self._stems[alias]:
+                    return name, 0.9, "stem", alias
+
+        close = difflib.get_close_matches(token, self._aliases.keys(), n=1, cutoff=0.75)
+        if close:
+            ratio = difflib.SequenceMatcher(None, token, close[0]).ratio()
+            # Похожее слово - часто другое слово ("salt" и "salto"): порог
+            # проходят только почти точные совпадения длинных слов
+            return self._aliases[close[0]], ratio * 0.85, "fuzzy", close[0]
+
+        return None
+
+    def match(self, message: str) -> Optional[IntentMatch]:
+        tokens = [t for t in normalize(message) if t not in STOP_WORDS]
+        if not tokens:
+            return None
+
+        hits: Dict[str, tuple] = {}
+        unmatched = 0
+        for token in tokens:
+            hit = self._match_token(token)
+            if hit is None:
+                unmatched += 1
+                continue
+            name, score, method, alias = hit
+            if name not in hits or score > hits[name][1]:
+                hits[name] = hit
+
+        if not hits:
+            return None
+
+        ranked = sorted(hits.values(), key=lambda h: h[1], reverse=True)
+        # Несколько разных действий в одном запросе - пусть решает LLM
+        if len(ranked) > 1 and ranked[1][1] >= 0.85:
+            return None
+
+        best = ranked[0]
+        name, score, method, alias = best
+        # Каждое лишнее слово - модификатор, который библиотека не учитывает
+        # ("jumping jack" - не прыжок): одного уже достаточно, чтобы уйти в LLM
+        confidence = score / (1 + 0.3 * unmatched)
+        return IntentMatch(self.sequences[name], round(confidence, 3), method, alias)
@@ -0,0 +1,82 @@
+"""KD-tree nearest-neighbour search over pose joint coordinates.
+
+Поза - точка в 12-мерном пространстве (x, y шести суставов в порядке
+JOINTS). normalize=True сравнивает позы без учёта положения и масштаба:
+координаты отсчитываются от торса и делятся на длину шеи (торс - голова),
+так что присевшая и стоящая поза с одинаковыми руками остаются близки по
+рукам. Запросы k-NN и по радиусу принимают сразу много поз и выполняются
+за O(log N) на запрос.
+"""
+from typing import Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .pose_codec import JOINTS
+from .pose_library import Pose
+
+PoseInput = Union[Pose, Sequence[Pose], np.ndarray]
+
+
+def pose_vectors(poses: Iterable[Pose]) -> np.ndarray:
+    """Позы -> массив (N, 12) float32"""
+    return np.array(
+        [[v for joint in JOINTS for v in pose[joint][:2]] for pose in poses],
+        dtype=np.float32,
+    ).reshape(-1, len(JOINTS) * 2)
+
+
+def torso_normalize(coords: np.ndarray) -> np.ndarray:
+    """Координаты относительно торса в единицах длины шеи"""
+    points = np.asarray(coords, dtype=np.float32).reshape(-1, len(JOINTS), 2)
+    torso = points[:, JOINTS.index("Torso")]
+    head = points[:, JOINTS.index("Head")]
+    scale = np.linalg.norm(head - torso, axis=1)
+    scale[scale == 0] = 1.0
+    relative = (points - torso[:, None, :]) / scale[:, None, None]
+    return relative.reshape(len(points), -1)
+
+
+class PoseNeighbors:
+    def __init__(self, coords: np.ndarray, normalize: bool = False, leafsize: int = 16):
+        self.normalize = normalize
+        points = np.asarray(coords, dtype=np.float32).reshape(-1, len(JOINTS) * 2)
+        self.tree = cKDTree(
+            torso_normalize(points) if normalize else points, leafsize=leafsize
+        )
+
+    @classmethod
+    def from_poses(cls, poses: Iterable[Pose], **kwargs) -> "PoseNeighbors":
+        return cls(pose_vectors(poses), **kwargs)
+
+    def __len__(self) -> int:
+        return self.tree.n
+
+    def _points(self, queries: PoseInput) -> np.ndarray:
+        if isinstance(queries, dict):
+            points = pose_vectors([queries])
+        elif isinstance(queries, np.ndarray):
+            points = queries.astype(np.float32).reshape(-1, len(JOINTS) * 2)
+        else:
+            points = pose_vectors(queries)
+        return torso_normalize(points) if self.normalize else points
+
+    def knn(
+        self, queries: PoseInput, k: int = 5, workers: int = -1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(расстояния, индексы) формы (Q, k), по возрастанию расстояния"""
+        k = min(k, len(self))
+        distances, indices = self.tree.query(
+            self._points(queries), k=k, workers=workers
+        )
+        return distances.reshape(-1, k), indices.reshape(-1, k)
+
+    def radius(
+        self, queries: PoseInput, r: float, workers: int = -1
+    ) -> List[List[int]]:
+        """Индексы поз не дальше r от каждого запроса, по возрастанию индекса"""
+        points = self._points(queries)
+        return [
+            sorted(hits)
+            for hits in self.tree.query_ball_point(points, r, workers=workers)
+        ]
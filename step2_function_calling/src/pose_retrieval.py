@@ -0,0 +1,208 @@
+"""Char n-gram TF-IDF retrieval over pose descriptions.
+
+Описания разбиваются на символьные n-граммы внутри слов (" мака", "акар",
+...), поэтому "макарены", "макарену" и опечатки находят "макарена" без
+морфологии и без сетевой модели. Запросы дополняются синонимами из
+PoseLibrary (wave -> помаши, махать, ...), что покрывает английские запросы
+к русским описаниям.
+
+Матрица (документы x n-граммы) хранится в CSR с L2-нормированными строками;
+косинусная близость пачки запросов - одно разреженное умножение Q @ X.T.
+save()/load() пишут массивы CSR в .npy, load() открывает их через mmap.
+"""
+import json
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+from .pose_library import BUILTIN_SEQUENCES, normalize
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (2, 4)) -> List[str]:
+    low, high = ngram_range
+    grams = []
+    for token in normalize(text):
+        padded = f" {token} "
+        for n in range(low, high + 1):
+            grams.extend(padded[i : i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def _alias_expansions() -> Dict[str, str]:
+    expansions = {}
+    for sequence in BUILTIN_SEQUENCES:
+        names = [sequence.name, *sequence.aliases]
+        text = " ".join(names)
+        for name in names:
+            for token in normalize(name):
+                expansions.setdefault(token, text)
+    return expansions
+
+
+class TfidfRetriever:
+    def __init__(
+        self,
+        ngram_range: Tuple[int, int] = (2, 4),
+        expand_aliases: bool = True,
+    ):
+        self.ngram_range = ngram_range
+        self.expand_aliases = expand_aliases
+        self.vocabulary: Dict[str, int] = {}
+        self._token_cache: Dict[str, List[int]] = {}
+        self.idf: Optional[np.ndarray] = None
+        self.matrix: Optional[sparse.csr_matrix] = None
+        self._matrix_t: Optional[sparse.csr_matrix] = None
+        self._expansions = _alias_expansions() if expand_aliases else {}
+        self.stats: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return 0 if self.matrix is None else self.matrix.shape[0]
+
+    def _token_columns(self, token: str, grow: bool) -> List[int]:
+        # Слова в описаниях повторяются: n-граммы слова считаются один раз
+        columns = self._token_cache.get(token)
+        if columns is None:
+            columns = []
+            for gram in char_ngrams(token, self.ngram_range):
+                column = self.vocabulary.get(gram)
+                if column is None:
+                    if not grow:
+                        continue
+                    column = self.vocabulary[gram] = len(self.vocabulary)
+                columns.append(column)
+            self._token_cache[token] = columns
+        return columns
+
+    def _counts(self, texts: Iterable[str], grow: bool):
+        """CSR-массивы сырых частот n-грамм"""
+        indptr, indices, data = array("q", [0]), array("i"), array("f")
+        for text in texts:
+            counts: Counter = Counter()
+            for token in normalize(text):
+                counts.update(self._token_columns(token, grow))
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        return (
+            np.frombuffer(indptr, dtype=np.int64),
+            np.frombuffer(indices, dtype=np.int32),
+            np.frombuffer(data, dtype=np.float32),
+        )
+
+    def _weight(self, indptr, indices, data) -> sparse.csr_matrix:
+        # Сублинейный tf, idf, L2-нормировка строк
+        data = (1.0 + np.log(data)) * self.idf[indices]
+        matrix = sparse.csr_matrix(
+            (data.astype(np.float32), indices, indptr),
+            shape=(len(indptr) - 1, len(self.vocabulary)),
+        )
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).astype(np.float32) @ matrix
+
+    def fit(self, descriptions: Iterable[str]) -> "TfidfRetriever":
+        start = time.perf_counter()
+        self.vocabulary = {}
+        self._token_cache = {}
+        indptr, indices, data = self._counts(descriptions, grow=True)
+        n_docs = len(indptr) - 1
+        df = np.bincount(indices, minlength=len(self.vocabulary))
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1.0).astype(np.float32)
+        self.matrix = self._weight(indptr, indices, data).tocsr()
+        self._matrix_t = None
+        self.stats = {
+            "build_seconds": time.perf_counter() - start,
+            "documents": n_docs,
+            "features": len(self.vocabulary),
+        }
+        return self
+
+    def transform(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        if self.expand_aliases:
+            texts = [self._expand(text) for text in texts]
+        return self._weight(*self._counts(texts, grow=False)).tocsr()
+
+    def _expand(self, text: str) -> str:
+        extra = [self._expansions[t] for t in normalize(text) if t in self._expansions]
+        return " ".join([text, *extra])
+
+    def query(
+        self,
+        queries: Union[str, Sequence[str]],
+        k: int = 10,
+        min_score: float = 0.0,
+        batch_size: int = 256,
+    ) -> List[List[Tuple[int, float]]]:
+        """top-k (id документа, косинус) для каждого запроса"""
+        if self.matrix is None:
+            raise RuntimeError("Retriever is not fitted")
+        if isinstance(queries, str):
+            queries = [queries]
+        if self._matrix_t is None:
+            self._matrix_t = self.matrix.T.tocsr()
+
+        results = []
+        for offset in range(0, len(queries), batch_size):
+            scores = (
+                self.transform(queries[offset : offset + batch_size]) @ self._matrix_t
+            ).tocsr()
+            for row in range(scores.shape[0]):
+                begin, end = scores.indptr[row], scores.indptr[row + 1]
+                values = scores.data[begin:end]
+                docs = scores.indices[begin:end]
+                if len(values) > k:
+                    top = np.argpartition(-values, k - 1)[:k]
+                    values, docs = values[top], docs[top]
+                order = np.argsort(-values, kind="stable")
+                results.append(
+                    [
+                        (int(docs[i]), float(values[i]))
+                        for i in order
+                        if values[i] > min_score
+                    ]
+                )
+        return results
+
+    def save(self, directory: str):
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "tfidf_indptr.npy", self.matrix.indptr)
+        np.save(path / "tfidf_indices.npy", self.matrix.indices)
+        np.save(path / "tfidf_data.npy", self.matrix.data)
+        np.save(path / "tfidf_idf.npy", self.idf)
+        with open(path / "tfidf_meta.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "ngram_range": list(self.ngram_range),
+                    "expand_aliases": self.expand_aliases,
+                    "shape": list(self.matrix.shape),
+                    "vocabulary": self.vocabulary,
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "TfidfRetriever":
+        path = Path(directory)
+        mode = "r" if mmap else None
+        with open(path / "tfidf_meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        retriever = cls(tuple(meta["ngram_range"]), meta["expand_aliases"])
+        retriever.vocabulary = meta["vocabulary"]
+        retriever.idf = np.load(path / "tfidf_idf.npy", mmap_mode=mode)
+        retriever.matrix = sparse.csr_matrix(
+            (
+                np.load(path / "tfidf_data.npy", mmap_mode=mode),
+                np.load(path / "tfidf_indices.npy", mmap_mode=mode),
+                np.load(path / "tfidf_indptr.npy", mmap_mode=mode),
+            ),
+            shape=tuple(meta["shape"]),
+            copy=False,
+        )
+        return retriever
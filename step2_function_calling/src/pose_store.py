@@ -0,0 +1,252 @@
+"""Columnar, memory-mapped pose store compiled from poses_database.json.
+
+Вместо списка словарей (объект на каждую позу и каждую координату) база
+хранится столбцами:
+
+    coords.npy          float32 (N, 12), суставы в порядке JOINTS
+    desc_offsets.npy    int64 (N + 1), границы описаний в descriptions.bin
+    descriptions.bin    описания подряд в UTF-8
+    tag_offsets.npy     int64 (N + 1), границы тегов позы в tag_ids.npy
+    tag_ids.npy         int32, номера тегов в tags.json
+    meta.json           число поз, mtime/размер исходного файла
+
+Файлы открываются через mmap: запуск не зависит от размера базы, а страницы
+делятся между процессами-воркерами через page cache.
+
+    python -m src.pose_store build ../step3_rag/poses_database.json --out pose_store
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .pose_codec import JOINTS
+from .pose_library import Pose
+from .pose_stream import iter_records
+
+FORMAT_VERSION = 1
+FRAME_SIZE = len(JOINTS) * 2
+FLUSH_ITEMS = 1 << 16
+
+
+def _source_signature(source: str) -> Dict[str, Any]:
+    stat = os.stat(source)
+    return {"source_mtime": stat.st_mtime, "source_size": stat.st_size}
+
+
+class _ColumnWriter:
+    """Столбец .npy, который пишется по мере поступления значений.
+
+    Значения копятся в небольшом array и сбрасываются в сырой файл; в конце
+    к данным приписывается заголовок .npy. Память не растёт с числом поз.
+    """
+
+    def __init__(self, path: Path, typecode: str, dtype, width: int = 0):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.typecode = typecode
+        self._raw_path = path.with_name(path.name + ".raw")
+        self._raw = open(self._raw_path, "wb")
+        self._buffer = array(typecode)
+        self._written = 0
+
+    @property
+    def size(self) -> int:
+        return self._written + len(self._buffer)
+
+    def extend(self, values: Iterable):
+        self._buffer.extend(values)
+        if len(self._buffer) >= FLUSH_ITEMS:
+            self._flush()
+
+    def append(self, value):
+        self.extend((value,))
+
+    def _flush(self):
+        self._buffer.tofile(self._raw)
+        self._written += len(self._buffer)
+        self._buffer = array(self.typecode)
+
+    def close(self):
+        self._flush()
+        self._raw.close()
+        shape = (self.size // self.width, self.width) if self.width else (self.size,)
+        header = {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": shape,
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as out, open(self._raw_path, "rb") as raw:
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(raw, out)
+        os.replace(tmp, self.path)
+        self._raw_path.unlink()
+
+
+def write_store(
+    records: Iterable[Dict[str, Any]],
+    directory: str,
+    source: Optional[str] = None,
+) -> int:
+    """Записать записи {"description", "pose", "tags"} в хранилище.
+
+    Записи читаются по одной, поэтому сюда можно передать поток из
+    pose_stream.iter_records() - память не зависит от размера базы.
+    """
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    # Пока хранилище пересобирается, оно не считается готовым
+    (path / "meta.json").unlink(missing_ok=True)
+
+    coords = _ColumnWriter(path / "coords.npy", "f", np.float32, width=FRAME_SIZE)
+    desc_offsets = _ColumnWriter(path / "desc_offsets.npy", "q", np.int64)
+    tag_offsets = _ColumnWriter(path / "tag_offsets.npy", "q", np.int64)
+    tag_ids = _ColumnWriter(path / "tag_ids.npy", "i", np.int32)
+    tags: Dict[str, int] = {}
+    offset = 0
+    desc_offsets.append(offset)
+    tag_offsets.append(0)
+    blob_tmp = path / "descriptions.bin.tmp"
+    with open(blob_tmp, "wb") as blob:
+        for record in records:
+            pose = record["pose"]
+            coords.extend(v for joint in JOINTS for v in pose[joint][:2])
+            encoded = record.get("description", "").encode("utf-8")
+            blob.write(encoded)
+            offset += len(encoded)
+            desc_offsets.append(offset)
+            tag_ids.extend(
+                tags.setdefault(tag, len(tags)) for tag in record.get("tags") or []
+            )
+            tag_offsets.append(tag_ids.size)
+    os.replace(blob_tmp, path / "descriptions.bin")
+
+    for column in (coords, desc_offsets, tag_offsets, tag_ids):
+        column.close()
+    with open(path / "tags.json", "w", encoding="utf-8") as f:
+        json.dump(list(tags), f, ensure_ascii=False)
+
+    # meta.json пишется последним: его наличие означает целое хранилище
+    count = desc_offsets.size - 1
+    meta = {"version": FORMAT_VERSION, "count": count}
+    if source is not None:
+        meta.update(source=str(source), **_source_signature(source))
+    with open(path / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return count
+
+
+def build_store(source: str, directory: str) -> int:
+    """JSON-массив или JSONL -> хранилище, потоково"""
+    records = iter_records(source, fields=("description", "pose", "tags"))
+    return write_store(records, directory, source=source)
+
+
+class PoseStore:
+    def __init__(self, directory: str):
+        self.path = Path(directory)
+        with open(self.path / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported pose store version: {self.meta}")
+
+        self.coords = np.load(self.path / "coords.npy", mmap_mode="r")
+        self._desc_offsets = np.load(self.path / "desc_offsets.npy", mmap_mode="r")
+        self._tag_offsets = np.load(self.path / "tag_offsets.npy", mmap_mode="r")
+        self._tag_ids = np.load(self.path / "tag_ids.npy", mmap_mode="r")
+        # Пустой файл нельзя отобразить в память
+        blob = self.path / "descriptions.bin"
+        self._blob = (
+            np.memmap(blob, dtype=np.uint8, mode="r")
+            if blob.stat().st_size
+            else np.zeros(0, dtype=np.uint8)
+        )
+        with open(self.path / "tags.json", "r", encoding="utf-8") as f:
+            self.tag_names: List[str] = json.load(f)
+        self._tag_index = {name: i for i, name in enumerate(self.tag_names)}
+
+    def __len__(self) -> int:
+        return int(self.meta["count"])
+
+    def is_stale(self, source: Optional[str] = None) -> bool:
+        """Исходный JSON изменился после сборки хранилища"""
+        source = source or self.meta.get("source")
+        if source is None or not os.path.exists(source):
+            return False
+        signature = _source_signature(source)
+        return any(self.meta.get(k) != v for k, v in signature.items())
+
+    def description(self, index: int) -> str:
+        start, end = self._desc_offsets[index], self._desc_offsets[index + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def descriptions(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self.description(index)
+
+    def tags(self, index: int) -> List[str]:
+        start, end = self._tag_offsets[index], self._tag_offsets[index + 1]
+        return [self.tag_names[t] for t in self._tag_ids[start:end]]
+
+    def pose(self, index: int) -> Pose:
+        row = self.coords[index]
+        return {
+            joint: [float(row[2 * i]), float(row[2 * i + 1])]
+            for i, joint in enumerate(JOINTS)
+        }
+
+    def record(self, index: int) -> Dict[str, Any]:
+        record = {"description": self.description(index), "pose": self.pose(index)}
+        tags = self.tags(index)
+        if tags:
+            record["tags"] = tags
+        return record
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def ids_with_tag(self, tag: str) -> np.ndarray:
+        """Номера поз с тегом - векторно, без обхода записей"""
+        tag_id = self._tag_index.get(tag)
+        if tag_id is None:
+            return np.zeros(0, dtype=np.int64)
+        positions = np.flatnonzero(self._tag_ids == tag_id)
+        return np.unique(
+            np.searchsorted(self._tag_offsets, positions, side="right") - 1
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка бинарного хранилища поз")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="JSON -> хранилище")
+    build.add_argument("source")
+    build.add_argument("--out", default="pose_store")
+    build.add_argument(
+        "--tfidf", action="store_true", help="сохранить рядом TF-IDF индекс описаний"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = build_store(args.source, args.out)
+    print(f"✅ {count} поз -> {args.out} за {time.perf_counter() - start:.2f}s")
+
+    if args.tfidf:
+        from .pose_retrieval import TfidfRetriever
+
+        retriever = TfidfRetriever().fit(PoseStore(args.out).descriptions())
+        retriever.save(args.out)
+        print(f"✅ TF-IDF: {retriever.stats['features']} признаков")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Streaming ingestion of the pose database (JSON array or JSONL).
+
+json.load держит в памяти весь разобранный документ. Здесь файл читается
+кусками по chunk_size символов, и записи по одной разбираются
+JSONDecoder.raw_decode прямо из буфера: в памяти только текущий кусок и
+текущая запись. Формат определяется по первому символу: "[" - JSON-массив,
+иначе - записи подряд (JSONL или JSON-объекты через пробелы).
+
+Записи можно отфильтровать (where) и оставить только нужные поля (fields)
+до того, как они попадут в индекс, а индексы пополняются пачками:
+
+    for chunk in iter_chunks(iter_records(path, fields=("description",)), 1000):
+        database.add_records(chunk)
+"""
+import json
+from itertools import islice
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+Record = Dict[str, Any]
+
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class _Buffer:
+    """Окно по текстовому потоку: подчитывает куски по мере разбора"""
+
+    def __init__(self, stream: IO[str], chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Разобранное начало буфера больше не нужно
+        self.text = self.text[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Следующий значащий символ ("" в конце потока)"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return self.text[self.pos : self.pos + 1]
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        self.peek()  # raw_decode не пропускает пробелы перед значением
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # Значение обрезано границей куска - подчитываем
+                if self.fill():
+                    continue
+                raise
+            # Число в конце буфера могло продолжиться в следующем куске
+            if (
+                isinstance(value, (int, float))
+                and not self.text[end:].strip(_NUMBER_CHARS)
+                and self.fill()
+            ):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json(stream: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Элементы JSON-массива или значения JSONL по одному"""
+    decoder = json.JSONDecoder()
+    buffer = _Buffer(stream, chunk_size)
+    if buffer.peek() != "[":
+        while buffer.peek():
+            yield buffer.decode(decoder)
+        return
+
+    buffer.pos += 1
+    if buffer.peek() == "]":
+        buffer.pos += 1
+    else:
+        while True:
+            yield buffer.decode(decoder)
+            separator = buffer.peek()
+            buffer.pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError(
+                    f"Expected ',' or ']' in JSON array, got {separator or 'EOF'!r}"
+                )
+    if buffer.peek():
+        raise ValueError("Extra data after JSON array")
+
+
+def project(record: Record, fields: Sequence[str]) -> Record:
+    return {k: record[k] for k in fields if k in record}
+
+
+def iter_records(
+    path: str,
+    where: Optional[Callable[[Record], bool]] = None,
+    fields: Optional[Sequence[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Record]:
+    """Записи базы поз из файла с фильтром и проекцией на лету"""
+    with open(path, "r", encoding="utf-8") as f:
+        for record in iter_json(f, chunk_size):
+            if where is not None and not where(record):
+                continue
+            yield project(record, fields) if fields else record
+
+
+def iter_chunks(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,102 @@
+"""Pose renderer backends for PoseAgent"""
+import base64
+import io
+from typing import Any, Dict, List, Optional, Union
+
+import requests
+from PIL import Image
+
+from . import tracing
+from .resilience import ResilientCaller
+
+Pose = Dict[str, List[float]]
+
+
+class PoseRenderer:
+    """Превращает позу в кадр. render() возвращает None, если кадр не получен"""
+
+    def render(self, pose: Pose) -> Optional[Any]:
+        raise NotImplementedError
+
+    def render_many(self, poses: List[Pose]) -> List[Any]:
+        return [frame for frame in map(self.render, poses) if frame is not None]
+
+    def close(self):
+        pass
+
+
+class HttpPoseRenderer(PoseRenderer):
+    """Рендеринг через Pose API: для раздельного развёртывания агента и сервиса.
+
+    base_url может быть списком реплик; запросы идут через ResilientCaller
+    (адаптивный таймаут, хеджирование, повторы, circuit breaker).
+    """
+
+    def __init__(
+        self,
+        base_url: Union[str, List[str]] = "http://localhost:8001",
+        timeout: float = 10,
+        **resilience: Any,
+    ):
+        self.urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.base_url = self.urls[0]
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=32)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        resilience.setdefault("max_timeout", timeout)
+        self.caller = ResilientCaller(self.urls, **resilience)
+
+    def _post(self, url: str, timeout: float, pose: Pose) -> Dict[str, Any]:
+        with tracing.span("pose_api.request", url=url, timeout=round(timeout, 3)):
+            response = self.session.post(
+                f"{url}/visualize",
+                json={"pose": pose},
+                timeout=timeout,
+                headers=tracing.inject_headers(),
+            )
+        # 5xx - проблема реплики, повторяем; 4xx - проблема позы, не повторяем
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response.json()
+
+    def render(self, pose: Pose) -> Optional[Image.Image]:
+        # Попытки идут в потоках ResilientCaller: переносим туда контекст трассы
+        result = self.caller.call(
+            tracing.bind(lambda url, timeout: self._post(url, timeout, pose))
+        )
+
+        if not (result.get("success") and result.get("image")):
+            return None
+        img_data = base64.b64decode(result["image"])
+        return Image.open(io.BytesIO(img_data))
+
+    def close(self):
+        self.caller.close()
+        self.session.close()
+
+
+class InProcessPoseRenderer(PoseRenderer):
+    """Рендеринг в том же процессе: без HTTP, JSON, PNG и base64.
+
+    output="pil" отдаёт PIL.Image (RGBA), output="numpy" - массив (H, W, 4).
+    Требует зависимостей Pose API (matplotlib, numpy, fastapi).
+    """
+
+    def __init__(self, output: str = "pil"):
+        if output not in ("pil", "numpy"):
+            raise ValueError(f"Unknown renderer output: {output}")
+
+        from .pose_api import PoseData, render_pose_array
+
+        self.output = output
+        self._pose_model = PoseData
+        self._render_array = render_pose_array
+
+    def render(self, pose: Pose) -> Any:
+        with tracing.span("render.frame"):
+            frame = self._render_array(self._pose_model(**pose))
+        if self.output == "numpy":
+            return frame
+        return Image.fromarray(frame)
@@ -0,0 +1,306 @@
+"""Client-side resilience for pose-service calls.
+
+Адаптивные таймауты по наблюдаемой задержке, хеджирование медленных
+запросов после p95, ограниченные повторы с джиттером и circuit breaker на
+каждую реплику.
+"""
+import bisect
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+
+class LatencyTracker:
+    """EWMA и скользящее окно задержек (секунды) для оценки перцентилей"""
+
+    def __init__(self, alpha: float = 0.2, window: int = 200):
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self._samples: deque = deque(maxlen=window)
+        self._sorted: List[float] = []
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.ewma = (
+                seconds
+                if self.ewma is None
+                else self.alpha * seconds + (1 - self.alpha) * self.ewma
+            )
+            if len(self._samples) == self._samples.maxlen:
+                oldest = self._samples[0]
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            self._samples.append(seconds)
+            bisect.insort(self._sorted, seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._sorted:
+                return None
+            index = min(len(self._sorted) - 1, int(q * len(self._sorted)))
+            return self._sorted[index]
+
+
+class CircuitBreaker:
+    """closed -> open после N ошибок подряд -> half-open после cooldown.
+
+    В half-open пропускается один пробный вызов; остальные отклоняются,
+    пока он не завершится: успех закрывает breaker, ошибка снова открывает.
+    Пробный вызов без результата дольше cooldown считается потерянным.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half-open"
+        return "open"
+
+    def _trial_running(self) -> bool:
+        return (
+            self._trial_at is not None
+            and time.monotonic() - self._trial_at < self.cooldown_seconds
+        )
+
+    def available(self) -> bool:
+        """Можно ли сейчас отправить вызов (без захвата пробного слота)"""
+        with self._lock:
+            state = self.state
+            return state == "closed" or (
+                state == "half-open" and not self._trial_running()
+            )
+
+    def allow(self) -> bool:
+        """Разрешить вызов; в half-open захватывает единственный пробный слот"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "open" or self._trial_running():
+                return False
+            self._trial_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_at = None
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Replica:
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self.inflight = 0
+
+
+class ReplicasUnavailable(RuntimeError):
+    pass
+
+
+class _AttemptFailed(Exception):
+    def __init__(self, replica: Replica, error: BaseException):
+        super().__init__(str(error))
+        self.replica = replica
+        self.error = error
+
+
+class ResilientCaller:
+    """Выполняет call(url) на одной из реплик с хеджированием и повторами.
+
+    Таймаут запроса = max(min_timeout, timeout_multiplier * p99) по
+    наблюдаемым задержкам, но не больше max_timeout. Если ответа нет дольше
+    p95, отправляется дубликат на другую (или ту же) реплику; побеждает
+    первый успешный ответ. Хедж отправляется не более чем для hedge_budget
+    доли запросов, чтобы не удваивать нагрузку.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        max_retries: int = 2,
+        backoff_base: float = 0.1,
+        backoff_cap: float = 2.0,
+        min_timeout: float = 1.0,
+        max_timeout: float = 30.0,
+        timeout_multiplier: float = 3.0,
+        hedge_quantile: float = 0.95,
+        hedge_budget: float = 0.1,
+        min_samples: int = 20,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 10.0,
+        max_workers: int = 16,
+    ):
+        if not urls:
+            raise ValueError("At least one replica URL is required")
+
+        self.replicas = [
+            Replica(url, CircuitBreaker(failure_threshold, cooldown_seconds))
+            for url in urls
+        ]
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self.latency = LatencyTracker()
+
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "retries": 0}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pose-client"
+        )
+        self._lock = threading.Lock()
+
+    def timeout(self) -> float:
+        if len(self.latency) < self.min_samples:
+            return self.max_timeout
+        p99 = self.latency.percentile(0.99)
+        return min(
+            self.max_timeout, max(self.min_timeout, self.timeout_multiplier * p99)
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        if len(self.latency) < self.min_samples:
+            return None
+        with self._lock:
+            if self.stats["hedges"] >= self.hedge_budget * self.stats["requests"]:
+                return None
+        return self.latency.percentile(self.hedge_quantile)
+
+    def _pick(self, exclude: Optional[Replica] = None) -> Replica:
+        candidates = [r for r in self.replicas if r.breaker.available()]
+        if exclude is not None and len(candidates) > 1:
+            candidates = [r for r in candidates if r is not exclude]
+        while candidates:
+            # Наименее загруженная, затем с меньшим числом ошибок и меньшей EWMA
+            replica = min(
+                candidates,
+                key=lambda r: (
+                    r.inflight,
+                    r.breaker.failures,
+                    r.latency.ewma or 0.0,
+                    random.random(),
+                ),
+            )
+            # Пробный слот half-open мог занять соседний поток
+            if replica.breaker.allow():
+                return replica
+            candidates.remove(replica)
+        raise ReplicasUnavailable("All pose-service replicas are open")
+
+    def _attempt(self, replica: Replica, call: Callable[[str, float], Any]):
+        timeout = self.timeout()
+        with self._lock:
+            replica.inflight += 1
+        start = time.perf_counter()
+        try:
+            result = call(replica.url, timeout)
+        except Exception:
+            replica.breaker.record_failure()
+            raise
+        finally:
+            with self._lock:
+                replica.inflight -= 1
+
+        elapsed = time.perf_counter() - start
+        replica.breaker.record_success()
+        replica.latency.observe(elapsed)
+        self.latency.observe(elapsed)
+        return result
+
+    def _hedged(
+        self, call: Callable[[str, float], Any], avoid: Optional[Replica] = None
+    ):
+        primary = self._pick(exclude=avoid)
+        futures = {self._executor.submit(self._attempt, primary, call): primary}
+
+        delay = self.hedge_delay()
+        done, _ = wait(futures, timeout=delay, return_when=FIRST_COMPLETED)
+        if not done and delay is not None:
+            try:
+                hedge = self._pick(exclude=primary)
+            except ReplicasUnavailable:
+                # Свободных реплик нет (основная держит пробный слот
+                # half-open): хедж не нужен, ждём основной вызов
+                hedge = None
+            if hedge is not None:
+                with self._lock:
+                    self.stats["hedges"] += 1
+                futures[self._executor.submit(self._attempt, hedge, call)] = hedge
+
+        errors = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if len(futures) > 1 and futures[future] is not primary:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    return future.result()
+                errors.append((futures[future], future.exception()))
+        raise _AttemptFailed(*errors[-1])
+
+    def call(self, call: Callable[[str, float], Any]):
+        """call(url, timeout) -> результат; исключение считается ошибкой"""
+        with self._lock:
+            self.stats["requests"] += 1
+
+        avoid = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._hedged(call, avoid)
+            except _AttemptFailed as failed:
+                if attempt == self.max_retries:
+                    raise failed.error
+                avoid = failed.replica
+                with self._lock:
+                    self.stats["retries"] += 1
+                # Full jitter: равномерно в [0, min(cap, base * 2^attempt)]
+                time.sleep(
+                    random.uniform(
+                        0, min(self.backoff_cap, self.backoff_base * 2**attempt)
+                    )
+                )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "timeout": self.timeout(),
+            "p95": self.latency.percentile(0.95),
+            "replicas": {
+                r.url: {"state": r.breaker.state, "ewma": r.latency.ewma}
+                for r in self.replicas
+            },
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,339 @@
+"""Validation and repair of create_animation tool arguments.
+
+Маленькие модели часто присылают почти правильные аргументы: JSON в
+markdown-блоке, висячие запятые, одинарные кавычки, обрезанный хвост,
+сустав как {"x": 1, "y": 2} или "10, 20", координаты за пределами холста.
+Такие дефекты исправляются здесь, до рендера; модели возвращается
+структурированная ошибка, только если исправить не удалось.
+"""
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    ValidationError,
+    ValidationInfo,
+    field_validator,
+    model_validator,
+)
+
+from .pose_codec import JOINTS, PoseDecodeError, decode_frames
+from .pose_library import REST_POSE
+
+CANVAS_LIMIT = 150.0
+MAX_POSES = 32
+
+_JOINT_KEYS = {joint.lower(): joint for joint in JOINTS}
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_UNQUOTED_KEY = re.compile(r"([{,]\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*:)")
+_PY_LITERAL = re.compile(r"\b(True|False|None)\b")
+# Строковые литералы в двойных или одинарных кавычках (с экранированием)
+_STRING_LITERAL = re.compile(r"(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class ToolArgumentsError(ValueError):
+    """Аргументы не удалось ни разобрать, ни исправить"""
+
+    def __init__(self, message: str, details: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.details = details or []
+
+    def to_result(self, encoding: str = "verbose") -> Dict[str, Any]:
+        """Ответ инструмента для модели: что не так и как исправить.
+
+        Подсказка повторяет схему инструмента для текущей кодировки поз:
+        в compact/delta у модели есть только "frames".
+        """
+        if encoding == "verbose":
+            hint = (
+                'Send {"action": str, "poses": [{"Torso": [x, y], ...}]} with '
+                f"joints {', '.join(JOINTS)} and coordinates in "
+                f"[-{CANVAS_LIMIT:g}, {CANVAS_LIMIT:g}]"
+            )
+        else:
+            values = "offsets from rest pose" if encoding == "delta" else "numbers"
+            hint = (
+                'Send {"action": str, "frames": [[12 numbers], ...]}: each frame '
+                f"is 12 {values} in order "
+                + ",".join(f"{joint}.x,{joint}.y" for joint in JOINTS)
+            )
+        return {"error": str(self), "details": self.details, "hint": hint}
+
+
+def _note(info: ValidationInfo, message: str):
+    if info.context is not None:
+        info.context["repairs"].append(message)
+
+
+def _close_brackets(text: str) -> str:
+    """Дописать незакрытую строку и скобки"""
+    stack = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            stack.append("]" if char == "[" else "}")
+        elif char in "]}" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    return re.sub(r",\s*$", "", text.rstrip()) + "".join(reversed(stack))
+
+
+def _complete_truncated(text: str) -> str:
+    """Обрезанный ответ: отбросить незаконченный хвост и закрыть скобки"""
+    for _ in range(64):
+        closed = _close_brackets(text)
+        try:
+            json.loads(closed)
+            return closed
+        except ValueError:
+            pass
+        cut = max(text.rfind(","), text.rfind("["), text.rfind("{"))
+        if cut <= 0:
+            break
+        text = text[:cut] if text[cut] == "," else text[: cut + 1]
+    return _close_brackets(text)
+
+
+def _single_to_double_quotes(text: str) -> str:
+    """Строки в одинарных кавычках -> JSON-строки; строки в двойных не трогаем.
+
+    Так исправляется и смешанная запись: {'action': 'say "hi"', "note": "it's"}.
+    """
+    out = []
+    quote = None
+    escaped = False
+    for char in text:
+        if quote is None:
+            if char in "'\"":
+                quote = char
+                out.append('"')
+            else:
+                out.append(char)
+        elif escaped:
+            escaped = False
+            # \' внутри одинарных кавычек - просто апостроф
+            out.append(char if char == "'" and quote == "'" else "\\" + char)
+        elif char == "\\":
+            escaped = True
+        elif char == quote:
+            quote = None
+            out.append('"')
+        elif char == '"':
+            out.append('\\"')
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def _outside_strings(fix):
+    """Применить правку только к тексту вне строковых литералов"""
+
+    def apply(text: str) -> str:
+        parts = _STRING_LITERAL.split(text)
+        # split с группой: нечётные элементы - сами литералы
+        return "".join(
+            part if index % 2 else fix(part) for index, part in enumerate(parts)
+        )
+
+    return apply
+
+
+_FIXES = (
+    (
+        "replaced Python literals",
+        _outside_strings(lambda s: _PY_LITERAL.sub(lambda m: _PY_LITERALS[m[1]], s)),
+    ),
+    (
+        "quoted object keys",
+        _outside_strings(lambda s: _UNQUOTED_KEY.sub(r'\1"\2"\3', s)),
+    ),
+    ("replaced single quotes", _single_to_double_quotes),
+    ("removed trailing commas", lambda s: _TRAILING_COMMA.sub(r"\1", s)),
+    ("completed truncated JSON", _complete_truncated),
+)
+
+
+def repair_json(text: Any) -> Tuple[Any, List[str]]:
+    """json.loads с исправлением типичных дефектов; возвращает (объект, правки)"""
+    if not isinstance(text, str):
+        raise ToolArgumentsError("Tool arguments must be a JSON string")
+    try:
+        return json.loads(text), []
+    except ValueError:
+        pass
+
+    repairs = []
+    candidate = _FENCE.sub("", text.strip())
+    start = candidate.find("{")
+    if start > 0:
+        candidate = candidate[start:]
+        repairs.append("dropped text before JSON object")
+
+    decoder = json.JSONDecoder()
+    error = None
+    for description, fix in ((None, None),) + _FIXES:
+        if fix is not None:
+            fixed = fix(candidate)
+            if fixed == candidate:
+                continue
+            candidate = fixed
+            repairs.append(description)
+        try:
+            data, end = decoder.raw_decode(candidate)
+        except ValueError as e:
+            error = e
+            continue
+        if candidate[end:].strip():
+            repairs.append("dropped text after JSON object")
+        return data, repairs
+
+    raise ToolArgumentsError(f"Invalid arguments JSON: {error}")
+
+
+class PoseArgs(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    Torso: Tuple[float, float]
+    Head: Tuple[float, float]
+    RH: Tuple[float, float]
+    LH: Tuple[float, float]
+    RK: Tuple[float, float]
+    LK: Tuple[float, float]
+
+    @model_validator(mode="before")
+    @classmethod
+    def normalize_joints(cls, data: Any, info: ValidationInfo) -> Any:
+        if not isinstance(data, dict):
+            return data
+        pose = {}
+        for key, value in data.items():
+            joint = _JOINT_KEYS.get(str(key).strip().lower())
+            if joint is not None:
+                pose[joint] = value
+        if not pose:
+            # Иначе вся поза молча заменилась бы позой покоя
+            raise ValueError(f"Pose has none of the joints {', '.join(JOINTS)}")
+        for joint in JOINTS:
+            if joint not in pose:
+                pose[joint] = list(REST_POSE[joint])
+                _note(info, f"filled missing {joint} from rest pose")
+        return pose
+
+    @field_validator(*JOINTS, mode="before")
+    @classmethod
+    def coerce_point(cls, value: Any, info: ValidationInfo) -> Any:
+        if isinstance(value, dict):
+            value = [value.get("x", value.get("X")), value.get("y", value.get("Y"))]
+        elif isinstance(value, str):
+            value = [
+                part for part in re.split(r"[\s,;]+", value.strip("[]() ")) if part
+            ]
+        if isinstance(value, (list, tuple)):
+            # float(True) == 1.0: как в decode_frame, булевы - не координаты
+            if any(isinstance(v, bool) for v in value):
+                raise ValueError("Coordinates must be numbers, not booleans")
+            if len(value) > 2:
+                _note(info, f"truncated {info.field_name} to 2 coordinates")
+                value = value[:2]
+        return value
+
+    @field_validator(*JOINTS)
+    @classmethod
+    def clamp_point(
+        cls, value: Tuple[float, float], info: ValidationInfo
+    ) -> Tuple[float, float]:
+        # NaN не сравнивается ни с чем и ушёл бы на край холста
+        if not all(math.isfinite(v) for v in value):
+            raise ValueError("Coordinates must be finite numbers")
+        clamped = tuple(max(-CANVAS_LIMIT, min(CANVAS_LIMIT, v)) for v in value)
+        if clamped != value:
+            _note(info, f"clamped {info.field_name} to canvas")
+        return clamped
+
+    def to_pose(self) -> Dict[str, List[float]]:
+        return {joint: list(getattr(self, joint)) for joint in JOINTS}
+
+
+class CreateAnimationArgs(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    action: str = "animation"
+    poses: List[PoseArgs] = Field(min_length=1)
+
+    @field_validator("action", mode="before")
+    @classmethod
+    def coerce_action(cls, value: Any) -> Any:
+        return "animation" if value is None else str(value)
+
+    @field_validator("poses", mode="before")
+    @classmethod
+    def coerce_poses(cls, value: Any, info: ValidationInfo) -> Any:
+        if isinstance(value, dict):
+            _note(info, "wrapped single pose into a list")
+            value = [value]
+        if isinstance(value, list) and len(value) > MAX_POSES:
+            _note(info, f"truncated poses to {MAX_POSES}")
+            value = value[:MAX_POSES]
+        return value
+
+
+def _error_details(error: ValidationError) -> List[Dict[str, Any]]:
+    return [
+        {"loc": ".".join(str(p) for p in e["loc"]), "msg": e["msg"]}
+        for e in error.errors()[:10]
+    ]
+
+
+def parse_tool_arguments(
+    function_name: str, arguments: Any, encoding: str = "verbose"
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Разобрать, исправить и проверить аргументы инструмента.
+
+    Возвращает (аргументы, список правок). Для create_animation аргументы
+    нормализуются к {"action", "poses"}: компактные frames декодируются,
+    суставы приводятся к [x, y] в пределах холста.
+    """
+    data, repairs = (
+        (arguments, []) if isinstance(arguments, dict) else repair_json(arguments)
+    )
+    if not isinstance(data, dict):
+        raise ToolArgumentsError("Tool arguments must be a JSON object")
+    if function_name != "create_animation":
+        return data, repairs
+
+    data = dict(data)
+    if not data.get("poses") and data.get("frames"):
+        try:
+            data["poses"] = decode_frames(
+                data["frames"], "delta" if encoding == "delta" else "compact"
+            )
+        except (PoseDecodeError, TypeError) as e:
+            raise ToolArgumentsError(str(e), [{"loc": "frames", "msg": str(e)}])
+
+    try:
+        parsed = CreateAnimationArgs.model_validate(data, context={"repairs": repairs})
+    except ValidationError as e:
+        raise ToolArgumentsError(
+            "Invalid create_animation arguments", _error_details(e)
+        )
+
+    return {
+        "action": parsed.action,
+        "poses": [pose.to_pose() for pose in parsed.poses],
+    }, repairs
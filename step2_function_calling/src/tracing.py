@@ -0,0 +1,220 @@
+"""Lightweight tracing with a local JSONL exporter.
+
+Спаны пишутся в JSONL-файл из переменной окружения POSE_TRACE_FILE (или
+через configure()); без неё трассировка выключена и почти ничего не стоит.
+Контекст передаётся между сервисами заголовком W3C traceparent.
+
+Разбор трасс:
+
+    python -m src.tracing traces.jsonl            # последние трассы
+    python -m src.tracing traces.jsonl --trace ID # одна трасса
+"""
+import argparse
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_current: contextvars.ContextVar = contextvars.ContextVar("pose_span", default=None)
+
+
+class JsonlSpanExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Dict[str, Any]):
+        line = json.dumps(span, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_exporter: Optional[JsonlSpanExporter] = None
+_service = os.getenv("POSE_TRACE_SERVICE", "pose")
+
+
+def configure(path: Optional[str], service: Optional[str] = None):
+    """Включить (path) или выключить (None) экспорт спанов"""
+    global _exporter, _service
+    _exporter = JsonlSpanExporter(path) if path else None
+    if service:
+        _service = service
+
+
+if os.getenv("POSE_TRACE_FILE"):
+    configure(os.environ["POSE_TRACE_FILE"])
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "start")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str]):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs: Dict[str, Any] = {}
+        self.start = time.time()
+
+    def set(self, **attrs: Any):
+        self.attrs.update(attrs)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    if _exporter is None:
+        yield None
+        return
+
+    parent = _current.get()
+    if parent is None:
+        current = Span(name, secrets.token_hex(16), None)
+    else:
+        current = Span(name, parent.trace_id, parent.span_id)
+    current.attrs.update(attrs)
+
+    token = _current.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        _current.reset(token)
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(
+                {
+                    "trace_id": current.trace_id,
+                    "span_id": current.span_id,
+                    "parent_id": current.parent_id,
+                    "name": current.name,
+                    "service": _service,
+                    "start": current.start,
+                    "duration_ms": round(duration_ms, 3),
+                    "attrs": current.attrs,
+                }
+            )
+
+
+def inject_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    headers = dict(headers or {})
+    current = _current.get()
+    if current is not None:
+        headers["traceparent"] = f"00-{current.trace_id}-{current.span_id}-01"
+    return headers
+
+
+@contextmanager
+def remote_parent(headers) -> Iterator[None]:
+    """Продолжить трассу из входящего заголовка traceparent"""
+    value = headers.get("traceparent") if headers is not None else None
+    parts = value.split("-") if value else []
+    if _exporter is None or len(parts) != 4:
+        yield
+        return
+
+    parent = Span("remote", parts[1], None)
+    parent.span_id = parts[2]
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def bind(fn: Callable) -> Callable:
+    """Перенести текущий контекст трассировки в другой поток"""
+    context = contextvars.copy_context()
+    # Копия на каждый вызов: один контекст нельзя войти из двух потоков сразу
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def format_trace(spans: List[Dict[str, Any]], width: int = 40) -> str:
+    """Дерево спанов с полосами времени и сводкой собственного времени"""
+    by_parent: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    ids = {s["span_id"] for s in spans}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        by_parent[parent].append(s)
+    for children in by_parent.values():
+        children.sort(key=lambda s: s["start"])
+
+    roots = by_parent[None]
+    t0 = min(s["start"] for s in spans)
+    total_ms = max(s["start"] * 1000 + s["duration_ms"] for s in spans) - t0 * 1000
+    scale = width / max(total_ms, 1e-9)
+
+    lines = [f"trace {spans[0]['trace_id']}  total {total_ms:.1f}ms"]
+    self_time: Dict[str, float] = defaultdict(float)
+
+    def walk(s: Dict[str, Any], depth: int):
+        children = by_parent.get(s["span_id"], [])
+        self_time[s["name"]] += max(
+            0.0, s["duration_ms"] - sum(c["duration_ms"] for c in children)
+        )
+        offset = int((s["start"] - t0) * 1000 * scale)
+        bar = " " * offset + "█" * max(1, int(s["duration_ms"] * scale))
+        label = f"{'  ' * depth}{s['name']} [{s['service']}]"
+        lines.append(f"{label:50s} {s['duration_ms']:9.1f}ms |{bar:{width}s}|")
+        for child in children:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+
+    lines.append("self time:")
+    for name, ms in sorted(self_time.items(), key=lambda kv: kv[1], reverse=True):
+        lines.append(f"  {name:40s} {ms:9.1f}ms {ms / max(total_ms, 1e-9):6.1%}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Разбор трасс из JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--trace", help="trace_id (по умолчанию последние)")
+    parser.add_argument("--last", type=int, default=3)
+    args = parser.parse_args()
+
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for s in load_spans(args.path):
+        traces[s["trace_id"]].append(s)
+
+    if args.trace:
+        selected = [args.trace]
+    else:
+        ordered = sorted(traces, key=lambda t: min(s["start"] for s in traces[t]))
+        selected = ordered[-args.last :]
+
+    for trace_id in selected:
+        print(format_trace(traces[trace_id]))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Бенчмарк агентного цикла: PoseAgent против mock LLM и in-process рендера
+
+Не нужны ни Ollama, ни Pose API: mock LLM (src/mock_llm.py) поднимается в этом
+же процессе, кадры рисуются InProcessPoseRenderer. Для каждого уровня
+параллелизма печатаются ходы/сек, задержка хода, разбивка по этапам (по спанам
+src/tracing.py) и пик памяти Python (tracemalloc).
+
+    poetry run python test_scripts/benchmark_agent.py --concurrency 1 4 16
+    poetry run python test_scripts/benchmark_agent.py --token-latency 0.01 \\
+        --no-terminal --encoding compact
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, ".")
+
+import httpx  # noqa: E402
+from openai import OpenAI  # noqa: E402
+
+from src import tracing  # noqa: E402
+from src.mock_llm import create_app  # noqa: E402
+from src.pose_agent import PoseAgent  # noqa: E402
+from src.renderers import InProcessPoseRenderer  # noqa: E402
+
+PROMPTS = [
+    "Помаши рукой",
+    "Прыгни",
+    "Сделай приседание",
+    "Станцуй",
+    "Покажи звезду",
+    "Сядь",
+]
+
+
+def start_mock_llm(**options) -> str:
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_app(**options), host="127.0.0.1", port=port, log_level="warning"
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def run_level(args, client, renderer, concurrency: int, trace_path: str):
+    open(trace_path, "w").close()
+    agents = [
+        PoseAgent(
+            client=client,
+            renderer=renderer,
+            pose_encoding=args.encoding,
+            animation_format=args.format,
+            terminal_tools={} if args.no_terminal else None,
+        )
+        for _ in range(concurrency)
+    ]
+
+    def session(index: int):
+        agent = agents[index]
+        latencies = []
+        for turn in range(args.turns):
+            prompt = PROMPTS[(index + turn) % len(PROMPTS)]
+            start = time.perf_counter()
+            result = agent.chat(prompt, force_llm=not args.library)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert result.get("image"), result.get("text")
+        return latencies
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [
+            ms for part in pool.map(session, range(concurrency)) for ms in part
+        ]
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+
+    history_bytes = statistics.mean(agent.memory.size_bytes() for agent in agents)
+    for agent in agents:
+        agent.close()
+
+    phases = defaultdict(list)
+    for span in tracing.load_spans(trace_path):
+        phases[span["name"]].append(span["duration_ms"])
+
+    return {
+        "turns": len(latencies),
+        "turns_per_sec": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "peak_mb": peak / 1024 / 1024,
+        "history_kb": history_bytes / 1024,
+        "phases": phases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--turns", type=int, default=10, help="ходов на сессию")
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--prefill-per-token", type=float, default=0.0)
+    parser.add_argument(
+        "--encoding", default="verbose", choices=["verbose", "compact", "delta"]
+    )
+    parser.add_argument("--format", default="gif", choices=["gif", "webp", "apng"])
+    parser.add_argument(
+        "--no-terminal",
+        action="store_true",
+        help="после инструмента снова вызывать LLM за текстом ответа",
+    )
+    parser.add_argument(
+        "--library", action="store_true", help="разрешить ответы из PoseLibrary"
+    )
+    args = parser.parse_args()
+
+    base_url = start_mock_llm(
+        token_latency=args.token_latency,
+        prefill_per_token=args.prefill_per_token,
+        frames_encoding="delta" if args.encoding == "delta" else "compact",
+    )
+    pool_size = max(args.concurrency) * 2
+    client = OpenAI(
+        base_url=base_url,
+        api_key="mock",
+        http_client=httpx.Client(
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            )
+        ),
+    )
+    renderer = InProcessPoseRenderer(output="numpy")
+
+    trace_path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    tracing.configure(trace_path, service="benchmark")
+    tracemalloc.start()
+
+    print(
+        f"🤖 Бенчмарк агента (mock LLM, {args.turns} ходов/сессию, "
+        f"encoding={args.encoding}, format={args.format}, "
+        f"token_latency={args.token_latency}s)"
+    )
+    print("=" * 78)
+
+    # Прогрев: импорт matplotlib, первые соединения
+    run_level(args, client, renderer, 1, trace_path)
+
+    for concurrency in args.concurrency:
+        level = run_level(args, client, renderer, concurrency, trace_path)
+        print(
+            f"\nпараллельно {concurrency:3d} | {level['turns_per_sec']:7.1f} ходов/с | "
+            f"p50 {level['p50']:7.1f}ms | p95 {level['p95']:7.1f}ms | "
+            f"пик {level['peak_mb']:6.1f}MB | история {level['history_kb']:6.1f}KB"
+        )
+        for name, durations in sorted(
+            level["phases"].items(), key=lambda kv: sum(kv[1]), reverse=True
+        ):
+            print(
+                f"    {name:24s} x{len(durations):5d} | "
+                f"p50 {statistics.median(durations):7.2f}ms | "
+                f"p95 {percentile(durations, 0.95):7.2f}ms"
+            )
+
+    tracing.configure(None)
+    renderer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Бенчмарк кодирования анимаций: текущий путь PIL vs AnimationWriter
+
+Кадры демо-анимаций (wave, jump, squat, dance) рендерятся в процессе,
+затем кодируются прежним способом (frames[0].save(format="GIF", ...)) и
+новым энкодером в GIF, WebP и APNG.
+
+    poetry run python test_scripts/benchmark_animation_encoding.py
+"""
+
+import io
+import sys
+import time
+
+sys.path.insert(0, ".")
+
+from src.animation_encoder import encode_animation  # noqa: E402
+from src.pose_library import BUILTIN_SEQUENCES  # noqa: E402
+from src.renderers import InProcessPoseRenderer  # noqa: E402
+
+REPEATS = 5
+
+
+def pil_gif(frames) -> bytes:
+    buffer = io.BytesIO()
+    frames[0].save(
+        buffer,
+        format="GIF",
+        save_all=True,
+        append_images=frames[1:],
+        duration=500,
+        loop=0,
+    )
+    return buffer.getvalue()
+
+
+def timed(encode, frames):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        data = encode(frames)
+    return len(data), (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    renderer = InProcessPoseRenderer()
+    encoders = {
+        "pil-gif": pil_gif,
+        "gif": lambda frames: encode_animation(frames, "gif"),
+        "webp": lambda frames: encode_animation(frames, "webp"),
+        "apng": lambda frames: encode_animation(frames, "apng"),
+    }
+
+    print("🎞️ Бенчмарк кодирования анимаций")
+    print("=" * 60)
+
+    totals = {name: [0, 0.0] for name in encoders}
+    for sequence in BUILTIN_SEQUENCES:
+        if len(sequence.poses) < 2:
+            continue
+        frames = renderer.render_many(sequence.poses)
+        print(f"\n{sequence.name.upper()} ({len(frames)} кадров):")
+        for name, encode in encoders.items():
+            size, ms = timed(encode, frames)
+            totals[name][0] += size
+            totals[name][1] += ms
+            print(f"  {name:8s} | {size:8d} bytes | {ms:7.2f}ms")
+
+    base_size, base_ms = totals["pil-gif"]
+    print("\nИТОГО относительно pil-gif:")
+    for name, (size, ms) in totals.items():
+        print(
+            f"  {name:8s} | {size:8d} bytes ({size / base_size:5.0%}) | "
+            f"{ms:7.2f}ms ({ms / base_ms:5.0%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
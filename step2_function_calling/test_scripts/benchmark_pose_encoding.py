@@ -0,0 +1,101 @@
+"""Бенчмарк схем create_animation: verbose vs compact vs delta
+
+Для каждой схемы один и тот же запрос отправляется в одну и ту же модель,
+измеряются сгенерированные токены (usage.completion_tokens) и время ответа.
+Рендеринг не выполняется - меряется только генерация аргументов.
+
+    poetry run python test_scripts/benchmark_pose_encoding.py --repeats 3
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+sys.path.insert(0, ".")
+
+from src.pose_agent import PoseAgent  # noqa: E402
+from src.pose_codec import PoseDecodeError, decode_frames  # noqa: E402
+
+PROMPTS = [
+    "Создай анимацию: человек машет правой рукой",
+    "Создай анимацию прыжка с руками вверх",
+    "Создай анимацию: человек делает наклон влево и вправо",
+]
+
+
+def count_frames(encoding: str, arguments: str) -> int:
+    args = json.loads(arguments)
+    if encoding == "verbose":
+        return len(args.get("poses", []))
+    decode_frames(args.get("frames", []), encoding)
+    return len(args["frames"])
+
+
+def run(encoding: str, llm_base_url: str, model: str, repeats: int):
+    agent = PoseAgent(
+        llm_base_url=llm_base_url,
+        model=model,
+        pose_encoding=encoding,
+        use_pose_library=False,
+    )
+
+    tokens, seconds, frames, failures = [], [], [], 0
+    for prompt in PROMPTS:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            response = agent.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": agent.system_message},
+                    {"role": "user", "content": prompt},
+                ],
+                tools=agent.tools,
+                tool_choice="auto",
+                temperature=0.0,
+                max_tokens=1024,
+            )
+            elapsed = time.perf_counter() - start
+
+            message = response.choices[0].message
+            try:
+                n_frames = count_frames(
+                    encoding, message.tool_calls[0].function.arguments
+                )
+            except (TypeError, IndexError, ValueError, PoseDecodeError):
+                failures += 1
+                continue
+
+            tokens.append(response.usage.completion_tokens)
+            seconds.append(elapsed)
+            frames.append(max(1, n_frames))
+
+    if not tokens:
+        print(f"{encoding:8s} | все вызовы неудачны ({failures})")
+        return
+
+    per_frame = [t / f for t, f in zip(tokens, frames)]
+    print(
+        f"{encoding:8s} | tokens: {statistics.mean(tokens):7.1f} | "
+        f"tokens/frame: {statistics.mean(per_frame):6.1f} | "
+        f"time: {statistics.mean(seconds):6.2f}s | "
+        f"frames: {statistics.mean(frames):4.1f} | failures: {failures}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-base-url", default="http://localhost:11434/v1")
+    parser.add_argument("--model", default="qwen2.5:1.5b")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print("📏 Бенчмарк схем create_animation")
+    print("=" * 60)
+    for encoding in ("verbose", "compact", "delta"):
+        run(encoding, args.llm_base_url, args.model, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
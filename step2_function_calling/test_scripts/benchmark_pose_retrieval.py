@@ -0,0 +1,80 @@
+"""Бенчмарк TF-IDF поиска по описаниям поз при росте базы
+
+Описания синтетические: случайные сочетания слов из словаря поз. Для каждого
+размера печатаются время построения, сохранения/загрузки индекса и задержка
+одиночного и пакетного запроса.
+
+    poetry run python test_scripts/benchmark_pose_retrieval.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+
+from src.pose_retrieval import TfidfRetriever  # noqa: E402
+
+WORDS = (
+    "макарена правая левая рука руки вперед вверх вниз прыжок танец бедро "
+    "голова колено шаг поворот хлопок сальса твист приседание наклон махать "
+    "плечо затылок ладонь"
+).split()
+
+QUERIES = ["макарену", "wave", "прыжки вверх", "присесть", "правую руку на бедро"]
+
+
+def synthetic_descriptions(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(4, 10))) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    print("🔎 Бенчмарк TF-IDF поиска по описаниям поз")
+    print("=" * 78)
+    for size in args.sizes:
+        retriever = TfidfRetriever().fit(synthetic_descriptions(size))
+
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            retriever.save(directory)
+            save_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            loaded = TfidfRetriever.load(directory)
+            load_ms = (time.perf_counter() - start) * 1000
+
+            single = []
+            for query in QUERIES * 5:
+                start = time.perf_counter()
+                loaded.query(query, k=args.k)
+                single.append((time.perf_counter() - start) * 1000)
+
+            batch = [QUERIES[i % len(QUERIES)] for i in range(args.batch)]
+            start = time.perf_counter()
+            loaded.query(batch, k=args.k)
+            batch_ms = (time.perf_counter() - start) * 1000
+            del loaded
+
+        print(
+            f"{size:8d} поз | признаков {retriever.stats['features']:6d} | "
+            f"построение {retriever.stats['build_seconds']:6.2f}s | "
+            f"save {save_ms:6.1f}ms | load {load_ms:5.1f}ms"
+        )
+        print(
+            f"{'':13s}| запрос p50 {statistics.median(single):7.2f}ms | "
+            f"пакет {args.batch}: {batch_ms:8.1f}ms "
+            f"({batch_ms / args.batch:6.3f}ms/запрос)"
+        )
+
+
+if __name__ == "__main__":
+    main()
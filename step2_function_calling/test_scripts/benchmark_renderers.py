@@ -0,0 +1,91 @@
+"""Бенчмарк бэкендов рендеринга: HTTP Pose API vs in-process
+
+По умолчанию Pose API поднимается в этом же процессе (uvicorn в потоке),
+чтобы сравнение не зависело от Docker. --pose-api-url - внешний сервис.
+
+    poetry run python test_scripts/benchmark_renderers.py --frames 50
+"""
+
+import argparse
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import uvicorn
+
+sys.path.insert(0, ".")
+
+from src.pose_library import BUILTIN_SEQUENCES  # noqa: E402
+from src.renderers import HttpPoseRenderer, InProcessPoseRenderer  # noqa: E402
+
+
+def start_local_pose_api() -> str:
+    from src.pose_api import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def measure(renderer, poses, warmup: int = 3):
+    for pose in poses[:warmup]:
+        renderer.render(pose)
+
+    timings = []
+    for pose in poses:
+        start = time.perf_counter()
+        frame = renderer.render(pose)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert frame is not None
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--pose-api-url", default=None)
+    args = parser.parse_args()
+
+    all_poses = [pose for s in BUILTIN_SEQUENCES for pose in s.poses]
+    poses = [all_poses[i % len(all_poses)] for i in range(args.frames)]
+
+    pose_api_url = args.pose_api_url or start_local_pose_api()
+
+    backends = {
+        "http": HttpPoseRenderer(pose_api_url),
+        "inprocess-pil": InProcessPoseRenderer(output="pil"),
+        "inprocess-numpy": InProcessPoseRenderer(output="numpy"),
+    }
+
+    print(f"🖼️ Бенчмарк рендереров ({args.frames} кадров, {pose_api_url})")
+    print("=" * 60)
+
+    medians = {}
+    for name, renderer in backends.items():
+        timings = measure(renderer, poses)
+        medians[name] = statistics.median(timings)
+        p95 = sorted(timings)[int(0.95 * (len(timings) - 1))]
+        print(
+            f"{name:16s} | median: {medians[name]:7.2f}ms | p95: {p95:7.2f}ms | "
+            f"total: {sum(timings):8.1f}ms"
+        )
+        renderer.close()
+
+    baseline = medians["inprocess-numpy"]
+    print("\nНакладные расходы на кадр относительно inprocess-numpy:")
+    for name, median in medians.items():
+        print(f"  {name:16s} +{median - baseline:6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
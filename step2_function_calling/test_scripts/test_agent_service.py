@@ -0,0 +1,133 @@
+"""Тест многосессионного сервиса агента (без LLM: запросы из библиотеки поз)"""
+
+from fastapi.testclient import TestClient
+
+from src.agent_service import SessionStore, create_app
+from src.pose_agent import PoseAgent
+from src.renderers import InProcessPoseRenderer
+
+
+def test_chat_artifact_and_spill(tmp_path):
+    app = create_app(renderer="inprocess", max_sessions=2, spill_dir=str(tmp_path))
+
+    with TestClient(app) as client:
+        result = client.post("/sessions/u1/chat", json={"message": "wave"}).json()
+        assert result["source"] == "pose_library"
+
+        artifact = client.get(result["artifact_url"])
+        assert artifact.status_code == 200
+        assert artifact.headers["content-type"] == "image/gif"
+
+        # u1 вытесняется на диск и восстанавливается при следующем запросе
+        for session_id in ("u2", "u3"):
+            client.post(f"/sessions/{session_id}/chat", json={"message": "jump"})
+        assert app.state.sessions._spill_path("u1").exists()
+
+        client.post("/sessions/u1/chat", json={"message": "squat"})
+        stats = client.get("/stats").json()["sessions"]
+        assert stats["restored"] == 1
+        with app.state.sessions.checkout("u1") as session:
+            assert len(session.agent.conversation_history) == 4
+
+        client.post("/sessions/u1/reset")
+        with app.state.sessions.checkout("u1") as session:
+            assert session.agent.conversation_history == []
+
+
+def make_store(tmp_path, **kwargs) -> SessionStore:
+    renderer = InProcessPoseRenderer()
+    return SessionStore(
+        lambda: PoseAgent(renderer=renderer), spill_dir=str(tmp_path), **kwargs
+    )
+
+
+def test_new_session_survives_eviction_when_others_are_busy(tmp_path):
+    store = make_store(tmp_path, max_sessions=2)
+    busy = [store.get(session_id) for session_id in ("a", "b")]
+    for session in busy:
+        session.lock.acquire()
+
+    # Все остальные заняты: вытеснять нечего, новая сессия остаётся
+    session = store.get("c")
+    assert session.session_id == "c"
+    assert store.snapshot()["sessions"] == 3
+
+    store.release(session)
+    for session in busy:
+        session.lock.release()
+        store.release(session)
+    assert store.snapshot()["sessions"] == 2
+
+
+def test_session_is_not_evicted_before_its_turn_starts(tmp_path):
+    store = make_store(tmp_path, max_sessions=1)
+    session = store.get("a")
+    session.agent.memory.append({"role": "user", "content": "привет"})
+
+    # Другие запросы приходят до того, как ход "a" взял блокировку
+    for session_id in ("b", "c"):
+        with store.checkout(session_id):
+            pass
+    assert store.snapshot()["evicted"] == 2
+    assert not store._spill_path("a").exists()
+
+    with session.lock:
+        session.agent.memory.append({"role": "assistant", "content": "ок"})
+    store.release(session)
+
+    with store.checkout("a") as restored:
+        assert restored is session
+        assert len(restored.agent.conversation_history) == 2
+
+
+def test_similar_ids_do_not_share_spill_files(tmp_path):
+    store = make_store(tmp_path, max_sessions=1)
+    ids = ("u.1", "u1", "alice!", "alice", "!!!")
+    assert len({store._spill_path(session_id) for session_id in ids}) == len(ids)
+
+    for session_id in ids:
+        with store.checkout(session_id) as session:
+            session.agent.memory.append({"role": "user", "content": session_id})
+    for session_id in ids:
+        with store.checkout(session_id) as session:
+            assert session.agent.conversation_history == [
+                {"role": "user", "content": session_id}
+            ]
+
+
+def test_evicted_state_is_restored_before_it_reaches_disk(tmp_path):
+    store = make_store(tmp_path, max_sessions=1)
+    with store.checkout("a") as session:
+        session.agent.memory.append({"role": "user", "content": "привет"})
+
+    # Вытеснение без записи на диск: состояние ждёт в _pending
+    store._write_spills = lambda: None
+    with store.checkout("b"):
+        pass
+    assert not store._spill_path("a").exists()
+
+    with store.checkout("a") as session:
+        assert len(session.agent.conversation_history) == 1
+    assert store.snapshot()["restored"] == 1
+
+
+def test_delete_waits_for_running_turn(tmp_path):
+    store = make_store(tmp_path)
+    session = store.get("a")
+    closed = []
+    session.agent.close = lambda: closed.append(session.session_id)
+
+    store.delete("a")
+    # Ход ещё идёт: агент не закрыт, а новый запрос получает новую сессию
+    assert closed == []
+    with store.checkout("a") as fresh:
+        assert fresh is not session
+
+    store.release(session)
+    assert closed == ["a"]
+    assert store.snapshot()["sessions"] == 1
+
+
+def test_unknown_artifact():
+    with TestClient(create_app(renderer="inprocess")) as client:
+        assert client.get("/artifacts/missing").status_code == 404
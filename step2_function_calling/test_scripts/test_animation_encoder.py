@@ -0,0 +1,42 @@
+"""Тест энкодера анимаций (без Pose API)"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageSequence
+
+from src.animation_encoder import encode_animation
+
+
+def _frames():
+    frames = []
+    for x in (20, 40, 60):
+        image = Image.new("RGBA", (120, 160), (255, 255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        draw.line([(60, 80), (x, 20)], fill="#E74C3C", width=3)
+        draw.ellipse([52, 10, 68, 26], fill="#FFD700")
+        frames.append(image)
+    return frames
+
+
+@pytest.mark.parametrize("format", ["gif", "webp", "apng"])
+def test_roundtrip(format):
+    frames = _frames()
+    animation = Image.open(io.BytesIO(encode_animation(frames, format)))
+
+    decoded = [f.convert("RGB") for f in ImageSequence.Iterator(animation)]
+    assert len(decoded) == len(frames)
+    for original, restored in zip(frames, decoded):
+        diff = np.abs(
+            np.asarray(original.convert("RGB"), dtype=int)
+            - np.asarray(restored, dtype=int)
+        )
+        assert diff.mean() < 2
+
+
+def test_gif_stores_only_changed_region():
+    frames = _frames()
+    still = encode_animation([frames[0]] * 10, "gif")
+    single = encode_animation([frames[0]], "gif")
+    assert len(still) - len(single) < 10 * 40
@@ -0,0 +1,93 @@
+"""Тест пакетной генерации (mock LLM, in-process рендер)"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from src.batch_generate import BatchRunner, load_items, main
+from src.mock_llm import create_app
+from src.pose_agent import PoseAgent
+from src.renderers import InProcessPoseRenderer
+
+
+def test_batch_is_resumable(tmp_path):
+    prompts = tmp_path / "prompts.jsonl"
+    prompts.write_text(
+        "\n".join(
+            [
+                json.dumps({"id": "wave", "action": "wave"}),
+                json.dumps({"prompt": "Изобрази что-нибудь весёлое"}),
+                json.dumps("Прыгни"),
+                json.dumps({"id": "refused", "prompt": "Просто поболтаем"}),
+            ]
+        ),
+        encoding="utf-8",
+    )
+    script = [{"match": "поболтаем", "responses": [{"content": "Не могу"}]}]
+    client = OpenAI(
+        base_url="http://testserver/v1",
+        api_key="mock",
+        http_client=TestClient(create_app(script=script)),
+    )
+    renderer = InProcessPoseRenderer(output="numpy")
+    out_dir = tmp_path / "out"
+
+    def run():
+        runner = BatchRunner(
+            lambda: PoseAgent(client=client, renderer=renderer),
+            str(out_dir),
+            concurrency=2,
+            force_llm=True,
+        )
+        return runner.run(load_items(str(prompts)), verbose=False)
+
+    report = run()
+    assert report["succeeded"] == 3
+    assert report["failures"] == [{"id": "refused", "error": "Не могу"}]
+    assert report["sources"] == {"pose_library": 1, "llm": 2}
+    assert (out_dir / "wave.gif").read_bytes()[:6] == b"GIF89a"
+
+    # Повторный запуск берёт в работу только неудавшийся элемент
+    report = run()
+    assert report["skipped"] == 3
+    assert report["processed"] == 1
+    manifest = (out_dir / "manifest.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(manifest) == 5
+
+
+def write_prompts(tmp_path, records):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+    return str(path)
+
+
+def test_ids_map_to_distinct_file_names(tmp_path):
+    ids = ["pose 1", "pose1", "alice!", "alice", "../x", "a" * 200]
+    items = load_items(
+        write_prompts(tmp_path, [{"id": i, "action": "wave"} for i in ids])
+    )
+
+    names = [item["id"] for item in items]
+    assert len(set(names)) == len(ids)
+    assert names[1] == "pose1" and names[3] == "alice"
+    assert all(len(name) <= 128 and "/" not in name for name in names)
+
+    # Одинаковые запросы без id - один элемент
+    items = load_items(write_prompts(tmp_path, ["Прыгни", "Прыгни", "Присядь"]))
+    assert len(items) == 2
+
+
+def test_duplicate_ids_are_rejected(tmp_path):
+    path = write_prompts(
+        tmp_path, [{"id": "a", "action": "wave"}, {"id": "a", "action": "jump"}]
+    )
+    with pytest.raises(ValueError, match="duplicate id 'a'"):
+        load_items(path)
+
+
+def test_unknown_pose_encoding_is_rejected_by_argparse(capsys):
+    with pytest.raises(SystemExit):
+        main(["prompts.jsonl", "--pose-encoding", "zip"])
+    assert "invalid choice" in capsys.readouterr().err
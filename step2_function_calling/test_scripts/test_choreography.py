@@ -0,0 +1,33 @@
+"""Тест упорядочивания поз по перемещению суставов"""
+
+import time
+
+import numpy as np
+
+from src.choreography import distance_matrix, order_poses, path_length
+
+
+def test_order_recovers_shuffled_motion():
+    # Плавное движение руки, перемешанное случайно
+    steps = np.linspace(0, 1, 20)
+    coords = np.zeros((20, 12))
+    coords[:, 4] = 100 * steps
+    coords[:, 5] = 40 * np.sin(3 * steps)
+    shuffled = np.random.default_rng(0).permutation(20)
+
+    order = order_poses(coords[shuffled], start=int(np.argmin(shuffled)))
+    assert list(shuffled[order]) == list(range(20))
+
+
+def test_pinned_ends_and_speed():
+    coords = np.random.default_rng(1).uniform(-100, 100, (300, 12))
+    dist = distance_matrix(coords)
+
+    start_time = time.perf_counter()
+    order = order_poses(coords, start=7, end=42)
+    elapsed = time.perf_counter() - start_time
+
+    assert order[0] == 7 and order[-1] == 42
+    assert sorted(order) == list(range(300))
+    assert path_length(dist, order) < 0.7 * path_length(dist, range(300))
+    assert elapsed < 2.0
@@ -0,0 +1,120 @@
+"""Тест создания танцев с параллельным рендерингом (без сервисов)"""
+
+import json
+import threading
+import time
+
+from PIL import Image
+
+from dance_creator import DanceCreator, dance_filename
+from src import pose_database
+from src.pose_database import StorePoseDatabase
+from src.pose_library import BUILTIN_SEQUENCES
+from src.pose_store import build_store
+from src.renderers import PoseRenderer
+
+POSES = [pose for sequence in BUILTIN_SEQUENCES for pose in sequence.poses]
+
+
+class SlowRenderer(PoseRenderer):
+    """Кадр - однотонное изображение; считает одновременные рендеры"""
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def render(self, pose):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        if pose == self.fail:
+            return None
+        shade = int(abs(pose["LH"][0]) + abs(pose["RH"][1])) % 256
+        return Image.new("RGB", (32, 32), (shade, 100, 200))
+
+
+def make_creator(tmp_path, renderer, concurrency=3):
+    records = [
+        {"description": f"Макарена: поза {i}", "pose": p} for i, p in enumerate(POSES)
+    ]
+    records += [
+        {"description": f"Робот: поза {i}", "pose": p} for i, p in enumerate(POSES[:4])
+    ]
+    path = tmp_path / "poses.json"
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    return DanceCreator(
+        str(path), store_path=None, renderer=renderer, concurrency=concurrency
+    )
+
+
+def test_dance_is_rendered_concurrently_and_written_in_order(tmp_path):
+    renderer = SlowRenderer(fail=POSES[2])
+    creator = make_creator(tmp_path, renderer)
+    output = str(tmp_path / "macarena.gif")
+
+    result = creator.create_dance_animation("макарен*", output)
+    creator.close()
+
+    assert result["frames"] == len(POSES)  # упавший кадр заменён похожей позой
+    assert set(result["timings"]) == {"search", "order", "render", "encode", "total"}
+    assert 1 < renderer.max_active <= 3
+    with Image.open(output) as gif:
+        assert gif.n_frames >= 2
+    assert not (tmp_path / "macarena.gif.tmp").exists()
+
+
+def test_many_dances_share_the_render_pool(tmp_path):
+    renderer = SlowRenderer()
+    creator = make_creator(tmp_path, renderer, concurrency=2)
+
+    results = creator.create_dances(["макарен*", "робот", "нет такого"], str(tmp_path))
+    creator.close()
+
+    assert results["макарен*"]["frames"] == len(POSES)
+    assert results["робот"]["frames"] == 4
+    assert results["нет такого"] is None
+    assert (tmp_path / dance_filename("робот")).exists()
+    assert renderer.max_active <= 2
+
+
+def test_store_serves_search_without_parsing_json(tmp_path, monkeypatch):
+    json_creator = make_creator(tmp_path, SlowRenderer())
+    expected = json_creator.find_dance_poses("робот")
+    json_creator.close()
+    build_store(json_creator.database_path, str(tmp_path / "store"))
+
+    # JSON больше не читается: только столбцы хранилища
+    def no_json(*args, **kwargs):
+        raise AssertionError("poses.json parsed")
+
+    monkeypatch.setattr(pose_database, "iter_records", no_json)
+    creator = DanceCreator(
+        json_creator.database_path,
+        store_path=str(tmp_path / "store"),
+        renderer=SlowRenderer(),
+    )
+    assert creator.database is None  # индекс строится при первом поиске
+
+    assert creator.find_dance_poses("робот") == expected
+    assert isinstance(creator.database, StorePoseDatabase)
+    assert len(creator.find_dance_poses("макарен*")) == len(POSES)
+    creator.close()
+
+
+def test_find_macarena_poses_accepts_a_list(tmp_path):
+    creator = make_creator(tmp_path, SlowRenderer())
+    poses = [
+        {"description": "Макарена: руки вперёд", "pose": POSES[0]},
+        {"description": "Робот: шаг", "pose": POSES[1]},
+        {"description": "макарены поворот", "pose": POSES[2]},
+    ]
+
+    assert creator.find_macarena_poses(poses) == [poses[0], poses[2]]
+    assert len(creator.find_macarena_poses()) == len(POSES)
+    assert creator.find_macarena_poses(creator.load_pose_database())
+    creator.close()
@@ -0,0 +1,80 @@
+"""Тест ограниченной памяти диалога (без LLM)"""
+
+import json
+
+from src.memory import ConversationMemory, messages_tokens
+
+
+def _tool_turn(memory, i):
+    memory.append({"role": "user", "content": f"Создай позу {i} " + "x" * 200})
+    memory.append(
+        {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [
+                {
+                    "id": f"call_{i}",
+                    "type": "function",
+                    "function": {"name": "create_animation", "arguments": "{}"},
+                }
+            ],
+        }
+    )
+    memory.append(
+        {
+            "role": "tool",
+            "tool_call_id": f"call_{i}",
+            "content": json.dumps({"success": True, "animation": "A" * 10000}),
+        }
+    )
+    memory.append({"role": "assistant", "content": "Готово " * 20})
+
+
+def test_sliding_window_stays_within_budget():
+    memory = ConversationMemory(max_prompt_tokens=400)
+    for i in range(20):
+        _tool_turn(memory, i)
+        memory.append({"role": "user", "content": "ещё"})
+        prompt = memory.build_messages("system")
+        assert messages_tokens(prompt) <= 400
+
+    assert prompt[0]["role"] == "system"
+    assert prompt[-1]["content"] == "ещё"
+    # Последний вызов инструмента закреплён вместе с результатом
+    assert any(m.get("tool_calls") for m in prompt)
+    assert prompt[[m["role"] for m in prompt].index("tool") - 1].get("tool_calls")
+
+
+def test_tool_payload_is_not_stored():
+    memory = ConversationMemory()
+    _tool_turn(memory, 0)
+    tool_message = next(m for m in memory.messages if m["role"] == "tool")
+    assert "AAAA" not in tool_message["content"]
+
+
+def test_summarize_policy_keeps_summary():
+    memory = ConversationMemory(max_prompt_tokens=400, policy="summarize")
+    for i in range(20):
+        _tool_turn(memory, i)
+        memory.append({"role": "user", "content": "ещё"})
+        prompt = memory.build_messages("system")
+        # Резюме входит в бюджет промпта
+        assert messages_tokens(prompt) <= 400
+
+    assert memory.summary
+    assert "КРАТКО О ПРЕДЫДУЩЕМ ДИАЛОГЕ" in prompt[0]["content"]
+
+
+def test_session_budget():
+    memory = ConversationMemory(session_token_budget=100)
+    memory.append({"role": "user", "content": "x" * 600})
+    memory.charge(memory.build_messages("system"))
+    assert memory.budget_exhausted()
+
+
+if __name__ == "__main__":
+    test_sliding_window_stays_within_budget()
+    test_tool_payload_is_not_stored()
+    test_summarize_policy_keeps_summary()
+    test_session_budget()
+    print("✅ Memory OK")
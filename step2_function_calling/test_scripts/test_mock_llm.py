@@ -0,0 +1,58 @@
+"""Тест агента против mock LLM (без Ollama и без Pose API)"""
+
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from src.mock_llm import create_app
+from src.pose_agent import PoseAgent
+from src.renderers import InProcessPoseRenderer
+
+
+def make_client(app) -> OpenAI:
+    return OpenAI(
+        base_url="http://testserver/v1", api_key="mock", http_client=TestClient(app)
+    )
+
+
+def test_agent_tool_loop_against_mock():
+    client = make_client(create_app())
+    renderer = InProcessPoseRenderer(output="numpy")
+
+    for encoding in ("verbose", "compact"):
+        agent = PoseAgent(client=client, renderer=renderer, pose_encoding=encoding)
+        result = agent.chat("Помаши рукой", force_llm=True)
+        assert result["source"] == "llm"
+        assert result["image"]
+        assert "wave" in result["text"]
+        agent.close()
+
+
+def test_scripted_text_reply_and_stream():
+    script = [
+        {
+            "match": "привет",
+            "responses": [{"content": "Привет! Чем помочь?"}],
+        }
+    ]
+    app = create_app(script=script)
+    client = make_client(app)
+
+    agent = PoseAgent(client=client, renderer=InProcessPoseRenderer())
+    result = agent.chat("привет", force_llm=True)
+    assert result["text"] == "Привет! Чем помочь?"
+    assert result["image"] is None
+
+    stream = client.chat.completions.create(
+        model="mock",
+        messages=[{"role": "user", "content": "сделай приседание"}],
+        tools=agent.tools,
+        stream=True,
+    )
+    name, arguments = None, ""
+    for chunk in stream:
+        for call in chunk.choices[0].delta.tool_calls or []:
+            name = call.function.name or name
+            arguments += call.function.arguments or ""
+    assert name == "create_animation"
+    assert '"action": "squat"' in arguments
+    assert app.state.llm.stats["requests"] == 2
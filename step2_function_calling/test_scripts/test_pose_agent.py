@@ -0,0 +1,240 @@
+"""Тест агентного цикла PoseAgent против mock LLM (без Ollama и без Pose API)"""
+
+import base64
+import io
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from openai import OpenAI
+from PIL import Image
+
+from src.mock_llm import DEFAULT_TEXT, create_app
+from src.pose_agent import PoseAgent
+from src.pose_library import REST_POSE, PoseLibrary, PoseSequence
+from src.renderers import InProcessPoseRenderer
+
+
+def make_agent(app, **kwargs) -> PoseAgent:
+    client = OpenAI(
+        base_url="http://testserver/v1", api_key="mock", http_client=TestClient(app)
+    )
+    return PoseAgent(
+        client=client, renderer=InProcessPoseRenderer(output="numpy"), **kwargs
+    )
+
+
+def test_terminal_tool_skips_follow_up_llm_call():
+    app = create_app()
+    agent = make_agent(app)
+
+    result = agent.chat("Помаши рукой", force_llm=True)
+
+    assert result["terminal"] is True
+    assert result["image"]
+    assert "wave" in result["text"]
+    # Только вызов с tool_calls: текст ответа собран по шаблону
+    assert app.state.llm.stats["requests"] == 1
+    assert agent.stats["llm_calls"] == 1
+    assert agent.stats["llm_calls_saved"] == 1
+    assert agent.stats["time_saved_seconds"] > 0
+    assert agent.conversation_history[-1] == {
+        "role": "assistant",
+        "content": result["text"],
+    }
+    agent.close()
+
+
+def test_non_terminal_tool_asks_llm_for_text():
+    app = create_app()
+    agent = make_agent(app, terminal_tools={})
+
+    result = agent.chat("Помаши рукой", force_llm=True)
+
+    assert "terminal" not in result
+    assert result["text"] == DEFAULT_TEXT
+    assert app.state.llm.stats["requests"] == 2
+    assert agent.stats["llm_calls_saved"] == 0
+    assert agent.stats["time_saved_seconds"] == 0
+    agent.close()
+
+
+def test_failed_terminal_tool_is_not_short_circuited():
+    script = [
+        {
+            "match": "сломай",
+            "responses": [
+                {
+                    "content": "",
+                    "tool_calls": [
+                        {"name": "create_animation", "arguments": {"action": "x"}}
+                    ],
+                },
+                {"content": "Не получилось"},
+            ],
+        }
+    ]
+    app = create_app(script=script)
+    agent = make_agent(app)
+
+    result = agent.chat("сломай", force_llm=True)
+
+    assert result["text"] == "Не получилось"
+    assert app.state.llm.stats["requests"] == 2
+    assert agent.stats["llm_calls_saved"] == 0
+    agent.close()
+
+
+def test_async_text_generates_reply_in_background():
+    app = create_app()
+    agent = make_agent(app)
+
+    result = agent.chat("Помаши рукой", force_llm=True, async_text=True)
+
+    assert result["terminal"] is True
+    assert result["text_future"].result(timeout=10) == DEFAULT_TEXT
+    assert app.state.llm.stats["requests"] == 2
+    # Сгенерированный текст заменяет шаблон в истории диалога
+    assert agent.conversation_history[-1]["content"] == DEFAULT_TEXT
+    assert agent.stats["llm_calls_saved"] == 1
+    agent.close()
+
+
+def test_library_animation_uses_sequence_duration():
+    library = PoseLibrary([PoseSequence("bow", [REST_POSE, REST_POSE], duration=120)])
+    agent = make_agent(create_app(), pose_library=library)
+
+    result = agent.chat("bow")
+
+    assert result["source"] == "pose_library"
+    with Image.open(io.BytesIO(base64.b64decode(result["image"]))) as gif:
+        assert gif.info["duration"] == 120
+    agent.close()
+
+
+def test_library_render_error_falls_back_to_llm():
+    class BrokenRenderer(InProcessPoseRenderer):
+        def render_many(self, poses):
+            raise ConnectionError("Pose API is down")
+
+    app = create_app()
+    agent = make_agent(app)
+    agent.renderer = BrokenRenderer()
+
+    result = agent.chat("wave")
+
+    assert result.get("source") != "pose_library"
+    assert app.state.llm.stats["requests"] >= 1
+    agent.close()
+
+
+def tool_call(action: str) -> SimpleNamespace:
+    arguments = json.dumps({"action": action, "poses": [REST_POSE]})
+    return SimpleNamespace(
+        function=SimpleNamespace(name="create_animation", arguments=arguments)
+    )
+
+
+def scripted_tools(agent: PoseAgent, delays: dict, failing=()) -> dict:
+    """Подменить инструмент: задержка и ошибка по action; считает параллельность"""
+    state = {"running": 0, "peak": 0, "called": []}
+    lock = threading.Lock()
+
+    def call_function(function_name, arguments):
+        action = arguments["action"]
+        with lock:
+            state["called"].append(action)
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        try:
+            time.sleep(delays.get(action, 0))
+            if action in failing:
+                raise RuntimeError(f"{action} broke")
+            return {"success": True, "action": action}
+        finally:
+            with lock:
+                state["running"] -= 1
+
+    agent._call_function = call_function
+    return state
+
+
+def test_tool_calls_run_concurrently_in_order():
+    agent = make_agent(create_app(), max_parallel_tools=3)
+    state = scripted_tools(agent, {"a": 0.3, "b": 0.2, "c": 0.1})
+
+    start = time.monotonic()
+    results = agent._run_tool_calls([tool_call(a) for a in "abc"])
+
+    assert time.monotonic() - start < 0.55
+    assert state["peak"] == 3
+    # Порядок результатов - порядок tool_calls, а не завершения
+    assert [result["action"] for _, _, result in results] == ["a", "b", "c"]
+    agent.close()
+
+
+def test_tool_call_error_is_isolated():
+    agent = make_agent(create_app())
+    scripted_tools(agent, {}, failing={"b"})
+
+    results = agent._run_tool_calls([tool_call(a) for a in "abc"])
+
+    assert results[0][2]["success"] and results[2][2]["success"]
+    assert results[1][2] == {"error": "create_animation failed: b broke"}
+    agent.close()
+
+
+def test_timeout_is_per_call_not_per_turn():
+    # Вызовы идут по одному: третий начинается через 0.3 с, но укладывается
+    # в свои 0.25 с
+    agent = make_agent(create_app(), max_parallel_tools=1, tool_timeout=0.25)
+    scripted_tools(agent, {"a": 0.15, "b": 0.15, "c": 0.15})
+
+    results = agent._run_tool_calls([tool_call(a) for a in "abc"])
+
+    assert all(result.get("success") for _, _, result in results)
+    agent.close()
+
+
+def test_slow_call_times_out_without_blocking_others():
+    agent = make_agent(create_app(), max_parallel_tools=2, tool_timeout=0.2)
+    scripted_tools(agent, {"slow": 1.0})
+
+    start = time.monotonic()
+    results = agent._run_tool_calls([tool_call("slow"), tool_call("fast")])
+
+    assert time.monotonic() - start < 0.5
+    assert "timed out" in results[0][2]["error"]
+    assert results[1][2]["success"]
+    agent.close()
+
+
+def test_queued_call_is_dropped_when_workers_are_busy():
+    agent = make_agent(create_app(), max_parallel_tools=1, tool_timeout=0.2)
+    state = scripted_tools(agent, {"slow": 0.6})
+
+    results = agent._run_tool_calls([tool_call("slow"), tool_call("queued")])
+
+    assert "timed out" in results[0][2]["error"]
+    assert "not started" in results[1][2]["error"]
+    time.sleep(0.5)
+    # Снятый с очереди вызов так и не выполнился
+    assert state["called"] == ["slow"]
+    agent.close()
+
+
+if __name__ == "__main__":
+    test_terminal_tool_skips_follow_up_llm_call()
+    test_non_terminal_tool_asks_llm_for_text()
+    test_failed_terminal_tool_is_not_short_circuited()
+    test_async_text_generates_reply_in_background()
+    test_library_animation_uses_sequence_duration()
+    test_library_render_error_falls_back_to_llm()
+    test_tool_calls_run_concurrently_in_order()
+    test_tool_call_error_is_isolated()
+    test_timeout_is_per_call_not_per_turn()
+    test_slow_call_times_out_without_blocking_others()
+    test_queued_call_is_dropped_when_workers_are_busy()
+    print("✅ Pose agent OK")
@@ -0,0 +1,28 @@
+"""Тест компактного кодирования поз"""
+
+import pytest
+
+from src.pose_codec import PoseDecodeError, decode_frames, encode_pose
+from src.pose_library import BUILTIN_SEQUENCES
+
+
+@pytest.mark.parametrize("encoding", ["compact", "delta"])
+def test_roundtrip(encoding):
+    for sequence in BUILTIN_SEQUENCES:
+        frames = [encode_pose(p, encoding) for p in sequence.poses]
+        assert decode_frames(frames, encoding) == sequence.poses
+
+
+def test_invalid_frames():
+    with pytest.raises(PoseDecodeError, match="Frame 1"):
+        decode_frames([[0] * 12, [0] * 11])
+    with pytest.raises(PoseDecodeError):
+        decode_frames([["a"] * 12])
+
+
+@pytest.mark.parametrize("bad", [float("nan"), float("inf"), "-inf", True, None])
+def test_non_finite_and_bool_values_are_rejected(bad):
+    frame = [0] * 12
+    frame[5] = bad
+    with pytest.raises(PoseDecodeError, match="Frame 0"):
+        decode_frames([frame])
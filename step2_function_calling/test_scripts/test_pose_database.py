@@ -0,0 +1,73 @@
+"""Тест индекса базы поз (без сервисов)"""
+
+import json
+import os
+
+from src.pose_database import PoseDatabase
+from src.pose_library import REST_POSE
+
+
+def write_database(path, descriptions):
+    records = [{"description": d, "pose": REST_POSE} for d in descriptions]
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+
+
+def test_term_prefix_and_phrase_queries(tmp_path):
+    path = tmp_path / "poses.json"
+    write_database(
+        path,
+        [
+            "Макарена: правая рука вперёд",
+            "Танец макарены, левая рука вперед",
+            "Руки вверх, прыжок",
+            "Правая рука на бедре (Макарену танцуют так)",
+        ],
+    )
+    db = PoseDatabase(str(path))
+
+    assert len(db.search("макарена")) == 1
+    assert len(db.search("макарен*")) == 3
+    assert [r["description"][:7] for r in db.search("макарен* вперед")] == [
+        "Макарен",
+        "Танец м",
+    ]
+    assert len(db.search('"правая рука"')) == 2
+    assert db.search('"рука правая"') == []
+    assert db.search("") == []
+
+
+def test_refresh_reindexes_only_changes(tmp_path):
+    path = tmp_path / "poses.json"
+    write_database(path, ["макарена раз", "макарена два"])
+    db = PoseDatabase(str(path))
+    assert db.refresh() is False
+
+    write_database(path, ["макарена раз", "макарена три", "прыжок"])
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+    assert db.refresh() is True
+
+    assert len(db) == 3
+    assert db.stats == {"loads": 2, "added": 4, "removed": 1}
+    assert [r["description"] for r in db.search("макарена")] == [
+        "макарена раз",
+        "макарена три",
+    ]
+    assert db.search("два") == []
+
+
+def test_refresh_keeps_database_order(tmp_path):
+    path = tmp_path / "poses.json"
+    write_database(path, ["макарена раз", "макарена два", "прыжок"])
+    db = PoseDatabase(str(path))
+
+    write_database(path, ["макарена ноль", "макарена раз", "макарена полтора"])
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+    assert db.refresh() is True
+
+    expected = ["макарена ноль", "макарена раз", "макарена полтора"]
+    assert [r["description"] for r in db.search("макарена")] == expected
+    assert [r["description"] for r in db.records] == expected
+    assert db.search_ids("макарена") == [0, 1, 2]
+    assert db.search("полтора") == [db.get(2)]
@@ -0,0 +1,63 @@
+"""Тест локальной библиотеки поз (без LLM и Pose API)"""
+
+from src.pose_library import PoseLibrary
+
+
+def test_keyword_and_inflections():
+    library = PoseLibrary()
+
+    assert library.match("wave").sequence.name == "wave"
+    assert library.match("Создай позу прыжка").sequence.name == "jump"
+    assert library.match("Сделай приседания").sequence.name == "squat"
+    assert library.match("Создай T-позу").sequence.name == "t-pose"
+
+
+def test_unknown_and_ambiguous_requests_go_to_llm():
+    library = PoseLibrary()
+
+    assert library.match("Create a yoga pose") is None
+    assert library.match("Say 'Hello'") is None
+    assert library.match("прыжок и приседание") is None
+
+
+def test_unrelated_words_with_alias_prefix_are_not_stems():
+    library = PoseLibrary()
+
+    # Совпадает только префикс, остаток - не окончание
+    for prompt in ("startled", "starting", "jumpsuit", "wavelength"):
+        match = library.match(prompt)
+        assert match is None or match.confidence < 0.8, prompt
+
+    assert library.match("jumps").sequence.name == "jump"
+    assert library.match("waved").sequence.name == "wave"
+    assert library.match("танцует").sequence.name == "dance"
+
+
+def test_short_stems_and_near_words_are_not_served():
+    library = PoseLibrary()
+
+    # hope -/-> hop, site -/-> sit, salt -/-> salto; "jumping jack" - другое
+    # упражнение
+    for prompt in ("hope", "site", "salt", "Create a jumping jack", "hopping"):
+        match = library.match(prompt)
+        assert match is None or match.confidence < 0.8, prompt
+
+    assert library.match("danced").sequence.name == "dance"
+    assert library.match("Помаши рукой").confidence == 1.0
+
+
+def test_modifiers_lower_confidence():
+    library = PoseLibrary()
+
+    plain = library.match("танец")
+    detailed = library.match("медленный грустный танец на одной ноге")
+    assert detailed.confidence < plain.confidence
+
+
+if __name__ == "__main__":
+    test_keyword_and_inflections()
+    test_unknown_and_ambiguous_requests_go_to_llm()
+    test_unrelated_words_with_alias_prefix_are_not_stems()
+    test_short_stems_and_near_words_are_not_served()
+    test_modifiers_lower_confidence()
+    print("✅ Pose library OK")
@@ -0,0 +1,29 @@
+"""Тест поиска похожих поз по координатам (без сервисов)"""
+
+import numpy as np
+
+from src.pose_library import BUILTIN_SEQUENCES, REST_POSE
+from src.pose_neighbors import PoseNeighbors, pose_vectors, torso_normalize
+
+POSES = [pose for sequence in BUILTIN_SEQUENCES for pose in sequence.poses]
+
+
+def test_knn_matches_brute_force():
+    neighbors = PoseNeighbors.from_poses(POSES)
+    queries = pose_vectors(POSES[:5]) + 3.0
+
+    distances, indices = neighbors.knn(queries, k=3)
+    brute = np.linalg.norm(queries[:, None, :] - pose_vectors(POSES)[None], axis=2)
+    assert indices.shape == (5, 3)
+    np.testing.assert_allclose(distances, np.sort(brute, axis=1)[:, :3], rtol=1e-5)
+
+
+def test_normalized_mode_ignores_position_and_scale():
+    shifted = {joint: [2 * x + 40, 2 * y - 20] for joint, (x, y) in REST_POSE.items()}
+    np.testing.assert_allclose(
+        torso_normalize(pose_vectors([shifted])),
+        torso_normalize(pose_vectors([REST_POSE])),
+    )
+
+    neighbors = PoseNeighbors.from_poses([REST_POSE, *POSES], normalize=True)
+    assert 0 in neighbors.radius([shifted], r=1e-4)[0]
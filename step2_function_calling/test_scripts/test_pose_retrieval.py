@@ -0,0 +1,31 @@
+"""Тест TF-IDF поиска по описаниям поз (без сервисов)"""
+
+from src.pose_retrieval import TfidfRetriever
+
+DESCRIPTIONS = [
+    "Макарена: правая рука вперёд",
+    "Танец макарены, левая рука вперед",
+    "Руки вверх, прыжок",
+    "Помахать правой рукой",
+    "Приседание, руки перед собой",
+]
+
+
+def test_inflections_and_english_queries():
+    retriever = TfidfRetriever().fit(DESCRIPTIONS)
+    results = retriever.query(["макарену", "wave", "jump"], k=2)
+
+    assert {doc for doc, _ in results[0]} == {0, 1}
+    assert results[1][0][0] == 3
+    assert results[2][0][0] == 2
+    assert all(score <= 1.0 + 1e-6 for hits in results for _, score in hits)
+
+
+def test_save_and_mmap_load(tmp_path):
+    retriever = TfidfRetriever().fit(DESCRIPTIONS)
+    retriever.save(str(tmp_path))
+
+    loaded = TfidfRetriever.load(str(tmp_path))
+    assert len(loaded) == len(DESCRIPTIONS)
+    assert loaded.query("присесть", k=1) == retriever.query("присесть", k=1)
+    assert loaded.query("zzzz", k=3) == [[]]
@@ -0,0 +1,45 @@
+"""Тест бинарного хранилища поз (без сервисов)"""
+
+import json
+
+import numpy as np
+
+from src.pose_library import BUILTIN_SEQUENCES
+from src.pose_neighbors import PoseNeighbors
+from src.pose_store import PoseStore, build_store, write_store
+
+RECORDS = [
+    {"description": f"{s.name}: кадр {i} — «ёж»", "pose": pose, "tags": [s.name]}
+    for s in BUILTIN_SEQUENCES
+    for i, pose in enumerate(s.poses)
+]
+
+
+def test_round_trip_and_mmap(tmp_path):
+    source = tmp_path / "poses.json"
+    source.write_text(json.dumps(RECORDS, ensure_ascii=False), encoding="utf-8")
+    assert build_store(str(source), str(tmp_path / "store")) == len(RECORDS)
+
+    store = PoseStore(str(tmp_path / "store"))
+    assert isinstance(store.coords, np.memmap)
+    assert store.coords.shape == (len(RECORDS), 12)
+    assert list(store.records()) == RECORDS
+    assert list(store.ids_with_tag("wave")) == [
+        i for i, r in enumerate(RECORDS) if r["tags"] == ["wave"]
+    ]
+    assert not store.is_stale()
+
+    # Индексы строятся прямо по столбцам хранилища
+    distances, indices = PoseNeighbors(store.coords).knn(RECORDS[3]["pose"], k=1)
+    assert distances[0][0] == 0
+    assert store.pose(int(indices[0][0])) == RECORDS[3]["pose"]
+
+    source.write_text("[]", encoding="utf-8")
+    assert store.is_stale()
+
+
+def test_empty_store(tmp_path):
+    assert write_store([], str(tmp_path)) == 0
+    store = PoseStore(str(tmp_path))
+    assert len(store) == 0
+    assert list(store.records()) == []
@@ -0,0 +1,68 @@
+"""Тест потокового чтения базы поз (без сервисов)"""
+
+import io
+import json
+import tracemalloc
+
+import pytest
+
+from src.pose_library import REST_POSE
+from src.pose_store import PoseStore, build_store
+from src.pose_stream import iter_chunks, iter_json, iter_records
+
+VALUES = [{"a": 1, "b": "ё [x], {y}"}, 12345, -0.5e3, "str", [1, [2]], None, True]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 16])
+def test_array_and_jsonl_across_chunk_boundaries(chunk_size):
+    text = " [\n" + " ,\n ".join(json.dumps(v, ensure_ascii=False) for v in VALUES)
+    assert list(iter_json(io.StringIO(text + " ]\n"), chunk_size)) == VALUES
+
+    lines = "\n".join(json.dumps(v, ensure_ascii=False) for v in VALUES) + "\n"
+    assert list(iter_json(io.StringIO(lines), chunk_size)) == VALUES
+    assert list(iter_json(io.StringIO("[ ]"), chunk_size)) == []
+    assert list(iter_json(io.StringIO(""), chunk_size)) == []
+
+
+@pytest.mark.parametrize("text", ['[{"a": 1} {"b": 2}]', '[{"a": 1},', "[1] 2"])
+def test_malformed_input(text):
+    with pytest.raises(ValueError):
+        list(iter_json(io.StringIO(text), 4))
+
+
+def test_filter_projection_and_chunks(tmp_path):
+    path = tmp_path / "poses.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(10):
+            record = {"description": f"поза {i}", "pose": REST_POSE, "extra": "x" * 50}
+            f.write(json.dumps({**record, "tags": ["even"] if i % 2 == 0 else []}))
+            f.write("\n")
+
+    records = iter_records(
+        str(path), where=lambda r: "even" in r["tags"], fields=("description", "pose")
+    )
+    chunks = list(iter_chunks(records, 2))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert chunks[0][1] == {"description": "поза 2", "pose": REST_POSE}
+
+
+def test_build_store_memory_does_not_grow_with_database(tmp_path):
+    def peak_for(count):
+        path = tmp_path / f"poses_{count}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for i in range(count):
+                record = {"description": f"поза номер {i} " * 5, "pose": REST_POSE}
+                f.write(("," if i else "") + json.dumps(record, ensure_ascii=False))
+            f.write("]")
+        tracemalloc.start()
+        assert build_store(str(path), str(tmp_path / f"store_{count}")) == count
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak, path.stat().st_size
+
+    small, _ = peak_for(2_000)
+    large, file_size = peak_for(20_000)
+    assert large < file_size / 4
+    assert large < small * 2
+    assert PoseStore(str(tmp_path / "store_20000")).record(19_999)["pose"] == REST_POSE
@@ -0,0 +1,139 @@
+"""Тест слоя устойчивости клиента Pose API (без сети)"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.resilience import CircuitBreaker, ReplicasUnavailable, ResilientCaller
+
+
+def test_retry_moves_to_another_replica():
+    calls = []
+
+    def call(url, timeout):
+        calls.append(url)
+        if url == "down":
+            raise ConnectionError(url)
+        return url
+
+    caller = ResilientCaller(["down", "up"], backoff_base=0.001)
+    assert all(caller.call(call) == "up" for _ in range(5))
+    assert calls.count("down") <= 1
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_trial_call_through():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.available()
+    assert breaker.allow()
+    # Пока пробный вызов не завершился, остальные отклоняются
+    assert not breaker.available()
+    assert not any(breaker.allow() for _ in range(5))
+
+    # Ошибка пробного вызова снова открывает breaker
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert all(breaker.allow() for _ in range(5))
+
+
+def test_recovering_replica_gets_single_probe():
+    calls = []
+    release = threading.Event()
+
+    def call(url, timeout):
+        calls.append(url)
+        if url == "recovering":
+            release.wait(1)
+        return url
+
+    caller = ResilientCaller(["recovering"], max_retries=0, cooldown_seconds=0.05)
+    breaker = caller.replicas[0].breaker
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(caller.call, call) for _ in range(4)]
+        time.sleep(0.1)
+        release.set()
+    outcomes = [f.exception() or f.result() for f in futures]
+
+    assert calls == ["recovering"]
+    assert outcomes.count("recovering") == 1
+    assert sum(isinstance(o, ReplicasUnavailable) for o in outcomes) == 3
+    assert breaker.state == "closed"
+
+
+def test_all_replicas_open():
+    def call(url, timeout):
+        raise ConnectionError(url)
+
+    caller = ResilientCaller(["a"], max_retries=0, failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        caller.call(call)
+    with pytest.raises(ReplicasUnavailable):
+        caller.call(call)
+
+
+def test_hedge_after_p95():
+    slow = {"first": True}
+
+    def call(url, timeout):
+        if slow.pop("first", False):
+            time.sleep(0.5)
+        else:
+            time.sleep(0.005)
+        return url
+
+    caller = ResilientCaller(["a", "b"], min_samples=5, hedge_budget=1.0)
+    for _ in range(10):
+        caller.call(lambda url, timeout: time.sleep(0.005) or url)
+
+    start = time.perf_counter()
+    caller.call(call)
+    assert time.perf_counter() - start < 0.3
+    assert caller.stats["hedges"] >= 1
+
+
+def test_no_hedge_when_only_the_probing_replica_is_available():
+    def call(url, timeout):
+        time.sleep(0.1)
+        return url
+
+    caller = ResilientCaller(
+        ["recovering", "down"], cooldown_seconds=0.05, min_samples=1
+    )
+    caller.latency.observe(0.01)
+    recovering, down = caller.replicas
+    for _ in range(3):
+        recovering.breaker.record_failure()
+    time.sleep(0.06)
+    # "down" открылась только что; "recovering" в half-open отдаёт пробный слот
+    for _ in range(3):
+        down.breaker.record_failure()
+
+    assert caller.call(call) == "recovering"
+    assert caller.stats["hedges"] == 0
+    assert recovering.breaker.state == "closed"
@@ -0,0 +1,119 @@
+"""Тест проверки и исправления аргументов инструмента (без LLM)"""
+
+import json
+
+import pytest
+
+from src.pose_agent import PoseAgent
+from src.pose_library import REST_POSE
+from src.renderers import InProcessPoseRenderer
+from src.tool_args import ToolArgumentsError, parse_tool_arguments, repair_json
+
+POSE = json.dumps(REST_POSE)
+
+
+@pytest.mark.parametrize(
+    "text, repair",
+    [
+        ('```json\n{"poses": [1, 2,]}\n```', "removed trailing commas"),
+        ("{'poses': [1, 2]}", "replaced single quotes"),
+        ("{poses: [1, 2], ok: True}", "quoted object keys"),
+        ('Here you go: {"poses": [1, 2]}', "dropped text before JSON object"),
+        ('{"poses": [1, 2, {"Tor', "completed truncated JSON"),
+    ],
+)
+def test_repair_json(text, repair):
+    data, repairs = repair_json(text)
+    assert data["poses"][:2] == [1, 2]
+    assert repair in repairs
+
+
+def test_keys_are_quoted_only_outside_strings():
+    text = '{action: "hands up, then: wave", ok: True, "note": "True, x: None"}'
+    data, repairs = repair_json(text)
+    assert data == {
+        "action": "hands up, then: wave",
+        "ok": True,
+        "note": "True, x: None",
+    }
+    assert "quoted object keys" in repairs
+
+
+def test_mixed_quotes_are_repaired():
+    text = """{'action': 'say "hi"', "note": "it's", 'esc': 'don\\'t'}"""
+    data, repairs = repair_json(text)
+    assert data == {"action": 'say "hi"', "note": "it's", "esc": "don't"}
+    assert "replaced single quotes" in repairs
+
+
+def test_joints_are_coerced_and_clamped():
+    arguments = (
+        '{"action": "wave", "poses": [{"torso": {"x": 0, "y": 0}, '
+        '"Head": "0, 60", "RH": [30, 70, 0], "LH": [-400, 35]}]}'
+    )
+    args, repairs = parse_tool_arguments("create_animation", arguments)
+    pose = args["poses"][0]
+    assert pose["Torso"] == [0, 0]
+    assert pose["Head"] == [0, 60]
+    assert pose["RH"] == [30, 70]
+    assert pose["LH"] == [-150, 35]
+    assert pose["RK"] == REST_POSE["RK"]
+    assert "clamped LH to canvas" in repairs
+
+
+@pytest.mark.parametrize(
+    "torso", ["[NaN, 0]", "[Infinity, 0]", "[true, 0]", '"nan, 0"']
+)
+def test_non_finite_and_boolean_coordinates_are_rejected(torso):
+    arguments = '{"poses": [{"Torso": ' + torso + "}]}"
+    with pytest.raises(ToolArgumentsError) as error:
+        parse_tool_arguments("create_animation", arguments)
+    assert error.value.details[0]["loc"] == "poses.0.Torso"
+
+
+def test_error_hint_follows_pose_encoding():
+    error = ToolArgumentsError("Invalid create_animation arguments")
+    assert '"poses"' in error.to_result()["hint"]
+    for encoding in ("compact", "delta"):
+        hint = error.to_result(encoding)["hint"]
+        assert '"frames"' in hint and '"poses"' not in hint
+    assert "offsets" in error.to_result("delta")["hint"]
+
+    agent = PoseAgent(
+        client=object(), renderer=InProcessPoseRenderer(), pose_encoding="compact"
+    )
+    _, result = agent._run_tool_call("create_animation", '{"frames": [[1, 2]]}')
+    assert '"frames"' in result["hint"]
+
+
+def test_compact_frames_are_decoded():
+    frame = [0, 0, 0, 60, 25, 35, -25, 35, 15, -50, -15, -50]
+    args, _ = parse_tool_arguments(
+        "create_animation", json.dumps({"action": "rest", "frames": [frame]}), "compact"
+    )
+    assert args["poses"] == [REST_POSE]
+
+
+def test_unrepairable_arguments_return_structured_error():
+    with pytest.raises(ToolArgumentsError) as error:
+        parse_tool_arguments("create_animation", '{"poses": [{"Torso": "abc"}]}')
+    assert error.value.details[0]["loc"] == "poses.0.Torso.0"
+
+    # Ни одного известного сустава - ошибка, а не поза покоя целиком
+    with pytest.raises(ToolArgumentsError) as error:
+        parse_tool_arguments("create_animation", '{"poses": [{"hand": [1, 2]}]}')
+    assert error.value.details[0]["loc"] == "poses.0"
+    assert "none of the joints" in error.value.details[0]["msg"]
+
+    agent = PoseAgent(client=object(), renderer=InProcessPoseRenderer())
+    args, result = agent._run_tool_call("create_animation", "not json at all")
+    assert args == {}
+    assert result["error"].startswith("Invalid arguments JSON")
+    assert "hint" in result
+    assert agent.stats["tool_args_rejected"] == 1
+
+    args, result = agent._run_tool_call(
+        "create_animation", '{"action": "rest", "poses": [' + POSE + ",]}"
+    )
+    assert result["success"]
+    assert agent.stats["tool_args_repaired"] == 1
@@ -0,0 +1,71 @@
+"""Тест локальной трассировки (без сети)"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(str(path))
+    yield path
+    tracing.configure(None)
+
+
+def test_disabled_spans_are_noop():
+    tracing.configure(None)
+    with tracing.span("noop") as current:
+        assert current is None
+    assert tracing.inject_headers() == {}
+
+
+def test_nested_spans_share_trace(trace_file):
+    with tracing.span("root", turn=1):
+        with tracing.span("child"):
+            pass
+
+    spans = {s["name"]: s for s in tracing.load_spans(str(trace_file))}
+    assert spans["child"]["trace_id"] == spans["root"]["trace_id"]
+    assert spans["child"]["parent_id"] == spans["root"]["span_id"]
+    assert spans["root"]["parent_id"] is None
+    assert spans["root"]["attrs"] == {"turn": 1}
+
+
+def test_context_crosses_threads_and_headers(trace_file):
+    def worker(_):
+        with tracing.span("worker") as current:
+            return current.parent_id
+
+    with tracing.span("root"):
+        headers = tracing.inject_headers()
+        with ThreadPoolExecutor(2) as pool:
+            parents = list(pool.map(tracing.bind(worker), range(2)))
+
+    with tracing.remote_parent(headers):
+        with tracing.span("remote"):
+            pass
+
+    spans = tracing.load_spans(str(trace_file))
+    root = next(s for s in spans if s["name"] == "root")
+    remote = next(s for s in spans if s["name"] == "remote")
+    assert parents == [root["span_id"]] * 2
+    assert remote["trace_id"] == root["trace_id"]
+    assert remote["parent_id"] == root["span_id"]
+
+
+def test_error_is_recorded_and_formatted(trace_file):
+    with pytest.raises(ValueError):
+        with tracing.span("root"):
+            with tracing.span("failing"):
+                raise ValueError("boom")
+
+    spans = tracing.load_spans(str(trace_file))
+    failing = next(s for s in spans if s["name"] == "failing")
+    assert failing["attrs"]["error"] == "ValueError: boom"
+
+    report = tracing.format_trace(spans)
+    assert "  failing" in report
+    assert "self time:" in report